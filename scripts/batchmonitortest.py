@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# Check the batched monitoring of the control events of a real joystick.
+#
+# A listener is registered with startBatchedMonitor for the joystick with the
+# given ID, and the batches of control events received via its controlEvents
+# method are printed while the controls of the joystick are operated. It is
+# checked that
+# - at least one batch is received,
+# - no batch is empty or contains more than 64 events,
+# - the timestamps of the events do not decrease,
+# - the individual keyPressed, keyReleased and axisChanged methods of the
+#   listener are not called.
+#
+# Usage: batchmonitortest.py <joystick ID> [<duration in seconds>]
+#
+# The daemon should be running and the joystick should be operated during
+# the given duration (10 seconds by default). Ctrl-C ends the check early.
+
+import profilebench
+
+from jsprog.joystick import Key, Axis
+from jsprog.const import CONTROL_EVENT_KEY, CONTROL_EVENT_AXIS
+from jsprog.util import getJSProg
+
+from dbus import SessionBus
+from dbus.mainloop.glib import DBusGMainLoop
+from gi.repository import GLib
+
+import dbus.service
+
+import sys
+
+#-------------------------------------------------------------------------------
+
+## The path of the listener object
+listenerPath = "/hu/varadiistvan/JSProgBatchMonitorTest"
+
+## The maximal number of events in a batch
+maxBatchSize = 64
+
+#-------------------------------------------------------------------------------
+
+class BatchListener(dbus.service.Object):
+    """The listener receiving the batches of control events and checking
+    them."""
+    def __init__(self, connection, path):
+        """Construct the listener with the given path."""
+        super(BatchListener, self).__init__(connection, path)
+
+        ## The number of batches received
+        self.numBatches = 0
+
+        ## The number of events received
+        self.numEvents = 0
+
+        ## The messages about the errors detected
+        self.errors = []
+
+        self._lastTimestamp = None
+
+    @dbus.service.method(dbus_interface = "hu.varadiistvan.JSProgListener",
+                         in_signature = "uq", out_signature = "")
+    def keyPressed(self, joystickID, code):
+        """Called when a key is pressed, which should not happen."""
+        self._addError("keyPressed called for key %d" % (code,))
+
+    @dbus.service.method(dbus_interface = "hu.varadiistvan.JSProgListener",
+                         in_signature = "uq", out_signature = "")
+    def keyReleased(self, joystickID, code):
+        """Called when a key is released, which should not happen."""
+        self._addError("keyReleased called for key %d" % (code,))
+
+    @dbus.service.method(dbus_interface = "hu.varadiistvan.JSProgListener",
+                         in_signature = "uqi", out_signature = "")
+    def axisChanged(self, joystickID, code, value):
+        """Called when the value of an axis has changed, which should not
+        happen."""
+        self._addError("axisChanged called for axis %d" % (code,))
+
+    @dbus.service.method(dbus_interface = "hu.varadiistvan.JSProgListener",
+                         in_signature = "ua(qqix)", out_signature = "")
+    def controlEvents(self, joystickID, events):
+        """Called with a batch of control events."""
+        self.numBatches += 1
+        self.numEvents += len(events)
+
+        print("Batch %d of joystick %d with %d event(s):" %
+              (self.numBatches, joystickID, len(events)))
+        if not events or len(events)>maxBatchSize:
+            self._addError("batch %d has %d events" %
+                           (self.numBatches, len(events)))
+
+        for (type, code, value, timestamp) in events:
+            if type==CONTROL_EVENT_KEY:
+                print("  %d: key %s %s" % (timestamp, Key.getNameFor(code),
+                                           "pressed" if value else "released"))
+            elif type==CONTROL_EVENT_AXIS:
+                print("  %d: axis %s changed to %d" %
+                      (timestamp, Axis.getNameFor(code), value))
+            else:
+                self._addError("unknown event type %d" % (type,))
+
+            if self._lastTimestamp is not None and \
+               timestamp<self._lastTimestamp:
+                self._addError("timestamp %d is before %d" %
+                               (timestamp, self._lastTimestamp))
+            self._lastTimestamp = timestamp
+
+    def _addError(self, message):
+        """Record and print the given error message."""
+        print("ERROR: " + message, file=sys.stderr)
+        self.errors.append(message)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv)<2:
+        print("Usage: %s <joystick ID> [<duration in seconds>]" % (sys.argv[0],),
+              file=sys.stderr)
+        sys.exit(2)
+
+    id = int(sys.argv[1])
+    duration = int(sys.argv[2]) if len(sys.argv)>2 else 10
+
+    connection = SessionBus(mainloop = DBusGMainLoop())
+    jsprog = getJSProg(connection)
+
+    listener = BatchListener(connection, listenerPath)
+
+    if not jsprog.startBatchedMonitor(id, connection.get_unique_name(),
+                                      listenerPath):
+        print("Could not start monitoring the joystick, perhaps the ID is wrong.",
+              file=sys.stderr)
+        sys.exit(1)
+
+    print("Operate the controls of joystick %d for %d seconds..." %
+          (id, duration))
+
+    mainloop = GLib.MainLoop()
+    GLib.timeout_add_seconds(duration, mainloop.quit)
+    try:
+        mainloop.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        jsprog.stopMonitor(id, listenerPath)
+
+    if listener.numBatches==0:
+        listener.errors.append("no batches were received")
+
+    print("%d event(s) in %d batch(es), %d error(s)" %
+          (listener.numEvents, listener.numBatches, len(listener.errors)))
+    for message in listener.errors:
+        print("  " + message)
+
+    sys.exit(1 if listener.errors else 0)
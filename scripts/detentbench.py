@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# Benchmark the computation of the shifted state of an axis with many value
+# ranges, such as a throttle with 32 detents.
+#
+# The following variants of the Lua code are run for each value of the axis
+# in each combined shift state:
+# - the chain of if statements checking the value ranges one by one,
+# - the balanced comparison tree generated by default,
+# - the scan of the shifted states table (shiftStateTables).
+# All of them are expected to return the same states. The comparison tree is
+# generated even with shiftStateTables if the value ranges allow it, since
+# the table is slower.
+#
+# Usage: detentbench.py [<lua interpreter>]
+#
+# The Lua interpreter can also be given in the LUA environment variable. It
+# defaults to lua.
+
+import profilebench
+
+from jsprog.profile import ControlProfile, getShiftLevelStateName
+from jsprog.action import SimpleAction, ValueRangeAction
+from jsprog.joystick import Axis
+from jsprog.util import appendLinesIndented
+
+import os
+import sys
+import random
+import subprocess
+
+#-------------------------------------------------------------------------------
+
+## The number of times the values of the axis are iterated over for each
+## variant
+numRounds = 50
+
+#-------------------------------------------------------------------------------
+
+def createDetentAction(numDetents, width, gap):
+    """Create a value range action with the given number of detents of the
+    given width separated by the given gap.
+
+    The value ranges are added in a random order."""
+    action = ValueRangeAction()
+    indexes = list(range(numDetents))
+    random.shuffle(indexes)
+    for index in indexes:
+        simpleAction = SimpleAction()
+        simpleAction.addKeyCombination(30 + index%10)
+        fromValue = index * (width + gap)
+        action.addAction(fromValue, fromValue + width - 1, simpleAction)
+    return action
+
+#-------------------------------------------------------------------------------
+
+def createProfile(joystickType):
+    """Create the profile with the detents on an axis, to which the common
+    profile assigns no actions."""
+    profile = profilebench.createProfile(joystickType)
+    axis = joystickType.findAxis(Axis.findCodeFor("ABS_RY"))
+
+    profile.setAction(axis, None, [0, 0], createDetentAction(32, 8, 0))
+    profile.setAction(axis, None, [0, 1], createDetentAction(3, 10, 5))
+    profile.setAction(axis, None, [0, 2], createDetentAction(6, 10, 5))
+    for state1 in range(3):
+        profile.setAction(axis, None, [1, state1],
+                          createDetentAction(12, 20, 1))
+
+    return (profilebench.reparseProfile(joystickType, profile), axis)
+
+#-------------------------------------------------------------------------------
+
+def getBenchmarkLuaCode(profile, controlProfile):
+    """Get the Lua code of the benchmark."""
+    variants = []
+
+    lines = []
+    ControlProfile._getShiftedStateLuaCodeFor(controlProfile,
+                                              controlProfile.handlerTree,
+                                              profile, 0, lines, [""])
+    variants.append(("if chain", [], lines))
+
+    variants.append(("comparison tree", [],
+                     controlProfile._getShiftedStateLuaFunctionBody(profile)))
+
+    variants.append(("table",
+                     controlProfile._getShiftedStatesLuaTable(profile),
+                     controlProfile._getShiftedStateTableLuaFunctionBody(profile)))
+
+    valueName = controlProfile.control.luaValueName
+
+    lines = []
+    lines += profile._getShiftStateLuaCode()
+    lines.append("local results = {}")
+    lines.append("")
+
+    for (index, (name, prologue, body)) in enumerate(variants):
+        lines += prologue
+        lines.append("local function getShiftedState%d()" % (index,))
+        appendLinesIndented(lines, body)
+        lines.append("end")
+        lines.append("")
+        lines.append("do")
+        lines.append("  local states = {}")
+        lines.append("  local start = os.clock()")
+        lines.append("  for round = 1, %d do" % (numRounds,))
+        lines.append("    for state0 = 0, 1 do")
+        lines.append("      %s = state0" % (getShiftLevelStateName(0),))
+        lines.append("      for state1 = 0, 2 do")
+        lines.append("        %s = state1" % (getShiftLevelStateName(1),))
+        lines.append("        _jsprog_shiftState_update()")
+        lines.append("        for value = -2, 270 do")
+        lines.append("          %s = value" % (valueName,))
+        lines.append("          states[#states + 1] = getShiftedState%d()" %
+                     (index,))
+        lines.append("        end")
+        lines.append("      end")
+        lines.append("    end")
+        lines.append("  end")
+        lines.append("  local duration = os.clock() - start")
+        lines.append("  print(string.format(\"%-16s %%8.2f ms\", duration * 1000))" %
+                     (name + ":",))
+        lines.append("  results[%d] = states" % (index + 1,))
+        lines.append("end")
+        lines.append("")
+
+    lines.append("for index = 2, #results do")
+    lines.append("  for i, state in ipairs(results[1]) do")
+    lines.append("    if results[index][i] ~= state then")
+    lines.append("      print(string.format(\"variant %d differs at call %d: %d instead of %d\", index, i, results[index][i], state))")
+    lines.append("      os.exit(1)")
+    lines.append("    end")
+    lines.append("  end")
+    lines.append("end")
+
+    return lines
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    lua = sys.argv[1] if len(sys.argv)>1 else os.environ.get("LUA", "lua")
+
+    random.seed(1)
+
+    joystickType = profilebench.loadJoystickType()
+    (profile, axis) = createProfile(joystickType)
+    controlProfile = profile.findAxisProfile(axis.code)
+
+    code = "\n".join(getBenchmarkLuaCode(profile, controlProfile)) + "\n"
+
+    result = subprocess.run([lua, "-"], input = code.encode())
+    sys.exit(result.returncode)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+# Benchmark the lookup of the key codes by name when parsing a profile.
+#
+# A profile is generated with an advanced action pressing and releasing
+# random keys, so that it contains 500 references to keys by name. It is
+# parsed with the dictionary based lookup of Key.findCodeFor() and with a
+# linear search of the key names, as performed by earlier versions. The
+# lookup of the last key name is timed separately as well.
+#
+# Usage: keyrefbench.py [<number of key references>]
+
+import profilebench
+
+from jsprog.joystick import Key
+from jsprog.action import AdvancedAction, KeyPressCommand, KeyReleaseCommand
+from jsprog import codenames
+
+import sys
+import time
+import random
+
+#-------------------------------------------------------------------------------
+
+## The number of measurements, of which the best one is reported
+numMeasurements = 7
+
+## The number of iterations in a measurement of the parsing
+numParseIterations = 20
+
+## The number of iterations in a measurement of a single lookup
+numLookupIterations = 10000
+
+#-------------------------------------------------------------------------------
+
+def findCodeLinearly(name):
+    """Find the code of the key with the given name by checking the names
+    one by one."""
+    keyNames = codenames.keyNames
+    for i in range(0, len(keyNames)):
+        if keyNames[i]==name:
+            return i
+
+    if name.startswith("KEY_0X"):
+        try:
+            return int(name[6:], 16)
+        except:
+            pass
+
+#-------------------------------------------------------------------------------
+
+def createProfileData(joystickType, numReferences):
+    """Create the data of a profile with the given number of references to
+    keys."""
+    names = [name for name in codenames.keyNames
+             if not name.startswith("KEY_0X")]
+    generator = random.Random(5)
+
+    action = AdvancedAction()
+    action.setSection(AdvancedAction.SECTION_ENTER)
+    for i in range(numReferences // 2):
+        code = Key.findCodeFor(generator.choice(names))
+        action.appendCommand(KeyPressCommand(code))
+        action.appendCommand(KeyReleaseCommand(code))
+    action.clearSection()
+
+    profile = profilebench.createEmptyProfile(joystickType, "Key references")
+    profile.setAction(list(joystickType.keys)[0], None, [], action)
+
+    return profilebench.getProfileData(profile)
+
+#-------------------------------------------------------------------------------
+
+def measure(fn, numIterations):
+    """Measure the time of calling the given function.
+
+    Returns the best time of a call in milliseconds."""
+    fn()
+
+    best = None
+    for i in range(numMeasurements):
+        start = time.perf_counter()
+        for j in range(numIterations):
+            fn()
+        duration = (time.perf_counter() - start) / numIterations
+        best = duration if best is None else min(best, duration)
+
+    return best * 1000.0
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    numReferences = int(sys.argv[1]) if len(sys.argv)>1 else 500
+
+    joystickType = profilebench.loadJoystickType()
+    data = createProfileData(joystickType, numReferences)
+    parse = lambda: profilebench.parseProfile(joystickType, data)
+
+    lastName = [name for name in codenames.keyNames
+                if not name.startswith("KEY_0X")][-1]
+
+    dictionaryParseTime = measure(parse, numParseIterations)
+    dictionaryLookupTime = \
+        measure(lambda: Key.findCodeFor(lastName), numLookupIterations)
+
+    findCodeFor = Key.findCodeFor
+    Key.findCodeFor = staticmethod(findCodeLinearly)
+    try:
+        linearParseTime = measure(parse, numParseIterations)
+        linearLookupTime = \
+            measure(lambda: Key.findCodeFor(lastName), numLookupIterations)
+    finally:
+        Key.findCodeFor = staticmethod(findCodeFor)
+
+    print("%-36s %12s %12s" % ("", "dictionary", "linear"))
+    print("%-36s %9.3f ms %9.3f ms" %
+          ("parsing %d key references:" % (numReferences,),
+           dictionaryParseTime, linearParseTime))
+    print("%-36s %9.3f us %9.3f us" %
+          ("findCodeFor(\"%s\"):" % (lastName,),
+           dictionaryLookupTime * 1000.0, linearLookupTime * 1000.0))
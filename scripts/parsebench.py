@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+# Benchmark the parsing of the joystick type files and of the profiles.
+#
+# Each type file in data/devices and a generated profile of about 10000
+# elements are parsed by the handlers of the client via
+# BaseHandler.parseData(). The header-only parsing of the profile, as
+# performed when the profiles are loaded lazily, is timed as well.
+#
+# Usage: parsebench.py [<number of elements of the profile>]
+
+import profilebench
+
+from jsprog.device import JoystickType, DeviceHandler
+from jsprog.profile import ProfileHandler
+from jsprog.action import AdvancedAction, KeyPressCommand, KeyReleaseCommand
+
+from xml.dom.minidom import parseString
+
+import os
+import sys
+import glob
+import time
+
+#-------------------------------------------------------------------------------
+
+## The number of measurements, of which the best one is reported
+numMeasurements = 7
+
+## The minimal duration of a measurement in seconds
+minMeasurementDuration = 0.2
+
+#-------------------------------------------------------------------------------
+
+def parse(handler, data):
+    """Parse the given data with the given handler."""
+    try:
+        handler.parseData(data)
+    except ProfileHandler.HeaderParsed:
+        pass
+
+#-------------------------------------------------------------------------------
+
+def measure(createHandler, data):
+    """Measure the time of parsing the given data with handlers created by
+    the given function.
+
+    Returns the best time of a parsing in milliseconds."""
+    parse(createHandler(), data)
+
+    numIterations = 1
+    while True:
+        start = time.perf_counter()
+        for i in range(numIterations):
+            parse(createHandler(), data)
+        duration = time.perf_counter() - start
+        if duration>=minMeasurementDuration:
+            break
+        numIterations *= 2
+
+    best = duration / numIterations
+    for i in range(numMeasurements - 1):
+        start = time.perf_counter()
+        for j in range(numIterations):
+            parse(createHandler(), data)
+        best = min(best, (time.perf_counter() - start) / numIterations)
+
+    return best * 1000.0
+
+#-------------------------------------------------------------------------------
+
+def countElements(data):
+    """Count the elements in the given XML data."""
+    return len(parseString(data).getElementsByTagName("*"))
+
+#-------------------------------------------------------------------------------
+
+def createLargeProfileData(joystickType, numElements):
+    """Create the data of a profile with about the given number of elements.
+
+    The common profile is extended by advanced actions with key presses and
+    releases assigned to the keys not used by it."""
+    profile = profilebench.createProfile(joystickType)
+    data = profilebench.getProfileData(profile)
+
+    keys = list(joystickType.keys)[31:]
+    numSlots = len(keys) * 6
+    numCommands = max(0, numElements - countElements(data)) // numSlots
+
+    index = 0
+    for key in keys:
+        for state0 in range(2):
+            for state1 in range(3):
+                action = AdvancedAction()
+                action.setSection(AdvancedAction.SECTION_ENTER)
+                for i in range(numCommands // 2):
+                    code = 30 + index%20
+                    action.appendCommand(KeyPressCommand(code))
+                    action.appendCommand(KeyReleaseCommand(code))
+                    index += 1
+                action.clearSection()
+                profile.setAction(key, None, [state0, state1], action)
+
+    return profilebench.getProfileData(profile)
+
+#-------------------------------------------------------------------------------
+
+def printTimes(name, numElements, createHandler, data):
+    """Measure the parsing of the given data and print the results."""
+    duration = measure(createHandler, data)
+    print("%-32s %6d %10.3f %10.1f" %
+          (name, numElements, duration, numElements / duration))
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    numProfileElements = int(sys.argv[1]) if len(sys.argv)>1 else 10000
+
+    print("%-32s %6s %10s %10s" %
+          ("file", "elems", "time (ms)", "elems/ms"))
+
+    for path in sorted(glob.glob(os.path.join(profilebench.sourceDirectory,
+                                              "data", "devices", "*",
+                                              "type.xml"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        printTimes(os.path.basename(os.path.dirname(path)),
+                   countElements(data),
+                   lambda: DeviceHandler(JoystickType), data)
+
+    joystickType = profilebench.loadJoystickType()
+    data = createLargeProfileData(joystickType, numProfileElements)
+    numElements = countElements(data)
+
+    printTimes("profile", numElements,
+               lambda: ProfileHandler(joystickType), data)
+    printTimes("profile (header only)", numElements,
+               lambda: ProfileHandler(joystickType, headerOnly = True), data)
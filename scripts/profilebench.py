@@ -0,0 +1,156 @@
+# Common utilities for the test and benchmark scripts operating on
+# profiles. They use the client modules from the source tree, so they can be
+# run without installing the package.
+
+import os
+import sys
+import copy
+
+scriptsDirectory = os.path.dirname(os.path.abspath(__file__))
+sourceDirectory = os.path.dirname(scriptsDirectory)
+
+sys.path.insert(0, os.path.join(sourceDirectory, "src", "client"))
+
+from jsprog.device import JoystickType
+from jsprog.profile import Profile, ShiftLevel, ProfileHandler
+from jsprog.parser import Control, VirtualState, SingleValueConstraint
+from jsprog.joystick import Key
+from jsprog.action import SimpleAction, AdvancedAction, ScriptAction
+from jsprog.action import ValueRangeAction, MouseMove
+from jsprog.action import KeyPressCommand, KeyReleaseCommand, DelayCommand
+from jsprog.action import MouseMoveCommand
+
+#-------------------------------------------------------------------------------
+
+## The joystick type used by default (Saitek X52)
+defaultJoystickType = "usbV06a3P075c"
+
+#-------------------------------------------------------------------------------
+
+def getTypeFilePath(name = defaultJoystickType):
+    """Get the path of the type file of the joystick type with the given
+    name."""
+    return os.path.join(sourceDirectory, "data", "devices", name, "type.xml")
+
+#-------------------------------------------------------------------------------
+
+def loadJoystickType(name = defaultJoystickType):
+    """Load the joystick type with the given name from the source tree."""
+    return JoystickType.fromFile(getTypeFilePath(name))
+
+#-------------------------------------------------------------------------------
+
+def createEmptyProfile(joystickType, name):
+    """Create an empty profile for the given joystick type."""
+    identity = copy.deepcopy(joystickType.identity)
+    identity.phys = identity.phys or ""
+    identity.uniq = identity.uniq or ""
+    return Profile(joystickType, name, identity)
+
+#-------------------------------------------------------------------------------
+
+def createProfile(joystickType, name = "Benchmark"):
+    """Create a profile for the given joystick type (which is expected to be
+    the default one) with two shift levels and a mix of all kinds of
+    actions."""
+    profile = createEmptyProfile(joystickType, name)
+
+    shiftKeyCode = Key.findCodeFor("BTN_PINKIE")
+    shiftLevel = ShiftLevel()
+    for value in (0, 1):
+        state = VirtualState()
+        state.addConstraint(SingleValueConstraint(Control(Control.TYPE_KEY,
+                                                          shiftKeyCode),
+                                                  value))
+        shiftLevel.addState(state)
+    profile.addShiftLevel(shiftLevel)
+
+    hatControl = joystickType.findVirtualControl("vcj4").control
+    shiftLevel = ShiftLevel()
+    for value in range(3):
+        state = VirtualState()
+        state.addConstraint(SingleValueConstraint(hatControl, value))
+        shiftLevel.addState(state)
+    profile.addShiftLevel(shiftLevel)
+
+    keyCodes = [key.code for key in joystickType.keys
+                if key.code!=shiftKeyCode]
+    n = 0
+    for code in keyCodes[:30]:
+        key = joystickType.findKey(code)
+        for state0 in range(2):
+            for state1 in range(3):
+                if (code + state0 + state1)%4==0:
+                    continue
+                n += 1
+                if n%7==0:
+                    action = AdvancedAction(repeatDelay = 50)
+                    action.setSection(AdvancedAction.SECTION_ENTER)
+                    action.appendCommand(KeyPressCommand(30 + n%10))
+                    action.appendCommand(DelayCommand(20))
+                    action.appendCommand(KeyReleaseCommand(30 + n%10))
+                    action.clearSection()
+                elif n%5==0:
+                    action = ScriptAction()
+                    action.setSection(ScriptAction.SECTION_ENTER)
+                    action.appendLine("print('key %d')" % (n,))
+                    action.clearSection()
+                else:
+                    action = SimpleAction(repeatDelay =
+                                          100 if n%3==0 else None)
+                    action.addKeyCombination(16 + n%20,
+                                             leftShift = n%2==0)
+                profile.setAction(key, None, [state0, state1], action)
+
+    axes = list(joystickType.axes)
+    for axis in axes[:3]:
+        for state0 in range(2):
+            for state1 in range(3):
+                action = ValueRangeAction()
+                for i in range(5):
+                    simpleAction = SimpleAction()
+                    simpleAction.addKeyCombination(30 + i)
+                    action.addAction(i*50, i*50 + 40, simpleAction)
+                profile.setAction(axis, None, [state0, state1], action)
+
+    profile.setAction(axes[3], None, [0, 0],
+                      MouseMove(MouseMoveCommand.DIRECTION_HORIZONTAL,
+                                a = 1.0, b = 0.5, repeatDelay = 20))
+
+    virtualControl = joystickType.findVirtualControl("vcj1")
+    for state in virtualControl.states:
+        for state0 in range(2):
+            for state1 in range(3):
+                action = SimpleAction()
+                action.addKeyCombination(40 + state.value)
+                profile.setAction(virtualControl, state, [state0, state1],
+                                  action)
+
+    profile.appendPrologueLine("prologueValue = 1")
+    profile.appendEpilogueLine("epilogueValue = 2")
+
+    return profile
+
+#-------------------------------------------------------------------------------
+
+def getProfileData(profile):
+    """Get the XML document of the given profile as bytes."""
+    return profile.getXMLDocument().toprettyxml(indent = "  ",
+                                                encoding = "utf-8")
+
+#-------------------------------------------------------------------------------
+
+def parseProfile(joystickType, data, systemId = None):
+    """Parse the given profile data (bytes) for the given joystick type.
+
+    Returns the profile."""
+    handler = ProfileHandler(joystickType)
+    handler.parseData(data, systemId = systemId)
+    return handler.profile
+
+#-------------------------------------------------------------------------------
+
+def reparseProfile(joystickType, profile):
+    """Convert the given profile into XML and parse it back, so that it is in
+    the same state as the profiles loaded from files."""
+    return parseProfile(joystickType, getProfileData(profile))
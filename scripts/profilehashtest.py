@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# Check the isProfileLoaded D-Bus call of the daemon.
+#
+# The given daemon profile (x52test.profile by default) is loaded for the
+# joystick with the given ID, and it is checked that isProfileLoaded()
+# returns True for the hash of its contents as computed by
+# util.getContentHash(), and False for the hash of modified contents. Then a
+# variant of the profile with a comment appended is loaded and the checks
+# are repeated with the roles swapped. Finally, it is checked that a profile
+# failing to load does not change the result.
+#
+# Usage: profilehashtest.py <joystick ID> [<daemon profile file>]
+#
+# The daemon should be running. The profile of the joystick is replaced by
+# the one given, so the joystick's profile should be activated again after
+# the check.
+
+import profilebench
+
+from jsprog.util import getJSProg, getContentHash
+
+from dbus import SessionBus
+
+import os
+import sys
+
+#-------------------------------------------------------------------------------
+
+## The number of checks failed
+numFailures = 0
+
+#-------------------------------------------------------------------------------
+
+def check(description, value, expected):
+    """Check if the given value is the expected one and print the result."""
+    global numFailures
+
+    ok = bool(value)==expected
+    print("%-56s %s" % (description + ":", "ok" if ok else "FAILED"))
+    if not ok:
+        numFailures += 1
+
+#-------------------------------------------------------------------------------
+
+def isLoaded(jsprog, id, profile):
+    """Determine if the daemon reports the given profile (a string) as loaded
+    for the joystick with the given ID."""
+    return jsprog.isProfileLoaded(id, getContentHash(profile.encode("utf-8")))
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    if len(sys.argv)<2:
+        print("Usage: %s <joystick ID> [<daemon profile file>]" % (sys.argv[0],),
+              file=sys.stderr)
+        sys.exit(2)
+
+    id = int(sys.argv[1])
+    path = sys.argv[2] if len(sys.argv)>2 else \
+        os.path.join(profilebench.scriptsDirectory, "x52test.profile")
+
+    with open(path, "rt") as f:
+        profile = f.read()
+    variant = profile + "<!-- variant -->\n"
+
+    connection = SessionBus()
+    jsprog = getJSProg(connection)
+
+    check("loading the profile", jsprog.loadProfile(id, profile), True)
+    check("the profile is loaded", isLoaded(jsprog, id, profile), True)
+    check("the variant is not loaded", isLoaded(jsprog, id, variant), False)
+    check("a hash of other contents is not loaded",
+          isLoaded(jsprog, id, profile + " "), False)
+    check("an empty hash is not loaded", jsprog.isProfileLoaded(id, ""),
+          False)
+
+    check("loading the variant", jsprog.loadProfile(id, variant), True)
+    check("the variant is loaded", isLoaded(jsprog, id, variant), True)
+    check("the profile is not loaded anymore", isLoaded(jsprog, id, profile),
+          False)
+
+    check("loading an invalid profile", jsprog.loadProfile(id, "<invalid"),
+          False)
+    check("the variant is still loaded", isLoaded(jsprog, id, variant), True)
+
+    print("%d check(s) failed" % (numFailures,))
+    sys.exit(1 if numFailures>0 else 0)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# Check that the Lua code computing the shifted states of the controls by
+# looking them up in tables (the shiftStateTables attribute of a profile)
+# returns the same states as the chains of if statements generated otherwise.
+#
+# A test profile is generated with both variants of the code for each control
+# profile, which is then run by a Lua interpreter for each combined shift
+# state and each value of the control.
+#
+# Usage: shiftstatetest.py [<lua interpreter>]
+#
+# The Lua interpreter can also be given in the LUA environment variable. It
+# defaults to lua.
+
+import profilebench
+
+from jsprog.profile import KeyProfile, VirtualControlProfile
+from jsprog.profile import getShiftLevelStateName
+from jsprog.util import appendLinesIndented
+
+import os
+import sys
+import subprocess
+
+#-------------------------------------------------------------------------------
+
+def getValuesLoop(profile, controlProfile):
+    """Get the name of the variable containing the value of the control of
+    the given control profile, and the start and end of the values to check
+    as a tuple."""
+    if isinstance(controlProfile, VirtualControlProfile):
+        virtualControl = profile.findVirtualControlByCode(controlProfile.code)
+        return (virtualControl.stateLuaVariableName,
+                -1, virtualControl.numStates)
+
+    variableName = controlProfile.control.luaValueName
+    if isinstance(controlProfile, KeyProfile):
+        return (variableName, 0, 1)
+
+    fromValue = toValue = 0
+    for entries in controlProfile._getShiftedStatesFor(controlProfile.handlerTree,
+                                                      profile, 0)[1]:
+        for (entryFromValue, entryToValue, _) in entries:
+            if entryFromValue is not None:
+                fromValue = min(fromValue, entryFromValue)
+                toValue = max(toValue, entryToValue)
+    return (variableName, fromValue - 2, toValue + 2)
+
+#-------------------------------------------------------------------------------
+
+def getTestLuaCode(profile):
+    """Get the Lua code checking the shifted states of all control profiles
+    of the given profile."""
+    lines = []
+
+    lines.append("local numChecks = 0")
+    lines.append("local numFailures = 0")
+    lines.append("")
+
+    lines += profile._getShiftStateLuaCode()
+
+    for controlProfile in profile._controlProfiles:
+        (variableName, fromValue, toValue) = \
+            getValuesLoop(profile, controlProfile)
+
+        lines.append("-- %s" % (controlProfile.control.name,))
+        lines.append("function _jsprog_test_reference()")
+        appendLinesIndented(lines,
+                            controlProfile._getShiftedStateLuaFunctionBody(profile))
+        lines.append("end")
+        lines.append("")
+        lines += controlProfile._getShiftedStatesLuaTable(profile)
+        lines.append("")
+        lines.append("function _jsprog_test_table()")
+        appendLinesIndented(lines,
+                            controlProfile._getShiftedStateTableLuaFunctionBody(profile))
+        lines.append("end")
+        lines.append("")
+
+        indentation = ""
+        for index in range(0, profile.numShiftLevels):
+            lines.append("%sfor state%d = 0, %d do" %
+                         (indentation, index,
+                          profile.getShiftLevel(index).numStates - 1))
+            indentation += "  "
+            lines.append("%s%s = state%d" %
+                         (indentation,
+                          getShiftLevelStateName(index), index))
+        lines.append("%s_jsprog_shiftState_update()" % (indentation,))
+        lines.append("%sfor value = %d, %d do" %
+                     (indentation, fromValue, toValue))
+        lines.append("%s  %s = value" % (indentation, variableName))
+        lines.append("%s  local expected = _jsprog_test_reference()" %
+                     (indentation,))
+        lines.append("%s  local actual = _jsprog_test_table()" %
+                     (indentation,))
+        lines.append("%s  numChecks = numChecks + 1" % (indentation,))
+        lines.append("%s  if actual ~= expected then" % (indentation,))
+        lines.append("%s    numFailures = numFailures + 1" % (indentation,))
+        lines.append("%s    print(string.format(\"%s: shift state %%d, value %%d: expected %%s, got %%s\", _jsprog_shiftState, value, tostring(expected), tostring(actual)))" %
+                     (indentation, controlProfile.control.name))
+        lines.append("%s  end" % (indentation,))
+        lines.append("%send" % (indentation,))
+        for index in range(0, profile.numShiftLevels):
+            indentation = indentation[:-2]
+            lines.append("%send" % (indentation,))
+        lines.append("")
+
+    lines.append("print(string.format(\"%d checks, %d failures\", numChecks, numFailures))")
+    lines.append("os.exit(numFailures==0 and 0 or 1)")
+
+    return lines
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    lua = sys.argv[1] if len(sys.argv)>1 else os.environ.get("LUA", "lua")
+
+    joystickType = profilebench.loadJoystickType()
+    profile = profilebench.createProfile(joystickType)
+    profile = profilebench.reparseProfile(joystickType, profile)
+
+    code = "\n".join(getTestLuaCode(profile)) + "\n"
+
+    result = subprocess.run([lua, "-"], input = code.encode())
+    sys.exit(result.returncode)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+# Check that the state buffer of a joystick contains the same state as
+# returned by the getJoystickState D-Bus call.
+#
+# The state buffer of each joystick given (or of all joysticks known to the
+# daemon) is obtained via getStateBuffer and read by
+# util.getJoystickStateBuffer(). It is then sampled repeatedly, each sample
+# being taken between two getJoystickState calls. If the two calls return
+# the same state, the state read from the buffer should be equal to it. The
+# controls of the joysticks may be operated during the check to exercise the
+# updating of the buffer.
+#
+# Usage: statebuffertest.py [<joystick ID>...]
+#
+# The daemon should be running.
+
+import profilebench
+
+from jsprog.joystick import Joystick
+from jsprog.util import getJSProg, getJoystickStateBuffer
+
+from dbus import SessionBus
+
+import sys
+import time
+
+#-------------------------------------------------------------------------------
+
+## The number of samples taken for each joystick
+numSamples = 200
+
+## The delay between the samples in seconds
+sampleDelay = 0.01
+
+#-------------------------------------------------------------------------------
+
+def normalizeState(state):
+    """Convert the given state, which may consist of D-Bus types, into a
+    tuple of the tuples of the (code, value) pairs of the keys and the
+    axes."""
+    return tuple(tuple((int(code), int(value)) for (code, value) in controls)
+                 for controls in state)
+
+#-------------------------------------------------------------------------------
+
+def checkJoystick(jsprog, id):
+    """Check the state buffer of the joystick with the given ID.
+
+    Returns the number of errors found."""
+    stateBuffer = getJoystickStateBuffer(jsprog, id)
+    try:
+        (keys, axes) = normalizeState(jsprog.getJoystickState(id))
+        numErrors = 0
+        if list(stateBuffer.keyCodes)!=[code for (code, _value) in keys]:
+            print("  the key codes differ: %s instead of %s" %
+                  (list(stateBuffer.keyCodes),
+                   [code for (code, _value) in keys]), file=sys.stderr)
+            numErrors += 1
+        if list(stateBuffer.axisCodes)!=[code for (code, _value) in axes]:
+            print("  the axis codes differ: %s instead of %s" %
+                  (list(stateBuffer.axisCodes),
+                   [code for (code, _value) in axes]), file=sys.stderr)
+            numErrors += 1
+        if stateBuffer.removed:
+            print("  the buffer is marked as removed", file=sys.stderr)
+            numErrors += 1
+        if numErrors>0:
+            return numErrors
+
+        numCompared = 0
+        for i in range(numSamples):
+            before = normalizeState(jsprog.getJoystickState(id))
+            bufferState = normalizeState(stateBuffer.getState())
+            after = normalizeState(jsprog.getJoystickState(id))
+
+            if before==after:
+                numCompared += 1
+                if bufferState!=before:
+                    print("  sample %d differs: %s instead of %s" %
+                          (i, bufferState, before), file=sys.stderr)
+                    numErrors += 1
+
+            time.sleep(sampleDelay)
+
+        print("  %d of %d samples compared, %d error(s)" %
+              (numCompared, numSamples, numErrors))
+        if numCompared==0:
+            print("  no stable samples, the controls were moving all the time",
+                  file=sys.stderr)
+            numErrors += 1
+
+        return numErrors
+    finally:
+        stateBuffer.close()
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    connection = SessionBus()
+    jsprog = getJSProg(connection)
+
+    if len(sys.argv)>1:
+        ids = [int(arg) for arg in sys.argv[1:]]
+    else:
+        ids = [Joystick.fromArgs(args).id for args in jsprog.getJoysticks()]
+        if not ids:
+            print("No joysticks detected.", file=sys.stderr)
+            sys.exit(1)
+
+    numErrors = 0
+    for id in ids:
+        print("Joystick %d:" % (id,))
+        numErrors += checkJoystick(jsprog, id)
+
+    sys.exit(1 if numErrors>0 else 0)
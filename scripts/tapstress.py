@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+
+# Stress test of the threads of repeatable actions with the keys of the
+# joystick being tapped at 50 Hz.
+#
+# A profile is generated with a repeated simple action and a repeated
+# advanced action containing a delay. Its daemon code is run by a Lua
+# interpreter with an emulation of the thread handling of the daemon on a
+# virtual clock, once with a new thread started for each press, and once with
+# persistent threads (the persistentThreads attribute of a profile). The
+# output of the two variants is expected to be the same, while the number of
+# threads started should be much lower for the persistent ones.
+#
+# Usage: tapstress.py [<lua interpreter>]
+#
+# The Lua interpreter can also be given in the LUA environment variable. It
+# defaults to lua.
+
+import profilebench
+
+from jsprog.action import SimpleAction, AdvancedAction
+from jsprog.action import KeyPressCommand, KeyReleaseCommand, DelayCommand
+from jsprog.joystick import Key
+from jsprog import codenames
+
+from xml.dom.minidom import parseString
+
+import os
+import sys
+import subprocess
+
+#-------------------------------------------------------------------------------
+
+## The scenarios to run. Each is a tuple of the number of taps, the period of
+## the taps and the time the key is held for in each tap (in milliseconds).
+scenarios = [(50, 20, 10), (500, 20, 10), (100, 20, 19), (20, 300, 150),
+             (10, 500, 450)]
+
+## The emulation of the thread handling of the daemon (see LuaRunner and
+## LuaThread). Threads are resumed when their timeout is reached on a virtual
+## clock, and the keys pressed and released are recorded.
+harnessLuaCode = """
+local YIELD_DELAY = 1
+local YIELD_CANCELLABLE_DELAY = 2
+local YIELD_JOINTHREAD = 3
+local YIELD_PARK = 4
+local INVALID_MILLIS = math.huge
+
+local now = 0
+local threads = {}
+local pendingThreads = {}
+local runningThreads = {}
+local nextID = 1
+local numThreads = 0
+local maxNumThreads = 0
+local numFailures = 0
+local output = {}
+
+function jsprog_delay(length, cancellable)
+  return coroutine.yield(cancellable and YIELD_CANCELLABLE_DELAY or
+                         YIELD_DELAY, length)
+end
+
+function jsprog_startthread(fn)
+  local co = coroutine.create(fn)
+  local thread = { co = co, id = nextID, timeout = INVALID_MILLIS,
+                   cancelled = false }
+  nextID = nextID + 1
+  threads[co] = thread
+  pendingThreads[#pendingThreads + 1] = thread
+  numThreads = numThreads + 1
+  local numAlive = 0
+  for _ in pairs(threads) do numAlive = numAlive + 1 end
+  maxNumThreads = math.max(maxNumThreads, numAlive)
+  return co
+end
+
+function jsprog_canceldelay(co)
+  local thread = threads[co]
+  if not thread then return true end
+  if thread.reason == YIELD_CANCELLABLE_DELAY then
+    thread.cancelled = true
+    thread.timeout = now
+  end
+  return thread.cancelled
+end
+
+function jsprog_jointhread(co)
+  local thread = threads[co]
+  if not thread then return true end
+  if thread.joiner then error("the thread cannot be joined") end
+  thread.joiner = coroutine.running()
+  coroutine.yield(YIELD_JOINTHREAD, 0)
+end
+
+function jsprog_parkthread()
+  coroutine.yield(YIELD_PARK, 0)
+end
+
+function jsprog_wakethread(co)
+  local thread = threads[co]
+  if not thread then return false end
+  if thread.reason == YIELD_PARK then
+    thread.timeout = now
+    return true
+  end
+  return false
+end
+
+function jsprog_keycombo(...)
+  for _, code in ipairs({...}) do
+    output[#output + 1] = string.format("%d %d", now, code)
+  end
+end
+
+function jsprog_presskey(code)
+  output[#output + 1] = string.format("%d %d", now, code)
+end
+
+function jsprog_releasekey(code)
+  output[#output + 1] = string.format("%d %d", now, -code)
+end
+
+local function doResume(thread, ...)
+  thread.reason = nil
+  thread.cancelled = false
+  local ok, reason, length = coroutine.resume(thread.co, ...)
+  if not ok then
+    print("thread failed: " .. tostring(reason))
+    numFailures = numFailures + 1
+  elseif coroutine.status(thread.co) == "suspended" then
+    thread.reason = reason
+    if reason == YIELD_DELAY or reason == YIELD_CANCELLABLE_DELAY then
+      thread.timeout = thread.timeout + length
+    else
+      thread.timeout = INVALID_MILLIS
+    end
+    return true
+  end
+
+  threads[thread.co] = nil
+  local joiner = thread.joiner and threads[thread.joiner]
+  if joiner and joiner.reason == YIELD_JOINTHREAD then
+    joiner.timeout = now
+  end
+  return false
+end
+
+local function resumeRunning()
+  while true do
+    local next, nextIndex
+    for index, thread in ipairs(runningThreads) do
+      if thread.timeout <= now and
+         (not next or thread.timeout < next.timeout or
+          (thread.timeout == next.timeout and thread.id < next.id))
+      then
+        next, nextIndex = thread, index
+      end
+    end
+    if not next then break end
+
+    table.remove(runningThreads, nextIndex)
+    local shouldContinue
+    if next.reason == YIELD_JOINTHREAD or next.reason == YIELD_PARK then
+      shouldContinue = doResume(next)
+    else
+      shouldContinue = doResume(next, not next.cancelled)
+    end
+    if shouldContinue then
+      runningThreads[#runningThreads + 1] = next
+    end
+  end
+end
+
+local function runPending()
+  local newThreads = pendingThreads
+  pendingThreads = {}
+  for _, thread in ipairs(newThreads) do
+    thread.timeout = now
+    if doResume(thread) then
+      runningThreads[#runningThreads + 1] = thread
+    end
+  end
+end
+
+local function getNextTimeout()
+  local timeout = INVALID_MILLIS
+  for _, thread in ipairs(runningThreads) do
+    timeout = math.min(timeout, thread.timeout)
+  end
+  return timeout
+end
+
+function simulate(handlerName, numTaps, period, holdTime)
+  now = 0
+  threads = {}
+  pendingThreads = {}
+  runningThreads = {}
+  numThreads = 0
+  maxNumThreads = 0
+  numFailures = 0
+  output = {}
+
+  assert(load(profileCode))()
+  local handler = _G[handlerName]
+
+  local events = {}
+  for tap = 0, numTaps - 1 do
+    events[#events + 1] = { tap * period, 1 }
+    events[#events + 1] = { tap * period + holdTime, 0 }
+  end
+  local endTime = numTaps * period + 2000
+
+  local start = os.clock()
+  local eventIndex = 1
+  while true do
+    local event = events[eventIndex]
+    local timeout = getNextTimeout()
+    if event and event[1] <= timeout then
+      now = event[1]
+      eventIndex = eventIndex + 1
+      local ok, message = pcall(handler, 1, 0, event[2])
+      if not ok then
+        print("handler failed: " .. tostring(message))
+        numFailures = numFailures + 1
+      end
+    elseif timeout <= endTime then
+      now = timeout
+    else
+      break
+    end
+    resumeRunning()
+    runPending()
+  end
+  local duration = os.clock() - start
+
+  for _, line in ipairs(output) do
+    print("E " .. line)
+  end
+  print(string.format("S %d %d %d %.3f", numFailures, numThreads,
+                      maxNumThreads, duration * 1000))
+end
+"""
+
+#-------------------------------------------------------------------------------
+
+def createProfile(joystickType, persistentThreads):
+    """Create the profile with the repeatable actions.
+
+    Returns a tuple of the profile and the list of the names of the keys
+    with the actions."""
+    profile = profilebench.createEmptyProfile(joystickType, "Tap stress")
+
+    keys = list(joystickType.keys)[:2]
+
+    action = SimpleAction(repeatDelay = 100)
+    action.addKeyCombination(Key.findCodeFor("KEY_A"))
+    profile.setAction(keys[0], None, [], action)
+
+    action = AdvancedAction(repeatDelay = 100)
+    action.setSection(AdvancedAction.SECTION_ENTER)
+    action.appendCommand(KeyPressCommand(Key.findCodeFor("KEY_B")))
+    action.appendCommand(DelayCommand(30))
+    action.appendCommand(KeyReleaseCommand(Key.findCodeFor("KEY_B")))
+    action.setSection(AdvancedAction.SECTION_LEAVE)
+    action.appendCommand(KeyPressCommand(Key.findCodeFor("KEY_C")))
+    action.appendCommand(KeyReleaseCommand(Key.findCodeFor("KEY_C")))
+    action.clearSection()
+    profile.setAction(keys[1], None, [], action)
+
+    profile.persistentThreads = persistentThreads
+
+    return (profilebench.reparseProfile(joystickType, profile),
+            [key.name for key in keys])
+
+#-------------------------------------------------------------------------------
+
+def getProfileLuaCode(profile):
+    """Get the Lua code of the given profile in the same form as the daemon
+    produces it from the daemon XML.
+
+    Returns a tuple of the code and a mapping of control names to the names
+    of their handler functions."""
+    document = parseString(profile.getDaemonXML())
+    topElement = document.documentElement
+
+    def getText(element):
+        return "".join([node.data for node in element.childNodes
+                        if node.nodeType==node.TEXT_NODE])
+
+    code = ""
+    handlerNames = {}
+    for element in topElement.childNodes:
+        if element.nodeType!=element.ELEMENT_NODE:
+            continue
+        if element.tagName=="prologue":
+            code += getText(element) + "\n"
+        elif element.tagName in ["key", "axis"]:
+            name = element.getAttribute("name")
+            handlerName = "_jsprog_event_%s" % (name,)
+            handlerNames[name] = handlerName
+            code += "function %s(type, code, value)\n" % (handlerName,)
+            code += getText(element)
+            code += "\nend\n"
+        elif element.tagName=="epilogue":
+            code += getText(element)
+
+    return (code, handlerNames)
+
+#-------------------------------------------------------------------------------
+
+def runScenarios(lua, joystickType, persistentThreads):
+    """Run all scenarios with the given Lua interpreter for both keys.
+
+    Returns a list of tuples of the output events and the statistics of each
+    scenario."""
+    (profile, keyNames) = createProfile(joystickType, persistentThreads)
+    (profileCode, handlerNames) = getProfileLuaCode(profile)
+
+    code = "".join(["jsprog_%s = %d\n" % (name, code)
+                    for (code, name) in enumerate(codenames.keyNames)])
+    code += "profileCode = [==========[\n" + profileCode + "]==========]\n"
+    code += harnessLuaCode
+    for keyName in keyNames:
+        for (numTaps, period, holdTime) in scenarios:
+            code += "simulate(\"%s\", %d, %d, %d)\n" % \
+                    (handlerNames[keyName], numTaps, period, holdTime)
+
+    result = subprocess.run([lua, "-"], input = code.encode(),
+                            stdout = subprocess.PIPE, check = True)
+
+    results = []
+    events = []
+    for line in result.stdout.decode().splitlines():
+        if line.startswith("E "):
+            events.append(line[2:])
+        elif line.startswith("S "):
+            words = line.split()
+            results.append((events, int(words[1]), int(words[2]),
+                            int(words[3]), float(words[4])))
+            events = []
+        else:
+            print(line)
+
+    return (keyNames, results)
+
+#-------------------------------------------------------------------------------
+
+if __name__ == "__main__":
+    lua = sys.argv[1] if len(sys.argv)>1 else os.environ.get("LUA", "lua")
+
+    joystickType = profilebench.loadJoystickType()
+
+    (keyNames, spawnResults) = runScenarios(lua, joystickType, False)
+    (_, persistentResults) = runScenarios(lua, joystickType, True)
+
+    numErrors = 0
+    index = 0
+    for keyName in keyNames:
+        for (numTaps, period, holdTime) in scenarios:
+            (spawnEvents, spawnFailures, spawnThreads, spawnMaxThreads,
+             spawnTime) = spawnResults[index]
+            (persistentEvents, persistentFailures, persistentThreads,
+             persistentMaxThreads, persistentTime) = persistentResults[index]
+            index += 1
+
+            same = spawnEvents==persistentEvents
+            print("%s: %d taps, period %d ms, held for %d ms: %d events%s" %
+                  (keyName, numTaps, period, holdTime, len(spawnEvents),
+                   "" if same else ", DIFFERENT OUTPUT"))
+            print("  spawning:   %4d threads, at most %3d at a time, %8.2f ms" %
+                  (spawnThreads, spawnMaxThreads, spawnTime))
+            print("  persistent: %4d threads, at most %3d at a time, %8.2f ms" %
+                  (persistentThreads, persistentMaxThreads, persistentTime))
+
+            if not same or spawnFailures>0 or persistentFailures>0:
+                numErrors += 1
+
+    sys.exit(1 if numErrors>0 else 0)
@@ -90,13 +90,20 @@ class RepeatableAction(Action):
     def getRepeatFlagLuaName(control):
         """Get the name of the variable containing a boolean indicating if the
         repeatable action should be executed."""
-        return "_jsprog_%s_repeat" % (control.name,)
+        return control.luaSymbols.get("repeat")
 
     @staticmethod
     def getThreadLuaName(control):
         """Get the name of the variable containing thread performing the
         action (if a thread is required)."""
-        return "_jsprog_%s_thread" % (control.name,)
+        return control.luaSymbols.get("thread")
+
+    @staticmethod
+    def getCyclesLuaName(control):
+        """Get the name of the variable containing the table of the persistent
+        thread of the control, the numbers of its enter and leave events and
+        the functions of the cycles to be executed by the thread."""
+        return control.luaSymbols.get("cycles")
 
     def __init__(self, displayName = None, repeatDelay = None):
         """Construct the action with the given repeat delay."""
@@ -127,7 +134,7 @@ class RepeatableAction(Action):
         return self.repeatDelay is not None or self.enterCodeNeedsThread or \
             self.leaveCodeNeedsThread
 
-    def getEnterLuaCode(self, control):
+    def getEnterLuaCode(self, control, cycleFunctionName = None):
         """Get the Lua code that starts the action.
 
         If the enter or the leave code requires a thread or there is repeat
@@ -140,12 +147,32 @@ class RepeatableAction(Action):
         infinite loop with the delay. Calls the child's _getLuaCode()
         function to get the code of the real action.
 
+        If cycleFunctionName is given, the control has a persistent thread
+        instead. In this case the function with the given name, containing
+        the code returned by getCycleLuaCode(), is queued for the thread, and
+        the thread is woken up. If the thread has not been started yet, or
+        it has died (e.g. due to an error in the action's code), a new
+        thread is started, which continues with the first cycle not
+        executed yet.
+
         Returns an array of lines."""
         lines = []
 
-        indentation = ""
-
-        if self.useThread:
+        if self.useThread and cycleFunctionName is not None:
+            cyclesName = RepeatableAction.getCyclesLuaName(control)
+
+            lines.append("local cycles = %s" % (cyclesName,))
+            lines.append("cycles.presses = cycles.presses + 1")
+            lines.append("cycles[cycles.presses] = %s" % (cycleFunctionName,))
+            lines.append("local thread = cycles.thread")
+            lines.append("if thread and coroutine.status(thread) ~= \"dead\" then")
+            lines.append("  jsprog_wakethread(thread)")
+            lines.append("else")
+            lines.append("  cycles.thread = jsprog_startthread(function ()")
+            lines.append("    _jsprog_cycles_run(cycles)")
+            lines.append("  end)")
+            lines.append("end")
+        elif self.useThread:
             repeatFlagName = RepeatableAction.getRepeatFlagLuaName(control)
             threadName = RepeatableAction.getThreadLuaName(control)
 
@@ -159,42 +186,10 @@ class RepeatableAction(Action):
             lines.append("    jsprog_jointhread(lastThread)")
             lines.append("  end")
 
-            if self.repeatDelay is None:
-                appendLinesIndented(lines, self._getEnterLuaCode(control), "  ")
-
-            if self.isRepeatDifferent:
-                lines.append("  local repeating = false")
-                lines.append("  while repeatFlag[1] or not repeating do")
-            else:
-                lines.append("  while repeatFlag[1] do")
-
-            if self.repeatDelay is None:
-                lines.append("    jsprog_delay(10000, true)")
-            else:
-                if self.isRepeatDifferent:
-                    lines.append("    if repeating then")
-                    appendLinesIndented(lines,
-                                        self._getRepeatLuaCode(control),
-                                        "      ")
-                    lines.append("    else")
-                    indentation = "      "
-                else:
-                    indentation = "    "
-
-                appendLinesIndented(lines, self._getEnterLuaCode(control),
-                                    indentation)
-
-                if self.isRepeatDifferent:
-                    lines.append("    end")
-                    lines.append("    repeating = true")
-
-                lines.append("    if repeatFlag[1] then")
-                lines.append("      jsprog_delay(%d, true)" %
-                             (self.repeatDelay,))
-                lines.append("    end")
-            lines.append("  end")
-
-            appendLinesIndented(lines, self._getLeaveLuaCode(control), "  ")
+            appendLinesIndented(lines,
+                                self._getThreadLuaCode(control,
+                                                       "repeatFlag[1]"),
+                                "  ")
 
             lines.append("  if %s[1] == coroutine.running() then" % (threadName,))
             lines.append("    %s = { nil }" % (threadName,))
@@ -208,16 +203,40 @@ class RepeatableAction(Action):
 
         return lines
 
-    def getLeaveLuaCode(self, control):
+    def getCycleLuaCode(self, control):
+        """Get the Lua code of the function executing one cycle of the action
+        in the persistent thread of the control.
+
+        The function has two arguments: the table of the control's cycles
+        and the index of the cycle. The action is repeated until the number
+        of the control's leave events reaches the index of the cycle.
+
+        Returns an array of lines, which is empty if the action does not
+        need a thread."""
+        if self.useThread:
+            return self._getThreadLuaCode(control, "cycles.releases<cycle")
+        else:
+            return []
+
+    def getLeaveLuaCode(self, control, persistentThread = False):
         """Get the Lua code that finishes the action.
 
         If there is a repeat delay, this function generates a call to cancel
         the previous operation. Otherwise no code is generated.
 
+        If persistentThread is True, the control has a persistent thread,
+        and the number of its leave events is incremented.
+
         Returns an array of lines."""
         lines = []
 
-        if self.useThread:
+        if self.useThread and persistentThread:
+            cyclesName = RepeatableAction.getCyclesLuaName(control)
+
+            lines.append("local cycles = %s" % (cyclesName,))
+            lines.append("cycles.releases = cycles.releases + 1")
+            lines.append("jsprog_canceldelay(cycles.thread)")
+        elif self.useThread:
             repeatFlagName = RepeatableAction.getRepeatFlagLuaName(control)
             threadName = RepeatableAction.getThreadLuaName(control)
 
@@ -228,6 +247,56 @@ class RepeatableAction(Action):
 
         return lines
 
+    def _getThreadLuaCode(self, control, repeatCondition):
+        """Get the Lua code executing the action in a thread.
+
+        repeatCondition is the Lua expression that is true as long as the
+        action should be repeated.
+
+        Returns an array of lines."""
+        lines = []
+
+        indentation = ""
+
+        if self.repeatDelay is None:
+            lines += self._getEnterLuaCode(control)
+
+        if self.isRepeatDifferent:
+            lines.append("local repeating = false")
+            lines.append("while %s or not repeating do" % (repeatCondition,))
+        else:
+            lines.append("while %s do" % (repeatCondition,))
+
+        if self.repeatDelay is None:
+            lines.append("  jsprog_delay(10000, true)")
+        else:
+            if self.isRepeatDifferent:
+                lines.append("  if repeating then")
+                appendLinesIndented(lines,
+                                    self._getRepeatLuaCode(control),
+                                    "    ")
+                lines.append("  else")
+                indentation = "    "
+            else:
+                indentation = "  "
+
+            appendLinesIndented(lines, self._getEnterLuaCode(control),
+                                indentation)
+
+            if self.isRepeatDifferent:
+                lines.append("  end")
+                lines.append("  repeating = true")
+
+            lines.append("  if %s then" % (repeatCondition,))
+            lines.append("    jsprog_delay(%d, true)" %
+                         (self.repeatDelay,))
+            lines.append("  end")
+        lines.append("end")
+
+        lines += self._getLeaveLuaCode(control)
+
+        return lines
+
     def reprRepeatDelay(self, separator = ", "):
         """Get the string representation of the repeat delay."""
         return "" if self.repeatDelay is None \
@@ -242,6 +311,18 @@ class RepeatableAction(Action):
 
 class KeyCommand(object):
     """A key press or release command"""
+    @staticmethod
+    def getKeyComboLuaCode(keyEvents):
+        """Get a line array with the Lua code sending the given key events
+        at once.
+
+        keyEvents is an iterable of tuples of a key name and a boolean
+        indicating if the key is to be pressed or released. The daemon writes
+        all the events to the output device in one go."""
+        args = [("jsprog_%s" if press else "-jsprog_%s") % (keyName,)
+                for (keyName, press) in keyEvents]
+        return ["jsprog_keycombo(%s)" % (", ".join(args),)]
+
     def __init__(self, code):
         self.code = code
 
@@ -374,8 +455,8 @@ class MouseMoveCommand(object):
         movement."""
         lines = []
 
-        lines.append("local avalue = _jsprog_%s_value - (%.f)" %
-                     (control.name, self.adjust))
+        lines.append("local avalue = %s - (%.f)" %
+                     (control.luaValueName, self.adjust))
         lines.append("local dist = %.f + %.f * avalue + %.f * avalue * avalue" %
                      (self.a, self.b, self.c))
         lines.append("jsprog_moverel(jsprog_REL_%s, dist)" %
@@ -538,31 +619,29 @@ class SimpleAction(RepeatableAction):
         def getLuaCode(self):
             """Get the Lua code to invoke this key combination.
 
+            The modifiers and the key are pressed, and then released in
+            the reverse order by a single call to the daemon.
+
             Return an array of lines."""
-            lines = []
-
-            if self.leftShift: lines.append("jsprog_presskey(jsprog_KEY_LEFTSHIFT)")
-            if self.rightShift: lines.append("jsprog_presskey(jsprog_KEY_RIGHTSHIFT)")
-            if self.leftControl: lines.append("jsprog_presskey(jsprog_KEY_LEFTCTRL)")
-            if self.rightControl: lines.append("jsprog_presskey(jsprog_KEY_RIGHTCTRL)")
-            if self.leftAlt: lines.append("jsprog_presskey(jsprog_KEY_LEFTALT)")
-            if self.rightAlt: lines.append("jsprog_presskey(jsprog_KEY_RIGHTALT)")
-            if self.leftSuper: lines.append("jsprog_presskey(jsprog_KEY_LEFTMETA)")
-            if self.rightSuper: lines.append("jsprog_presskey(jsprog_KEY_RIGHTMETA)")
-
-            lines += KeyCommand.getLuaCode(self, press = True)
-            lines += KeyCommand.getLuaCode(self, press = False)
-
-            if self.rightSuper: lines.append("jsprog_releasekey(jsprog_KEY_RIGHTMETA)")
-            if self.leftSuper: lines.append("jsprog_releasekey(jsprog_KEY_LEFTMETA)")
-            if self.rightAlt: lines.append("jsprog_releasekey(jsprog_KEY_RIGHTALT)")
-            if self.leftAlt: lines.append("jsprog_releasekey(jsprog_KEY_LEFTALT)")
-            if self.rightControl: lines.append("jsprog_releasekey(jsprog_KEY_RIGHTCTRL)")
-            if self.leftControl: lines.append("jsprog_releasekey(jsprog_KEY_LEFTCTRL)")
-            if self.rightShift: lines.append("jsprog_releasekey(jsprog_KEY_RIGHTSHIFT)")
-            if self.leftShift: lines.append("jsprog_releasekey(jsprog_KEY_LEFTSHIFT)")
-
-            return lines
+            modifiers = []
+
+            if self.leftShift: modifiers.append("KEY_LEFTSHIFT")
+            if self.rightShift: modifiers.append("KEY_RIGHTSHIFT")
+            if self.leftControl: modifiers.append("KEY_LEFTCTRL")
+            if self.rightControl: modifiers.append("KEY_RIGHTCTRL")
+            if self.leftAlt: modifiers.append("KEY_LEFTALT")
+            if self.rightAlt: modifiers.append("KEY_RIGHTALT")
+            if self.leftSuper: modifiers.append("KEY_LEFTMETA")
+            if self.rightSuper: modifiers.append("KEY_RIGHTMETA")
+
+            keyName = Key.getNameFor(self.code)
+
+            keyEvents = [(modifier, True) for modifier in modifiers]
+            keyEvents.append((keyName, True))
+            keyEvents.append((keyName, False))
+            keyEvents += [(modifier, False) for modifier in reversed(modifiers)]
+
+            return KeyCommand.getKeyComboLuaCode(keyEvents)
 
         def __eq__(self, other):
             """Determine if this key combination is equal to the given other
@@ -892,26 +971,54 @@ class AdvancedAction(RepeatableAction):
 
     def _getEnterLuaCode(self, control):
         """Get the Lua code to be executed when the control is actuated."""
-        lines = []
-        for command in self._enterCommands:
-            lines += command.getLuaCode(control)
-        return lines
+        return self._getCommandsLuaCode(self._enterCommands, control)
 
     def _getRepeatLuaCode(self, control):
         """Get the Lua code to be executed when the control is to be repeated."""
-        lines = []
-        if self._repeatCommands is not None:
-            for command in self._repeatCommands:
-                lines += command.getLuaCode(control)
-        return lines
+        if self._repeatCommands is None:
+            return []
+        else:
+            return self._getCommandsLuaCode(self._repeatCommands, control)
 
     def _getLeaveLuaCode(self, control):
         """Get the Lua code to be executed when the control is released."""
+        return self._getCommandsLuaCode(self._leaveCommands, control)
+
+    def _getCommandsLuaCode(self, commands, control):
+        """Get the Lua code for the given commands.
+
+        Consecutive key press and release commands are sent by a single
+        call to the daemon."""
         lines = []
-        for command in self._leaveCommands:
-            lines += command.getLuaCode(control)
+        keyCommands = []
+
+        for command in commands:
+            if isinstance(command, KeyPressCommand) or \
+               isinstance(command, KeyReleaseCommand):
+                keyCommands.append(command)
+            else:
+                lines += AdvancedAction._getKeyCommandsLuaCode(keyCommands,
+                                                               control)
+                keyCommands = []
+                lines += command.getLuaCode(control)
+
+        lines += AdvancedAction._getKeyCommandsLuaCode(keyCommands, control)
+
         return lines
 
+    @staticmethod
+    def _getKeyCommandsLuaCode(keyCommands, control):
+        """Get the Lua code for the given sequence of key commands."""
+        if len(keyCommands)>1:
+            return KeyCommand.getKeyComboLuaCode(
+                [(Key.getNameFor(command.code),
+                  isinstance(command, KeyPressCommand))
+                 for command in keyCommands])
+        elif keyCommands:
+            return keyCommands[0].getLuaCode(control)
+        else:
+            return []
+
     def _extendXML(self, document, element):
         """Extend the given element with specific data."""
         super(AdvancedAction, self)._extendXML(document, element)
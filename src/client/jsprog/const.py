@@ -23,4 +23,17 @@ dbusListenerInterfaceName = "hu.varadiistvan.JSProgListener"
 ## The name of the D-Bus interface
 dbusInterfacePath = "/hu/varadiistvan/JSProg"
 
+## The name of the D-Bus interface of the signals about the control events
+dbusMonitorInterfaceName = "hu.varadiistvan.JSProgMonitor"
+
+## The prefix of the object paths of the signals about the control events. It
+## is followed by a slash and the ID of the joystick.
+dbusMonitorPathPrefix = "/hu/varadiistvan/JSProg/joysticks"
+
+## The type of the key events in a batch of control events (EV_KEY)
+CONTROL_EVENT_KEY = 1
+
+## The type of the axis events in a batch of control events (EV_ABS)
+CONTROL_EVENT_AXIS = 3
+
 #-------------------------------------------------------------------------------
@@ -9,6 +9,7 @@
 
 from .joystick import Joystick, JoystickIdentity, Key, Axis
 from .parser import BaseHandler, VirtualControl, VirtualState, Control
+from .util import getContentHash, getFileHash
 
 from xml.sax import make_parser
 from xml.dom.minidom import getDOMImplementation
@@ -19,6 +20,26 @@ import sys
 
 class DeviceHandler(BaseHandler):
     """XML content handler for a device file."""
+    _topLevelElement = "joystick"
+
+    @classmethod
+    def _getElementHandlers(clazz):
+        """Get the element handlers of the class."""
+        handlers = super(DeviceHandler, clazz)._getElementHandlers()
+        del handlers["uniq"]
+        del handlers["phys"]
+        handlers.update({
+            "displayName": (("key", "axis"),
+                            "_startDisplayName", "_endDisplayName"),
+            "icon": (("joystick",), "_startIcon", None),
+            "indicatorIcon": (("joystick",), "_startIndicatorIcon", None),
+            "views": (("joystick",), "_startViews", None),
+            "view": (("views",), "_startView", "_endView"),
+            "hotspot": (("view",), "_startHotspot", "_endHotspot"),
+            "dot": (("hotspot",), "_startDot", None)
+        })
+        return handlers
+
     def __init__(self, joystickTypeClass, *jsTypeCtorArgs):
         """Construct the parser."""
         super(DeviceHandler, self).__init__(deviceVersionNeeded = False)
@@ -41,45 +62,6 @@ class DeviceHandler(BaseHandler):
         super(DeviceHandler, self).startDocument()
         self._joystickType = None
 
-    def doStartElement(self, name, attrs):
-        """Called for each start tag."""
-        if name=="displayName":
-            self._checkParent(name, "key", "axis")
-            self._startDisplayName(attrs)
-        elif name in ["uniq", "phys"]:
-            self._fatal("unhandled tag")
-        elif name=="icon":
-            self._checkParent(name, "joystick")
-            self._startIcon(attrs)
-        elif name=="indicatorIcon":
-            self._checkParent(name, "joystick")
-            self._startIndicatorIcon(attrs)
-        elif name=="views":
-            self._checkParent(name, "joystick")
-            self._startViews(attrs)
-        elif name=="view":
-            self._checkParent(name, "views")
-            self._startView(attrs)
-        elif name=="hotspot":
-            self._checkParent(name, "view")
-            self._startHotspot(attrs)
-        elif name=="dot":
-            self._checkParent(name, "hotspot")
-            self._startDot(attrs)
-        else:
-            super(DeviceHandler, self).doStartElement(name, attrs, "joystick")
-
-    def doEndElement(self, name):
-        """Handle the end element."""
-        if name=="displayName":
-            self._endDisplayName()
-        elif name=="view":
-            self._endView()
-        elif name=="hotspot":
-            self._endHotspot()
-        else:
-            super(DeviceHandler, self).doEndElement(name, "joystick")
-
     def _startTopLevelElement(self, attrs):
         """Handle the joystick start tag."""
         if self._joystickType is not None:
@@ -353,7 +335,20 @@ class DisplayVirtualControl(VirtualControl):
     def __init__(self, name, code, owner, displayName=None):
         """Create the virtual control with the given display name."""
         super(DisplayVirtualControl, self).__init__(name, code, owner)
-        self.displayName = displayName
+        self._displayName = displayName
+
+    @property
+    def displayName(self):
+        """Get the display name of the virtual control."""
+        return self._displayName
+
+    @displayName.setter
+    def displayName(self, displayName):
+        """Set the display name of the virtual control.
+
+        The owner is notified about the change."""
+        self._displayName = displayName
+        self._owner.virtualControlRenamed(self)
 
     def findStateByDisplayName(self, name):
         """Find the virtual state with the given display name."""
@@ -577,15 +572,18 @@ class JoystickType(Joystick):
 
         Returns the joystick type object or None, if the file could not be
         parsed."""
-        parser = make_parser()
-
         handler = DeviceHandler(clazz, *args)
-        parser.setContentHandler(handler)
 
         try:
-            parser.parse(path)
+            with open(path, "rb") as f:
+                data = f.read()
+            handler.parseData(data, systemId = path)
+
+            joystickType = handler.joystickType
+            joystickType.filePath = path
+            joystickType.contentHash = getContentHash(data)
 
-            return handler.joystickType
+            return joystickType
         except Exception as e:
             print(e, file=sys.stderr)
 
@@ -633,9 +631,15 @@ class JoystickType(Joystick):
         self._indicatorIconName = None
         self._iconName = None
         self._virtualControls = []
+        self._virtualControlsByName = {}
+        self._virtualControlsByDisplayName = {}
+        self._virtualControlsByCode = {}
         self._views = []
         self._nextVirtualControlCode = -1
 
+        self.filePath = None
+        self.contentHash = None
+
     @property
     def indicatorIconName(self):
         """Get the name of the indicator icon."""
@@ -698,31 +702,53 @@ class JoystickType(Joystick):
                                                displayName = displayName)
         self._nextVirtualControlCode -= 1
         self._virtualControls.append(virtualControl)
+        self._indexVirtualControl(virtualControl)
         return virtualControl
 
     def findVirtualControl(self, name):
         """Find a virtual control with the given name."""
-        for virtualControl in self._virtualControls:
-            if virtualControl.name==name:
-                return virtualControl
+        return self._virtualControlsByName.get(name)
 
     def findVirtualControlByDisplayName(self, name):
         """Find a virtual control with the given display name."""
-        for virtualControl in self._virtualControls:
-            if virtualControl.displayName==name or \
-               (virtualControl.displayName is None and
-                virtualControl.name == name):
-                return virtualControl
+        return self._virtualControlsByDisplayName.get(name)
 
     def findVirtualControlByCode(self, code):
         """Find a virtual control with the given code."""
-        for virtualControl in self._virtualControls:
-            if virtualControl.code==code:
-                return virtualControl
+        return self._virtualControlsByCode.get(code)
 
     def removeVirtualControl(self, virtualControl):
         """Remove the given virtual control."""
         self._virtualControls.remove(virtualControl)
+        self._reindexVirtualControls()
+
+    def virtualControlRenamed(self, virtualControl):
+        """Called when the name or the display name of the given virtual
+        control has changed."""
+        self._reindexVirtualControls()
+
+    def _indexVirtualControl(self, virtualControl):
+        """Add the given virtual control to the indexes.
+
+        If another virtual control has the same name, display name or code, the
+        earlier one is kept in the corresponding index."""
+        self._virtualControlsByName.setdefault(virtualControl.name,
+                                               virtualControl)
+        displayName = virtualControl.name \
+            if virtualControl.displayName is None \
+            else virtualControl.displayName
+        self._virtualControlsByDisplayName.setdefault(displayName,
+                                                      virtualControl)
+        self._virtualControlsByCode.setdefault(virtualControl.code,
+                                               virtualControl)
+
+    def _reindexVirtualControls(self):
+        """Rebuild the indexes of the virtual controls."""
+        self._virtualControlsByName = {}
+        self._virtualControlsByDisplayName = {}
+        self._virtualControlsByCode = {}
+        for virtualControl in self._virtualControls:
+            self._indexVirtualControl(virtualControl)
 
     def findKey(self, code):
         """Find the key for the given code."""
@@ -816,6 +842,9 @@ class JoystickType(Joystick):
         with open(path, "wt") as f:
             document.writexml(f, addindent = "  ", newl = "\n")
 
+        self.filePath = path
+        self.contentHash = getFileHash(path)
+
 #------------------------------------------------------------------------------
 
 if __name__ == "__main__":
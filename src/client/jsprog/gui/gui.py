@@ -7,15 +7,20 @@ from .common import *
 from .common import _
 
 from jsprog.const import dbusInterfaceName, dbusInterfacePath, VERSION
-from jsprog.const import dbusListenerInterfaceName
-from jsprog.util import getJSProg
+from jsprog.const import dbusListenerInterfaceName, dbusMonitorInterfaceName
+from jsprog.const import CONTROL_EVENT_KEY, CONTROL_EVENT_AXIS
+from jsprog.util import getJSProg, getMonitorMatchString, getJoystickStateBuffer
+from jsprog.util import getContentHash
+from jsprog.parser import LuaSymbols
 import jsprog.joystick
 
 import dbus.service
+import dbus.exceptions
 
-import io
 import pathlib
 import os.path
+import queue
+import threading
 
 #--------------------------------------------------------------------------------
 
@@ -47,6 +52,87 @@ class JoystickListener(dbus.service.Object):
         """Called when the value of an axis has changed."""
         self._gui._axisChanged(joystickID, code, value)
 
+    @dbus.service.method(dbus_interface = dbusListenerInterfaceName,
+                         in_signature = "ua(qqix)", out_signature = "")
+    def controlEvents(self, joystickID, events):
+        """Called with a batch of control events.
+
+        Each event is a tuple of the type, the code, the value and the
+        time of the event."""
+        self._gui._controlEvents(joystickID, events)
+
+#--------------------------------------------------------------------------------
+
+class ProfileActivation(object):
+    """The state of the activation of profiles on a joystick.
+
+    An activation goes through the following states:
+    - COMPILING: the profile is being compiled, normally in the worker
+      thread,
+    - LOADING: the daemon is asked if the compiled profile is already
+      loaded, and if not, the profile is sent to it,
+    - NOTIFYING: the joystick and its menus are being updated with the
+      result, which may trigger new activation requests that are ignored,
+    - IDLE: no activation is in progress.
+
+    If activation is requested while another one is in progress, the new
+    profile is stored as pending, replacing any earlier pending one, and it
+    is activated when the current activation has completed."""
+    ## State: no activation is in progress
+    IDLE = 0
+
+    ## State: the profile is being compiled
+    COMPILING = 1
+
+    ## State: the profile is being loaded by the daemon
+    LOADING = 2
+
+    ## State: the result is being reported
+    NOTIFYING = 3
+
+    def __init__(self, id):
+        """Construct the activation state for the joystick with the given
+        ID."""
+        self.id = id
+        self.state = ProfileActivation.IDLE
+        self.profile = None
+        self.notify = True
+        self.pendingProfile = None
+        self.pendingNotify = True
+
+    def request(self, profile, notify):
+        """Request the activation of the given profile.
+
+        Returns True, if the activation can start immediately."""
+        if self.state==ProfileActivation.NOTIFYING:
+            return False
+        elif self.state==ProfileActivation.IDLE:
+            self.state = ProfileActivation.COMPILING
+            self.profile = profile
+            self.notify = notify
+            return True
+        else:
+            self.pendingProfile = profile
+            self.pendingNotify = notify
+            return False
+
+    def next(self):
+        """Go to the next pending profile, if any.
+
+        Returns True, if there is such a profile and thus the activation
+        should be restarted."""
+        profile = self.pendingProfile
+        if profile is None:
+            self.state = ProfileActivation.IDLE
+            self.profile = None
+            return False
+        else:
+            self.state = ProfileActivation.COMPILING
+            self.profile = profile
+            self.notify = self.pendingNotify
+            self.pendingProfile = None
+            return True
+
 #--------------------------------------------------------------------------------
 
 class GUI(Gtk.Application):
@@ -62,6 +148,8 @@ class GUI(Gtk.Application):
         self._extraDataDirectory = extraDataDirectory
         self._debug = debug
         self._jsprog = None
+
+        LuaSymbols.debug = debug
         self._jsWindow = None
         self._aboutDialog = None
 
@@ -74,13 +162,20 @@ class GUI(Gtk.Application):
             iconTheme.add_resource_path("/hu/varadiistvan/JSProgGUI")
 
         self._addingJoystick = False
-        self._activatingProfile = False
+        self._profileActivations = {}
+        self._profileCompilerQueue = None
+        self._profileHashSupported = True
         self._nextNotificationID = 1
         self._pendingNotifications = []
 
         self._profilesEditorWindows = {}
         self._typeEditorWindows = {}
         self._joystickMonitorListeners = {}
+        self._signalMonitor = True
+        self._batchedMonitor = True
+        self._monitorMatchStrings = {}
+        self._stateBuffers = {}
+        self._stateBufferSupported = True
 
         self._editedProfile = {}
 
@@ -100,6 +195,11 @@ class GUI(Gtk.Application):
         return os.path.join(str(pathlib.Path.home()), ".local",
                             "share", "jsprog")
 
+    @property
+    def profileCacheDirectory(self):
+        """Get the directory containing the cache of the compiled profiles."""
+        return os.path.join(self.userDataDirectory, "cache")
+
     @property
     def dataDirectories(self):
         """Get an iterator over the data directory path to be used for profiles
@@ -176,20 +276,181 @@ class GUI(Gtk.Application):
 
         self._jsWindow.present()
 
-    def _loadProfile(self, id, profile):
-        """Load the given profile to the given joystick."""
-        daemonXMLDocument = profile.getDaemonXMLDocument()
-        daemonXML = io.StringIO()
-        daemonXMLDocument.writexml(daemonXML)
+    def _compileProfile(self, activation):
+        """Start compiling the profile of the given activation.
+
+        If the profile and its joystick type are stored in files, a snapshot
+        of them is compiled in the worker thread, which is started when first
+        needed (see JoystickType.compileProfileSnapshot()). In this way, the
+        profile shared with the rest of the GUI is not accessed by the worker
+        thread. Otherwise the profile is compiled in the main thread."""
+        joystickType = self._joysticks[activation.id].type
+        snapshot = joystickType.getProfileSnapshot(activation.profile)
+        if snapshot is None:
+            self._compileProfileDirectly(activation)
+            return
 
-        joystick = self._joysticks[id]
+        if self._profileCompilerQueue is None:
+            self._profileCompilerQueue = queue.Queue()
+            thread = threading.Thread(target = self._runProfileCompiler,
+                                      name = "profile compiler",
+                                      daemon = True)
+            thread.start()
+
+        self._profileCompilerQueue.put((activation, snapshot))
+
+    def _runProfileCompiler(self):
+        """Compile the profile snapshots put into the compiler queue.
+
+        This is run in a worker thread. The results are passed back to the
+        main loop."""
+        while True:
+            (activation, snapshot) = self._profileCompilerQueue.get()
+            try:
+                daemonXML = JoystickType.compileProfileSnapshot(snapshot)
+                GLib.idle_add(self._snapshotCompiled, activation, daemonXML,
+                              None)
+            except Exception as e:
+                GLib.idle_add(self._snapshotCompiled, activation, None, e)
+
+    def _snapshotCompiled(self, activation, daemonXML, exc):
+        """Called in the main loop when the snapshot of the profile of the
+        given activation has been compiled into the given daemon XML, or the
+        compilation has failed with the given exception.
+
+        In the latter case the profile is compiled in the main thread, so that
+        a profile that cannot be loaded is handled properly."""
+        if self._profileActivations.get(activation.id) is not activation:
+            return False
+
+        if activation.pendingProfile is not None:
+            self._finishProfileActivation(activation, None)
+        elif exc is not None:
+            print("Failed to compile the snapshot of profile '%s': %s" %
+                  (activation.profile.name, exc), file=sys.stderr)
+            self._compileProfileDirectly(activation)
+        else:
+            self._profileCompiled(activation, daemonXML)
+
+        return False
+
+    def _compileProfileDirectly(self, activation):
+        """Compile the profile of the given activation in the main thread.
+
+        If the body of the profile cannot be loaded, or the profile cannot be
+        compiled, the activation is finished with the error."""
+        joystickType = self._joysticks[activation.id].type
+        profile = activation.profile
+
+        try:
+            joystickType.loadProfileBody(profile)
+            daemonXML = profile.getDaemonXML()
+        except Exception as e:
+            self._finishProfileActivation(activation, e)
+            return
+
+        self._profileCompiled(activation, daemonXML)
+
+    def _profileCompiled(self, activation, daemonXML):
+        """Called when the profile of the given activation has been compiled
+        into the given daemon XML.
+
+        If the daemon supports it, it is asked whether the profile is already
+        loaded, otherwise the profile is loaded."""
+        profile = activation.profile
+
+        activation.state = ProfileActivation.LOADING
+        if self._profileHashSupported:
+            profileHash = getContentHash(daemonXML.encode("utf-8"))
+            self._jsprog.isProfileLoaded(
+                activation.id, profileHash,
+                reply_handler = lambda loaded:
+                    self._profileChecked(activation, profile, daemonXML,
+                                         loaded),
+                error_handler = lambda e:
+                    self._profileCheckFailed(activation, profile,
+                                             daemonXML, e))
+        else:
+            self._loadProfile(activation, profile, daemonXML)
+
+    def _profileChecked(self, activation, profile, daemonXML, loaded):
+        """Called when the daemon has replied whether the given profile of the
+        given activation is already loaded.
+
+        If so, the activation is finished, otherwise the profile is
+        loaded."""
+        if self._profileActivations.get(activation.id) is not activation:
+            return
+
+        if loaded or activation.pendingProfile is not None:
+            if loaded:
+                print("Profile '%s' is already loaded for joystick %d" %
+                      (profile.name, activation.id))
+            self._finishProfileActivation(activation, None)
+        else:
+            self._loadProfile(activation, profile, daemonXML)
 
+    def _profileCheckFailed(self, activation, profile, daemonXML, exc):
+        """Called when the daemon could not tell if the given profile of the
+        given activation is already loaded.
+
+        The profile is loaded anyway. If the daemon does not support the
+        check, it is not attempted anymore."""
+        if exc.get_dbus_name()=="org.freedesktop.DBus.Error.UnknownMethod":
+            self._profileHashSupported = False
+        else:
+            print("Failed to check if the profile is loaded:", exc,
+                  file=sys.stderr)
+
+        self._profileChecked(activation, profile, daemonXML, False)
+
+    def _loadProfile(self, activation, profile, daemonXML):
+        """Load the given compiled profile of the given activation."""
+        joystick = self._joysticks[activation.id]
         print("Loading profile '%s' for joystick %s (%d)" %
-              (profile.name, joystick.identity, id))
-        #print(daemonXML.getvalue())
+              (profile.name, joystick.identity, activation.id))
+        #print(daemonXML)
+
+        self._jsprog.loadProfile(
+            activation.id, daemonXML,
+            reply_handler = lambda success:
+                self._profileLoaded(activation, success),
+            error_handler = lambda e:
+                self._finishProfileActivation(activation, e))
+
+    def _profileLoaded(self, activation, success):
+        """Called when the daemon has replied to the loading of the profile of
+        the given activation."""
+        if success:
+            self._finishProfileActivation(activation, None)
+        else:
+            self._finishProfileActivation(
+                activation,
+                Exception("The daemon failed to process the profile."))
+
+    def _finishProfileActivation(self, activation, exc):
+        """Finish the activation of the current profile of the given
+        activation.
+
+        If there is no pending profile, the joystick is updated with the
+        result, i.e. whether the profile could be activated or failed to do
+        so with the given exception. Then the pending profile, if any, is
+        activated."""
+        if self._profileActivations.get(activation.id) is not activation:
+            return
 
-        if not self._jsprog.loadProfile(id, daemonXML.getvalue()):
-            raise Exception("The daemon failed to process the profile.")
+        if activation.pendingProfile is None:
+            joystick = self._joysticks[activation.id]
+            profile = activation.profile
+
+            activation.state = ProfileActivation.NOTIFYING
+            if exc is None:
+                joystick.setActiveProfile(profile, notify = activation.notify)
+            else:
+                joystick.profileDownloadFailed(profile, exc)
+
+        if activation.next():
+            self._compileProfile(activation)
 
     def showProfilesEditor(self, id):
         """Show the profiles editor window for the type of the given joystick."""
@@ -290,9 +551,7 @@ class GUI(Gtk.Application):
         if not listeners:
             for joystick in self._joysticks.values():
                 if joystick.type is joystickType:
-                    self._jsprog.startMonitor(joystick.id,
-                                              self._jsListenerBusName.get_name(),
-                                              self._jsListenerPath)
+                    self._startMonitor(joystick.id)
 
         if listeners is None:
             self._joystickMonitorListeners[joystickType] = [listener]
@@ -308,7 +567,11 @@ class GUI(Gtk.Application):
 
         for joystick in self._joysticks.values():
             if joystick.type is joystickType:
-                states.append(self._jsprog.getJoystickState(joystick.id))
+                stateBuffer = self._getStateBuffer(joystick.id)
+                if stateBuffer is None:
+                    states.append(self._jsprog.getJoystickState(joystick.id))
+                else:
+                    states.append(stateBuffer.getState())
 
         return states
 
@@ -327,34 +590,28 @@ class GUI(Gtk.Application):
         if not listeners:
             for joystick in self._joysticks.values():
                 if joystick.type is joystickType:
-                    self._jsprog.stopMonitor(joystick.id,
-                                             self._jsListenerPath)
+                    self._stopMonitor(joystick.id)
             del self._joystickMonitorListeners[joystickType]
 
         return True
 
     def activateProfile(self, id, profile):
-        """Active the given profile on the joystick with the given ID.
+        """Activate the given profile on the joystick with the given ID.
 
-        If no activation is in progress, the activation request is propagated
-        to the various menus, and the profile is downloaded to the joystick."""
+        The profile is compiled, normally in a worker thread, and then
+        downloaded to the joystick asynchronously. When done, the result is
+        propagated to the various menus. If an activation is already in
+        progress for the joystick, the profile will be activated after it,
+        unless another profile is requested in the meantime."""
         if id not in self._joysticks:
             return
 
-        if self._activatingProfile:
-            return
+        activation = self._profileActivations.get(id)
+        if activation is None:
+            activation = self._profileActivations[id] = ProfileActivation(id)
 
-        self._activatingProfile = True
-
-        joystick = self._joysticks[id]
-
-        try:
-            self._loadProfile(id, profile)
-            joystick.setActiveProfile(profile, notify = not self._addingJoystick)
-        except Exception as e:
-            joystick.profileDownloadFailed(profile, e)
-
-        self._activatingProfile = False
+        if activation.request(profile, not self._addingJoystick):
+            self._compileProfile(activation)
 
     def sendNotify(self, summary, body = None, timeout = 30,
                    priority = None, icon = None):
@@ -423,9 +680,7 @@ class GUI(Gtk.Application):
             self._addingJoystick = False
 
         if joystickType in self._joystickMonitorListeners:
-            self._jsprog.startMonitor(id,
-                                      self._jsListenerBusName.get_name(),
-                                      self._jsListenerPath)
+            self._startMonitor(id)
 
     def _removeJoystick(self, id):
         """Remove the joystick with the given ID."""
@@ -441,6 +696,16 @@ class GUI(Gtk.Application):
         elif len(joysticks)==1:
             joysticks[0].simplifyDisplayedNames()
 
+        matchString = self._monitorMatchStrings.pop(id, None)
+        if matchString is not None:
+            self._connection.remove_match_string(matchString)
+
+        self._profileActivations.pop(id, None)
+
+        stateBuffer = self._stateBuffers.pop(id, None)
+        if stateBuffer is not None:
+            stateBuffer.close()
+
         joystick.destroy()
         del self._joysticks[id]
 
@@ -459,12 +724,102 @@ class GUI(Gtk.Application):
             else:
                 print(message)
                 return True
+        elif message.get_interface()==dbusMonitorInterfaceName:
+            if message.get_member()=="controlEvents":
+                args = message.get_args_list()
+                self._controlEvents(args[0], args[1])
+            return True
         elif message.get_interface()==dbusListenerInterfaceName:
             return True
         else:
             print(message)
             return True
 
+    def _getStateBuffer(self, id):
+        """Get the state buffer of the joystick with the given ID.
+
+        It is requested from the daemon when first needed. If the daemon
+        does not support it or it is not available, None is returned."""
+        stateBuffer = self._stateBuffers.get(id)
+        if stateBuffer is None and self._stateBufferSupported:
+            try:
+                stateBuffer = getJoystickStateBuffer(self._jsprog, id)
+                self._stateBuffers[id] = stateBuffer
+            except dbus.exceptions.DBusException as e:
+                if e.get_dbus_name()=="org.freedesktop.DBus.Error.UnknownMethod":
+                    self._stateBufferSupported = False
+                else:
+                    print("Failed to get the state buffer of joystick %d: %s" %
+                          (id, e), file=sys.stderr)
+            except ValueError as e:
+                print("Invalid state buffer for joystick %d: %s" % (id, e),
+                      file=sys.stderr)
+        return stateBuffer
+
+    def _startMonitor(self, id):
+        """Start monitoring the joystick with the given ID.
+
+        The events are requested as signals emitted by the daemon. If the
+        daemon does not support it, they are requested to be sent to our
+        listener in batches, or if that is not supported either, one by
+        one."""
+        if self._signalMonitor:
+            matchString = getMonitorMatchString(id)
+            self._connection.add_match_string(matchString)
+            try:
+                if self._jsprog.startSignalMonitor(id):
+                    self._monitorMatchStrings[id] = matchString
+                    return True
+                self._connection.remove_match_string(matchString)
+                return False
+            except dbus.exceptions.DBusException as e:
+                self._connection.remove_match_string(matchString)
+                if e.get_dbus_name()!="org.freedesktop.DBus.Error.UnknownMethod":
+                    raise
+                self._signalMonitor = False
+
+        if self._batchedMonitor:
+            try:
+                return self._jsprog.startBatchedMonitor(id,
+                                                        self._jsListenerBusName.get_name(),
+                                                        self._jsListenerPath)
+            except dbus.exceptions.DBusException as e:
+                if e.get_dbus_name()!="org.freedesktop.DBus.Error.UnknownMethod":
+                    raise
+                self._batchedMonitor = False
+
+        return self._jsprog.startMonitor(id,
+                                         self._jsListenerBusName.get_name(),
+                                         self._jsListenerPath)
+
+    def _stopMonitor(self, id):
+        """Stop monitoring the joystick with the given ID."""
+        matchString = self._monitorMatchStrings.pop(id, None)
+        if matchString is None:
+            self._jsprog.stopMonitor(id, self._jsListenerPath)
+        else:
+            self._jsprog.stopSignalMonitor(id)
+            self._connection.remove_match_string(matchString)
+
+    def _controlEvents(self, joystickID, events):
+        """Called when a batch of control events has arrived for the given
+        joystick."""
+        joystick = self._joysticks.get(joystickID)
+        if joystick is not None:
+            listeners = self._joystickMonitorListeners.get(joystick.type)
+            if listeners:
+                for (type, code, value, _timestamp) in events:
+                    if type==CONTROL_EVENT_KEY:
+                        if value:
+                            for listener in listeners:
+                                listener.keyPressed(code)
+                        else:
+                            for listener in listeners:
+                                listener.keyReleased(code)
+                    elif type==CONTROL_EVENT_AXIS:
+                        for listener in listeners:
+                            listener.axisChanged(code, value)
+
     def _keyPressed(self, joystickID, code):
         """Called when a key has been pressed on the given joystick."""
         joystick = self._joysticks.get(joystickID)
@@ -10,8 +10,10 @@ import jsprog.joystick
 from jsprog.joystick import Key, Axis
 import jsprog.device
 import jsprog.parser
-from jsprog.parser import Control, VirtualControl
-from jsprog.profile import Profile
+from jsprog.parser import Control, VirtualControl, LuaSymbols
+from jsprog.profile import Profile, ProfileMatchIndex, ProfileHandler
+from jsprog.const import VERSION
+from jsprog.util import getContentHash, getFileHash
 
 import pathlib
 
@@ -76,6 +78,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
                     joystickType.addAxis(axis.code, axis.minimum, axis.maximum)
 
             joystickType._loadProfiles()
+            joystickType._monitorDeviceDirectories()
 
             JoystickType._instances[inputID] = joystickType
         else:
@@ -118,6 +121,13 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         return JoystickType.getDeviceDirectoryFor(gui.userDataDirectory,
                                                   identity)
 
+    @staticmethod
+    def getProfileCacheDirectory(gui, identity):
+        """Get the directory of the compiled profiles of the joystick type with
+        the given identity."""
+        return JoystickType.getDeviceDirectoryFor(gui.profileCacheDirectory,
+                                                  identity)
+
     def __init__(self, identity, gui):
         """Construct a joystick type for the given identity."""
         super().__init__(identity)
@@ -128,8 +138,11 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         self.userDefined = False
 
         self._profiles = []
+        self._autoLoadProfileIndex = None
         self._changed = False
 
+        self._directoryMonitors = []
+
         self._icon = None
         self._indicatorIconPath = None
         self._indicatorIcon = None
@@ -386,6 +399,15 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
 
         return virtualControl
 
+    def virtualControlRenamed(self, virtualControl):
+        """Called when the name or the display name of the given virtual
+        control has changed.
+
+        The cached Lua code of the profiles is invalidated as well."""
+        super().virtualControlRenamed(virtualControl)
+        for profile in self._profiles:
+            profile.joystickVirtualControlRenamed(virtualControl)
+
     def setVirtualControlDisplayName(self, virtualControl, newName):
         """Try to set the name of the given virtual control.
 
@@ -412,7 +434,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         It will be removed from the profiles as well."""
         super().removeVirtualControl(virtualControl)
 
-        for profile in self._profiles:
+        for profile in self._iterValidProfiles():
             if profile.joystickVirtualControlRemoved(virtualControl):
                 yield profile
 
@@ -482,7 +504,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         so, False is returned. Otherwise the change is performed and the
         virtualState-added signal is emitted."""
         if self._newVirtualState(virtualControl, virtualState):
-            for profile in self._profiles:
+            for profile in self._iterValidProfiles():
                 if profile.virtualStateAdded(virtualControl, virtualState):
                     self._saveProfile(profile)
 
@@ -521,6 +543,9 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
 
         The virtualState-constraints-changed signal is emitted."""
         if self._setVirtualStateConstraints(virtualControl, virtualState, newConstraints):
+            for profile in self._iterValidProfiles():
+                profile.virtualControlChanged(virtualControl)
+
             self._changed = True
             self.save()
             self.emit("virtualState-constraints-changed",
@@ -533,7 +558,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         The virtualState-moved-forward signal will be emitted and any modified
         profiles will be saved."""
         if virtualControl.moveStateForward(virtualState):
-            for profile in self._profiles:
+            for profile in self._iterValidProfiles():
                 if profile.virtualStateMovedForward(virtualControl, virtualState):
                     self._saveProfile(profile)
 
@@ -552,7 +577,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         The virtualState-moved-backward signal will be emitted and any modified
         profiles will be saved."""
         if virtualControl.moveStateBackward(virtualState):
-            for profile in self._profiles:
+            for profile in self._iterValidProfiles():
                 if profile.virtualStateMovedBackward(virtualControl, virtualState):
                     self._saveProfile(profile)
 
@@ -569,7 +594,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
 
         The virtualState-removed signal is emitted."""
         virtualControl.removeState(virtualState)
-        for profile in self._profiles:
+        for profile in self._iterValidProfiles():
             if profile.virtualStateRemoved(virtualControl, virtualState):
                 self._saveProfile(profile)
 
@@ -636,7 +661,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         virtual control.
 
         The profiles are checked for any hard references."""
-        for profile in self._profiles:
+        for profile in self._iterValidProfiles():
             if profile.hasHardVirtualControlReference(control):
                 return True
 
@@ -647,7 +672,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         state of a virtual control.
 
         The profiles are checked for any hard references."""
-        for profile in self._profiles:
+        for profile in self._iterValidProfiles():
             if profile.hasHardVirtualStateReference(control, virtualStateValue):
                 return True
 
@@ -658,7 +683,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         virtual control.
 
         The profiles are checked for any soft references."""
-        for profile in self._profiles:
+        for profile in self._iterValidProfiles():
             if profile.hasSoftControlReference(control):
                 return True
 
@@ -669,25 +694,261 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         virtual state of a virtual control.
 
         The profiles are checked for any soft references."""
-        for profile in self._profiles:
+        for profile in self._iterValidProfiles():
             if profile.hasSoftVirtualStateReference(control, virtualStateValue):
                 return True
 
         return False
 
+    def _iterValidProfiles(self):
+        """Iterate over the profiles the bodies of which could be loaded.
+
+        The profiles failing to load are removed (see loadProfileBody())."""
+        for profile in list(self._profiles):
+            try:
+                self.loadProfileBody(profile)
+            except Exception:
+                continue
+            yield profile
+
     def _loadProfiles(self):
         """Load the profiles for this joystick type."""
         self._profiles = []
+        self._autoLoadProfileIndex = None
 
         for (path, directoryType) in self.getDeviceDirectories(self._gui,
                                                                self.identity):
             if os.path.isdir(path):
-                for profile in Profile.loadFrom(self, path):
+                indexPath = self._getProfileIndexPath(directoryType)
+                for profile in Profile.loadFrom(self, path, lazy = True,
+                                                indexPath = indexPath):
                     score = profile.match(self.identity)
                     if score>0:
                         profile.directoryType = directoryType
                         self._profiles.append(profile)
 
+    def _monitorDeviceDirectories(self):
+        """Start monitoring the device directories for changes of the profile
+        files.
+
+        The directories are monitored even if they do not exist yet."""
+        for (path, directoryType) in self.getDeviceDirectories(self._gui,
+                                                               self.identity):
+            try:
+                monitor = Gio.File.new_for_path(path).\
+                    monitor_directory(Gio.FileMonitorFlags.WATCH_MOVES, None)
+                monitor.connect("changed", self._deviceDirectoryChanged,
+                                directoryType)
+                self._directoryMonitors.append(monitor)
+            except Exception as e:
+                print("Failed to monitor directory %s: %s" % (path, e),
+                      file=sys.stderr)
+
+    def _deviceDirectoryChanged(self, monitor, file, otherFile, eventType,
+                                directoryType):
+        """Called when a device directory of the given type has changed.
+
+        If a profile file is affected, its profile is updated."""
+        if eventType in [Gio.FileMonitorEvent.CHANGES_DONE_HINT,
+                         Gio.FileMonitorEvent.DELETED,
+                         Gio.FileMonitorEvent.MOVED_IN,
+                         Gio.FileMonitorEvent.MOVED_OUT]:
+            files = [file]
+        elif eventType==Gio.FileMonitorEvent.RENAMED:
+            files = [file, otherFile]
+        else:
+            return
+
+        for f in files:
+            path = None if f is None else f.get_path()
+            if path is not None and path.endswith(".profile"):
+                self._updateProfileFile(path, directoryType)
+
+    def _updateProfileFile(self, path, directoryType):
+        """Update the profile from the file with the given path in a device
+        directory of the given type.
+
+        If the file has been removed or it does not match the joystick
+        anymore, the profile is removed and the profile-removed signal is
+        emitted. If the file is new, the profile is added and the
+        profile-added signal is emitted. Otherwise, if the file's contents
+        differ from those the profile has been loaded from, the profile is
+        reloaded and the profile-modified signal is emitted, preceded by the
+        profile-renamed signal if its name has changed.
+
+        Only the header of the profile is parsed, the body is loaded when
+        first needed."""
+        fileName = os.path.basename(path)[:-8]
+        profile = None
+        for p in self._profiles:
+            if p.directoryType==directoryType and p.fileName==fileName:
+                profile = p
+                break
+
+        newProfile = None
+        if os.path.isfile(path):
+            try:
+                newProfile = Profile.loadFile(self, path, lazy = True)
+            except Exception as e:
+                print("Failed to load the profile from %s: %s" % (path, e),
+                      file=sys.stderr)
+                return
+
+            if profile is not None and \
+               newProfile.contentHash==profile.contentHash:
+                return
+
+            if newProfile.match(self.identity)<=0:
+                newProfile = None
+
+        self._autoLoadProfileIndex = None
+
+        if newProfile is None:
+            if profile is not None:
+                self._profiles.remove(profile)
+                self._removeCachedProfile(profile)
+                self.emit("profile-removed", profile)
+        elif profile is None:
+            newProfile.directoryType = directoryType
+            self._profiles.append(newProfile)
+            self.emit("profile-added", newProfile)
+        else:
+            oldName = profile.name
+            profile.reloadFrom(newProfile)
+            self._removeCachedProfile(profile)
+            if profile.name!=oldName:
+                self.emit("profile-renamed", profile, oldName)
+            self.emit("profile-modified", profile)
+
+    def loadProfileBody(self, profile):
+        """Make sure the body of the given profile is loaded.
+
+        If it cannot be loaded, the profile is removed, the profile-removed
+        signal is emitted and the exception is raised."""
+        try:
+            profile.loadBody()
+        except Exception as e:
+            print("Failed to load the profile '%s': %s" % (profile.name, e),
+                  file=sys.stderr)
+            if profile in self._profiles:
+                self._profiles.remove(profile)
+                self._autoLoadProfileIndex = None
+                self._removeCachedProfile(profile)
+                self.emit("profile-removed", profile)
+            raise
+
+    def getProfileSnapshot(self, profile):
+        """Get a snapshot of the given profile to be compiled by
+        compileProfileSnapshot(), possibly in another thread.
+
+        Since the profiles are saved whenever they are modified, the
+        snapshot consists of the paths and the content hashes of the files of
+        the joystick type and the profile, along with the path of the cache
+        file of the compiled profile. If the profile or the joystick type is
+        not stored in a file, None is returned."""
+        if self.filePath is None or self.contentHash is None or \
+           profile.contentHash is None:
+            return None
+
+        profilePath = self._getProfilePath(profile)
+        if profilePath is None:
+            return None
+
+        return (self.filePath, self.contentHash,
+                profilePath, profile.contentHash,
+                self._getProfileCachePath(profile))
+
+    @staticmethod
+    def compileProfileSnapshot(snapshot):
+        """Get the daemon XML of the profile in the given snapshot.
+
+        It is looked up in the cache first. If it is not found there, the
+        files of the joystick type and of the profile are parsed into new
+        objects, which are then compiled, and the result is stored in the
+        cache. If a file has changed since the snapshot was taken, ValueError
+        is raised.
+
+        This function does not access the profile or the joystick type the
+        snapshot was taken of, so it can be called from any thread."""
+        (typePath, typeHash, profilePath, profileHash, cachePath) = snapshot
+
+        key = JoystickType._computeProfileCacheKey(typeHash, profileHash)
+        daemonXML = JoystickType._readCachedDaemonXML(key, cachePath)
+        if daemonXML is not None:
+            return daemonXML
+
+        with open(typePath, "rb") as f:
+            typeData = f.read()
+        if getContentHash(typeData)!=typeHash:
+            raise ValueError("the joystick type file %s has changed" %
+                             (typePath,))
+
+        with open(profilePath, "rb") as f:
+            profileData = f.read()
+        if getContentHash(profileData)!=profileHash:
+            raise ValueError("the profile file %s has changed" %
+                             (profilePath,))
+
+        handler = jsprog.device.DeviceHandler(jsprog.device.JoystickType)
+        handler.parseData(typeData, systemId = typePath)
+
+        handler = ProfileHandler(handler.joystickType)
+        handler.parseData(profileData, systemId = profilePath)
+
+        daemonXML = handler.profile.getDaemonXML()
+
+        # The readable identifiers may have been turned on or off meanwhile
+        if JoystickType._computeProfileCacheKey(typeHash, profileHash)==key:
+            JoystickType._writeCachedDaemonXML(key, cachePath, daemonXML)
+
+        return daemonXML
+
+    @staticmethod
+    def _readCachedDaemonXML(key, path):
+        """Read the daemon XML of a profile from the cache file with the given
+        path.
+
+        If the file does not exist, or it contains the XML compiled from
+        different contents of the files (i.e. it has a key other than the
+        given one), None is returned."""
+        try:
+            with open(path, "rt", encoding = "utf-8") as f:
+                if f.readline().rstrip("\n")==key:
+                    return f.read()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print("Failed to read the cached profile from %s: %s" % (path, e),
+                  file=sys.stderr)
+
+        return None
+
+    @staticmethod
+    def _writeCachedDaemonXML(key, path, daemonXML):
+        """Write the given daemon XML of a profile into the cache file with the
+        given path along with the given key."""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            newPath = path + ".new"
+            with open(newPath, "wt", encoding = "utf-8") as f:
+                f.write(key + "\n")
+                f.write(daemonXML)
+            os.rename(newPath, path)
+        except Exception as e:
+            print("Failed to cache the compiled profile in %s: %s" % (path, e),
+                  file=sys.stderr)
+
+    def findAutoLoadProfile(self, identity):
+        """Find the auto-load profile best matching the given identity.
+
+        Returns the profile or None, if there is no matching auto-load
+        profile."""
+        if self._autoLoadProfileIndex is None:
+            self._autoLoadProfileIndex = \
+                ProfileMatchIndex([profile for profile in self._profiles
+                                   if profile.autoLoad])
+        return self._autoLoadProfileIndex.findBestMatch(identity)
+
     def findProfiles(self, name, excludeProfile = None, directoryType = None):
         """Find the profiles with the given name."""
         return [profile for profile in self._profiles
@@ -727,6 +988,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         self._saveProfile(profile)
 
         self._profiles.append(profile)
+        self._autoLoadProfileIndex = None
 
         self.emit("profile-added", profile)
 
@@ -752,6 +1014,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         profile.name = newName
 
         oldFilePath = self._getUserProfilePath(profile)
+        self._removeCachedProfile(profile)
 
         profile.fileName = newFileName
         newFilePath = self._getUserProfilePath(profile)
@@ -768,10 +1031,11 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
     def updateProfileIdentity(self, profile):
         """Called when the identity of the given profile was updated.
 
-        Only the version, the physical location or the unique ID might have
-        changed when this function is called.
+        Only the version, the physical location, the unique ID or the
+        auto-load flag might have changed when this function is called.
 
         The profile is saved."""
+        self._autoLoadProfileIndex = None
         self._saveProfile(profile)
 
     def newProfileVirtualControl(self, profile, displayName,
@@ -856,6 +1120,7 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
 
         The profile-virtualState-constraints-changed signal is emitted."""
         if self._setVirtualStateConstraints(virtualControl, virtualState, newConstraints):
+            profile.virtualControlChanged(virtualControl)
             self._saveProfile(profile)
             self.emit("profile-virtualState-constraints-changed",
                       profile, virtualControl, virtualState)
@@ -966,21 +1231,32 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         else:
             return False
 
-    def setAction(self, profile, control, state, shiftStateSequence, action):
+    def setAction(self, profile, control, state, shiftStateSequence, action,
+                  axisFilter = None):
         """Set the action belonging to the given shift state sequence and the
         given control in the given profile.
 
-        If successful, an action-set signal is emitted and the profile is
-        saved."""
-        if profile.setAction(control, state, shiftStateSequence, action):
+        If axisFilter is not None, it is a tuple of the deadband and the
+        minimal interval of the events of the control, which is an axis, to
+        be set as well.
+
+        If the action is set, an action-set signal is emitted. If anything has
+        changed, the profile is saved once."""
+        actionSet = profile.setAction(control, state, shiftStateSequence,
+                                      action)
+        filterSet = False
+        if axisFilter is not None:
+            (deadband, minInterval) = axisFilter
+            filterSet = profile.setAxisFilter(control, deadband, minInterval)
+
+        if actionSet or filterSet:
             self._saveProfile(profile)
 
+        if actionSet:
             self.emit("action-set", profile, control, state,
                       shiftStateSequence, action)
 
-            return True
-        else:
-            return False
+        return actionSet
 
     def setPrologue(self, profile, codeLines):
         """Set the prologue for the given profile."""
@@ -1005,8 +1281,10 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
             return False
 
         self._profiles.remove(profile)
+        self._autoLoadProfileIndex = None
         filePath = self._getUserProfilePath(profile)
         os.unlink(filePath)
+        self._removeCachedProfile(profile)
 
         self.emit("profile-removed", profile)
 
@@ -1081,8 +1359,61 @@ class JoystickType(jsprog.device.JoystickType, GObject.Object):
         with open(newPath, "wt") as f:
             document.writexml(f, addindent = "  ", newl = "\n")
         os.rename(newPath, path)
+
+        profile.contentHash = getFileHash(path)
+        self._removeCachedProfile(profile)
+
         self.emit("profile-modified", profile)
 
+    @staticmethod
+    def _computeProfileCacheKey(typeContentHash, profileContentHash):
+        """Compute the key identifying the compiled version of a profile in
+        the cache.
+
+        It is a hash of the program's version, the given hashes of the
+        contents of the files of the joystick type and the profile, and
+        whether the readable Lua identifiers are used."""
+        return getContentHash(("%s\n%s\n%s\n%d" %
+                               (VERSION, typeContentHash, profileContentHash,
+                                LuaSymbols.debug)).encode("utf-8"))
+
+    def _getProfilePath(self, profile):
+        """Get the path of the file of the given profile based on its
+        directory type and file name.
+
+        If the profile has no file, None is returned."""
+        if profile.fileName is None:
+            return None
+
+        for (path, directoryType) in self.getDeviceDirectories(self._gui,
+                                                               self.identity):
+            if directoryType==profile.directoryType:
+                return os.path.join(path, profile.fileName + ".profile")
+
+    def _getProfileCachePath(self, profile):
+        """Get the path of the file containing the cached compiled version of
+        the given profile."""
+        return os.path.join(JoystickType.getProfileCacheDirectory(self._gui,
+                                                                  self._identity),
+                            "%s-%s.xml" % (profile.directoryType,
+                                           profile.fileName))
+
+    def _getProfileIndexPath(self, directoryType):
+        """Get the path of the index of the headers of the profiles in the
+        device directory of the given type."""
+        return os.path.join(JoystickType.getProfileCacheDirectory(self._gui,
+                                                                  self._identity),
+                            "%s-profiles.idx" % (directoryType,))
+
+    def _removeCachedProfile(self, profile):
+        """Remove the cached compiled version of the given profile, if any."""
+        try:
+            os.unlink(self._getProfileCachePath(profile))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print("Failed to remove the cached profile:", e, file=sys.stderr)
+
     def _newVirtualState(self, virtualControl, virtualState):
         """Add the given virtual state to the given virtual control.
 
@@ -1345,18 +1676,10 @@ class ProfileList(GObject.Object):
         """Setup the profiles from the joystick type.
 
         Returns the best matching auto-load profile."""
-        autoLoadProfile = None
-        autoLoadCandidateScore = 0
-
         for profile in self._joystickType.profiles:
-            score = profile.match(self._identity)
-            if score>0:
-                self._addProfile(profile)
-                if profile.autoLoad and score>autoLoadCandidateScore:
-                    autoLoadProfile = profile
-                    autoLoadCandidateScore = score
-
-        return autoLoadProfile
+            self._addProfile(profile)
+
+        return self._joystickType.findAutoLoadProfile(self._identity)
 
     def _addProfile(self, profile):
         """Add the given profile to the list."""
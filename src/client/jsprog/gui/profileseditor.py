@@ -3915,6 +3915,55 @@ class ActionEditor(Gtk.Dialog):
         actionWidget.connect("modified", self._modified)
         contentArea.pack_start(actionWidget, True, True, 0)
 
+        self._deadband = None
+        self._minInterval = None
+        if isinstance(control, Axis):
+            axisProfile = profile.findAxisProfile(control.code)
+
+            filterBox = Gtk.Box.new(Gtk.Orientation.HORIZONTAL, 4)
+            filterBox.set_margin_start(8)
+            filterBox.set_margin_end(8)
+
+            label = Gtk.Label.new_with_mnemonic(_("Dead_band:"))
+            filterBox.pack_start(label, False, False, 4)
+
+            self._deadband = deadband = \
+                Gtk.Adjustment.new(0 if axisProfile is None
+                                   else axisProfile.deadband,
+                                   0, 65535, 1, 10, 0)
+            deadband.connect("value-changed", self._filterModified)
+            deadbandButton = Gtk.SpinButton.new(deadband, 2, 0)
+            deadbandButton.set_alignment(1.0)
+            deadbandButton.set_tooltip_text(
+                _("If the value of the axis changes by no more than this "
+                  "amount compared to the last value processed, the change "
+                  "is ignored. This can be used to filter out the noise of "
+                  "the axis. It applies to all shift states."))
+            label.set_mnemonic_widget(deadbandButton)
+            filterBox.pack_start(deadbandButton, False, False, 4)
+
+            label = Gtk.Label.new_with_mnemonic(_("Minimal inter_val:"))
+            filterBox.pack_start(label, False, False, 4)
+
+            self._minInterval = minInterval = \
+                Gtk.Adjustment.new(0 if axisProfile is None
+                                   else axisProfile.minInterval,
+                                   0, 10000, 1, 10, 0)
+            minInterval.connect("value-changed", self._filterModified)
+            minIntervalButton = Gtk.SpinButton.new(minInterval, 2, 0)
+            minIntervalButton.set_alignment(1.0)
+            minIntervalButton.set_tooltip_text(
+                _("The events of the axis arriving sooner than this after "
+                  "the last processed one are ignored. It applies to all "
+                  "shift states."))
+            label.set_mnemonic_widget(minIntervalButton)
+            filterBox.pack_start(minIntervalButton, False, False, 4)
+
+            label = Gtk.Label.new(_("ms"))
+            filterBox.pack_start(label, False, False, 0)
+
+            contentArea.pack_start(filterBox, False, False, 4)
+
         self.set_size_request(-1, 400)
 
         self.show_all()
@@ -3926,6 +3975,16 @@ class ActionEditor(Gtk.Dialog):
         """Get the action in the the currently selected editor."""
         return self._actionWidget.action
 
+    @property
+    def axisFilter(self):
+        """Get a tuple of the deadband and the minimal interval set for the
+        axis, or None if the control is not an axis."""
+        if self._deadband is None:
+            return None
+        else:
+            return (int(self._deadband.get_value()),
+                    int(self._minInterval.get_value()))
+
     @property
     def controlAction(self):
         """Get the control and the action appropriate for the currently
@@ -3937,15 +3996,20 @@ class ActionEditor(Gtk.Dialog):
         """Setup the window from the given action."""
         (_control, action) = controlAction
 
-        self._clearButton.set_visible(
-            action is not None and action.type!=Action.TYPE_NOP)
+        self._canSave = action is not None and action.type!=Action.TYPE_NOP
+        self._clearButton.set_visible(self._canSave)
         self._actionWidget.controlAction = controlAction
         self._saveButton.set_sensitive(False)
 
     def _modified(self, actionWidget, canSave):
         """Called when the action is modified."""
+        self._canSave = canSave
         self._saveButton.set_sensitive(canSave)
 
+    def _filterModified(self, adjustment):
+        """Called when the deadband or the minimal interval is modified."""
+        self._saveButton.set_sensitive(self._canSave)
+
 #-------------------------------------------------------------------------------
 
 class ActionTooltipWindow(Gtk.Window):
@@ -4227,6 +4291,7 @@ class ActionsWidget(Gtk.DrawingArea):
             dialog.set_transient_for(profilesEditorWindow)
 
             newAction = None
+            axisFilter = None
             while True:
                 response = dialog.run()
 
@@ -4236,6 +4301,7 @@ class ActionsWidget(Gtk.DrawingArea):
                         break
                 elif response==Gtk.ResponseType.OK:
                     newAction = dialog.action
+                    axisFilter = dialog.axisFilter
                     break
                 else:
                     break
@@ -4245,7 +4311,8 @@ class ActionsWidget(Gtk.DrawingArea):
             if response==Gtk.ResponseType.OK or \
                response==ActionEditor.RESPONSE_CLEAR:
                 if joystickType.setAction(profile, control, state,
-                                          shiftStateSequence, newAction):
+                                          shiftStateSequence, newAction,
+                                          axisFilter = axisFilter):
                     self.queue_draw()
 
     def _findActionForIndexes(self, shiftStateIndex, controlStateIndex):
@@ -5343,7 +5410,21 @@ class ProfilesEditorWindow(Gtk.ApplicationWindow):
             self._profileSelector.set_active_iter(activeIter)
 
     def _profileSelectionChanged(self, comboBox):
-        """Called when the profile selection has changed."""
+        """Called when the profile selection has changed.
+
+        If the body of the selected profile cannot be loaded, an error is
+        displayed. The profile is removed from the joystick type then, which
+        causes another profile to be selected."""
+        i = self._profileSelector.get_active_iter()
+        if i is not None:
+            profile = self._profiles.get_value(i, 1)
+            try:
+                self._joystickType.loadProfileBody(profile)
+            except Exception as e:
+                errorDialog(self, _("Failed to load the profile"),
+                            secondaryText = str(e))
+                return
+
         self._activeIndex = self._profileSelector.get_active()
         self._changingProfile = True
         i = self._profileSelector.get_active_iter()
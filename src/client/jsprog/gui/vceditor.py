@@ -569,8 +569,16 @@ class VirtualStateEditor(Gtk.Dialog):
         control = constraint.control
 
         newDisplayName = self._controls.get_value(valueIter, 0)
-        newControl = Control(self._controls.get_value(valueIter, 1),
-                             self._controls.get_value(valueIter, 2))
+        newControlType = self._controls.get_value(valueIter, 1)
+        newControlCode = self._controls.get_value(valueIter, 2)
+        if newControlType==Control.TYPE_VIRTUAL:
+            newControl = \
+                self._joystickType.findVirtualControlByCode(newControlCode) \
+                if self._profile is None else \
+                self._profile.findVirtualControlByCode(newControlCode)
+            newControl = newControl.control
+        else:
+            newControl = Control(newControlType, newControlCode)
 
         if newControl.type==Control.TYPE_KEY or newControl.type==Control.TYPE_VIRTUAL:
             if control.type==Control.TYPE_KEY:
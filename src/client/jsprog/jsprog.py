@@ -4,13 +4,17 @@ from .gui import gui as gui
 
 from .joystick import Joystick, Key, Axis
 from .const import dbusInterfaceName, dbusInterfacePath
-from .util import getJSProg
+from .const import dbusMonitorInterfaceName
+from .const import CONTROL_EVENT_KEY, CONTROL_EVENT_AXIS
+from .util import getJSProg, getMonitorMatchString, getJoystickStateBuffer
+from .util import getContentHash
 from .common import *
 
 from dbus import SessionBus
 from dbus.mainloop.glib import DBusGMainLoop
 
 import dbus.service
+import dbus.exceptions
 
 import argparse
 import sys
@@ -75,11 +79,34 @@ class GetJoystickState(object):
                             help = "the identifier of the joystick")
         return parser
 
+    @staticmethod
+    def getJoystickState(jsprog, id):
+        """Get the state of the joystick with the given ID.
+
+        It is read from the state buffer of the joystick, if the daemon
+        supports it, otherwise it is queried via D-Bus."""
+        try:
+            stateBuffer = getJoystickStateBuffer(jsprog, id)
+            try:
+                return stateBuffer.getState()
+            finally:
+                stateBuffer.close()
+        except dbus.exceptions.DBusException as e:
+            if e.get_dbus_name() not in \
+               ["org.freedesktop.DBus.Error.UnknownMethod",
+                "org.freedesktop.DBus.Error.InvalidArgs"]:
+                raise
+        except ValueError as e:
+            print("Invalid state buffer: %s" % (e,), file=sys.stderr)
+
+        return jsprog.getJoystickState(id)
+
     @staticmethod
     def execute(connection, args):
         """Perform the operation"""
         jsprog = getJSProg(connection)
-        joystickState = jsprog.getJoystickState(args.id)
+        joystickState = GetJoystickState.getJoystickState(jsprog,
+                                                         int(args.id))
 
         if not joystickState:
             print("The given joystick is unknown.")
@@ -117,8 +144,25 @@ class LoadProfile(object):
                             help = "the identifier of the joystick")
         parser.add_argument(dest = "profile",
                             help = "the file containing the profile")
+        parser.add_argument("-f", "--force", action = "store_true",
+                            help = "load the profile even if it is "
+                            "already loaded")
         return parser
 
+    @staticmethod
+    def isLoaded(jsprog, id, profile):
+        """Determine if the given profile is already loaded for the joystick
+        with the given ID.
+
+        If the daemon does not support the check, False is returned."""
+        try:
+            return jsprog.isProfileLoaded(id,
+                                          getContentHash(profile.encode("utf-8")))
+        except dbus.exceptions.DBusException as e:
+            if e.get_dbus_name()!="org.freedesktop.DBus.Error.UnknownMethod":
+                raise
+            return False
+
     @staticmethod
     def execute(connection, args):
         """Load the profile."""
@@ -128,7 +172,10 @@ class LoadProfile(object):
         with open(args.profile, "rt") as f:
             profile = f.read()
 
-        if jsprog.loadProfile(id, profile):
+        if not args.force and LoadProfile.isLoaded(jsprog, id, profile):
+            print("Profile %s is already loaded for joystick %d" %
+                  (args.profile, id))
+        elif jsprog.loadProfile(id, profile):
             print("Profile %s loaded for joystick %d" % (args.profile, id))
         else:
             print("Failed to load profile %s for joystick %d" % \
@@ -182,26 +229,42 @@ class JSProgListener(dbus.service.Object):
         """Construct the listener with the given path."""
         super(JSProgListener, self).__init__(connection, path)
 
+    @staticmethod
+    def printKeyPressed(code):
+        """Print the information about a key having been pressed."""
+        print("Pressed key %d (0x%03x, %s)" % \
+              (code, code, Key.getNameFor(code)))
+
+    @staticmethod
+    def printKeyReleased(code):
+        """Print the information about a key having been released."""
+        print("Released key %d (0x%03x, %s)" % \
+              (code, code, Key.getNameFor(code)))
+
+    @staticmethod
+    def printAxisChanged(code, value):
+        """Print the information about the value of an axis having
+        changed."""
+        print("Axis %d (0x%03x, %s) changed to %d" % \
+              (code, code, Axis.getNameFor(code), value))
+
     @dbus.service.method(dbus_interface = "hu.varadiistvan.JSProgListener",
                          in_signature = "uq", out_signature = "")
     def keyPressed(self, joystickID, code):
         """Called when a key is pressed."""
-        print("Pressed key %d (0x%03x, %s)" % \
-              (code, code, Key.getNameFor(code)))
+        JSProgListener.printKeyPressed(code)
 
     @dbus.service.method(dbus_interface = "hu.varadiistvan.JSProgListener",
                          in_signature = "uq", out_signature = "")
     def keyReleased(self, joystickID, code):
         """Called when a key is released."""
-        print("Released key %d (0x%03x, %s)" % \
-              (code, code, Key.getNameFor(code)))
+        JSProgListener.printKeyReleased(code)
 
     @dbus.service.method(dbus_interface = "hu.varadiistvan.JSProgListener",
                          in_signature = "uqi", out_signature = "")
     def axisChanged(self, joystickID, code, value):
         """Called when the value of an axis has changed."""
-        print("Axis %d (0x%03x, %s) changed to %d" % \
-              (code, code, Axis.getNameFor(code), value))
+        JSProgListener.printAxisChanged(code, value)
 
 #------------------------------------------------------------------------------
 
@@ -219,18 +282,63 @@ class MonitorControls(object):
 
     @staticmethod
     def execute(connection, args):
-        """Perform the monitoring of the events."""
+        """Perform the monitoring of the events.
+
+        The events are received as signals emitted by the daemon. If the
+        daemon does not support it, a listener is registered to receive
+        them."""
+        id = int(args.id)
+        jsprog = getJSProg(connection)
+
+        connection.add_match_string(getMonitorMatchString(id))
+        connection.add_message_filter(MonitorControls.filterMessage)
+        try:
+            if jsprog.startSignalMonitor(id):
+                try:
+                    mainloop = MainLoop()
+                    mainloop.run()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    jsprog.stopSignalMonitor(id)
+            else:
+                print("Could not start monitoring the joystick, perhaps the ID is wrong.", file=sys.stderr)
+            return
+        except dbus.exceptions.DBusException as e:
+            if e.get_dbus_name()!="org.freedesktop.DBus.Error.UnknownMethod":
+                raise
+        connection.remove_message_filter(MonitorControls.filterMessage)
+        connection.remove_match_string(getMonitorMatchString(id))
+
+        MonitorControls.executeWithListener(connection, jsprog, id)
+
+    @staticmethod
+    def filterMessage(connection, message):
+        """Callback for the messages."""
+        if message.get_interface()==dbusMonitorInterfaceName and \
+           message.get_member()=="controlEvents":
+            (_joystickID, events) = message.get_args_list()
+            for (type, code, value, _timestamp) in events:
+                if type==CONTROL_EVENT_KEY:
+                    if value:
+                        JSProgListener.printKeyPressed(code)
+                    else:
+                        JSProgListener.printKeyReleased(code)
+                elif type==CONTROL_EVENT_AXIS:
+                    JSProgListener.printAxisChanged(code, value)
+
+    @staticmethod
+    def executeWithListener(connection, jsprog, id):
+        """Perform the monitoring of the events via a listener."""
         pid = os.getpid()
 
         name = dbus.service.BusName("hu.varadiistvan.JSProgListener-%d" % (pid,),
                                     connection)
 
-        jsprog = getJSProg(connection)
-
         path = "%s/%d" % (dbusInterfacePath, pid)
         listener = JSProgListener(connection, path)
 
-        if jsprog.startMonitor(int(args.id), name.get_name(), path):
+        if jsprog.startMonitor(id, name.get_name(), path):
             mainloop = MainLoop()
             mainloop.run()
         else:
@@ -2,10 +2,14 @@
 from .joystick import InputID, JoystickIdentity, Key, Axis
 
 from xml.sax.handler import ContentHandler
-from xml.sax import SAXParseException
+from xml.sax import SAXParseException, make_parser
+from xml.sax.xmlreader import InputSource
 
 from functools import total_ordering
 
+import copy
+import io
+
 #------------------------------------------------------------------------------
 
 ## @package jsprog.parser
@@ -37,6 +41,10 @@ class VirtualControlBase(object):
     A virtual control has a number of states each corresponding to a certain
     discrete, integer value starting from 0. Values of other controls determine
     which state a virtual control is in."""
+    ## The maximal number of keys, the values of which are packed into the
+    ## index of the table the value of the virtual control is looked up in.
+    MAX_NUM_LOOKUP_KEYS = 8
+
     def __init__(self):
         """Construct the object with no states."""
         self._states = []
@@ -149,7 +157,12 @@ class VirtualControlBase(object):
         can be used to query virtual controls.
 
         The state objects are created by calling stateFactory."""
-        control = Control(controlType, controlCode)
+        if controlType==Control.TYPE_VIRTUAL:
+            vc = virtualControlOwner.findVirtualControlByCode(controlCode)
+            control = vc.control
+        else:
+            control = Control(controlType, controlCode)
+
         if controlType==Control.TYPE_KEY:
             state = stateFactory()
             state.addConstraint(SingleValueConstraint(control, 0))
@@ -177,7 +190,6 @@ class VirtualControlBase(object):
                 SingleValueConstraint(control, axis.maximum))
             self.addState(state)
         elif controlType==Control.TYPE_VIRTUAL:
-            vc = virtualControlOwner.findVirtualControlByCode(controlCode)
             for vcState in vc.states:
                 state = stateFactory()
                 state.addConstraint(SingleValueConstraint(control, vcState.value))
@@ -234,13 +246,86 @@ class VirtualControlBase(object):
                 return True
         return False
 
-    def getValueLuaCode(self, profile, valueVariableName):
+    def getLookupKeys(self):
+        """Get the sorted list of the keys, the values of which determine the
+        value of the virtual control in a way that the value can be looked up
+        in a table.
+
+        This is possible, if all constraints of the states are single value
+        constraints for keys with values of 0 or 1, and there are not more than
+        MAX_NUM_LOOKUP_KEYS keys involved. Otherwise None is returned."""
+        keys = set()
+        for state in self._states:
+            for constraint in state.constraints:
+                if constraint.type!=ControlConstraint.TYPE_SINGLE_VALUE or \
+                   not constraint.control.isKey or \
+                   constraint.value not in [0, 1]:
+                    return None
+                keys.add(constraint.control)
+
+        if not keys or len(keys)>VirtualControlBase.MAX_NUM_LOOKUP_KEYS:
+            return None
+
+        return sorted(keys)
+
+    def getValueLuaTableCode(self, profile, tableName):
+        """Get the Lua code of the table the value of this virtual control can
+        be looked up in.
+
+        The table is indexed by 1 + the bitmask of the values of the keys
+        returned by getLookupKeys(), where the bit of the first key is the
+        least significant one. A key is considered pressed if its value is not
+        0. If no state matches a certain combination and there is no default
+        state, the corresponding element is nil.
+
+        If the value cannot be looked up, an empty array is returned."""
+        keys = self.getLookupKeys()
+        if keys is None:
+            return []
+
+        defaultValue = None
+        for state in self._states:
+            if state.isDefault:
+                defaultValue = state.value
+
+        values = []
+        for mask in range(0, 1<<len(keys)):
+            keyValues = { key: (mask>>index)&1
+                          for (index, key) in enumerate(keys) }
+            value = defaultValue
+            for state in self._states:
+                if not state.isDefault and \
+                   all([keyValues[constraint.control]==constraint.value
+                        for constraint in state.constraints]):
+                    value = state.value
+                    break
+            values.append("nil" if value is None else str(value))
+
+        lines = []
+        lines.append("%s = {" % (tableName,))
+        for index in range(0, len(values), 16):
+            lines.append("  " + ", ".join(values[index:index+16]) + ",")
+        lines.append("}")
+
+        return lines
+
+    def getValueLuaCode(self, profile, valueVariableName, tableName = None):
         """Get the Lua code to compute the value of this virtual control.
 
         valueVariableName is the name of the variable that should contain the
         computed value.
 
+        tableName is the name of the table produced by getValueLuaTableCode().
+        If it is given and the value can be looked up, the code looks up the
+        value in the table instead of evaluating the conditions of the states
+        one after the other.
+
         Returns an array of lines."""
+        keys = None if tableName is None else self.getLookupKeys()
+        if keys is not None:
+            return self._getValueLookupLuaCode(valueVariableName, tableName,
+                                               keys)
+
         lines = []
 
         defaultValue = None
@@ -261,6 +346,32 @@ class VirtualControlBase(object):
 
         return lines
 
+    def _getValueLookupLuaCode(self, valueVariableName, tableName, keys):
+        """Get the Lua code to look up the value of this virtual control in the
+        table with the given name using the values of the given keys."""
+        lines = []
+
+        terms = ["1"]
+        for (index, key) in enumerate(keys):
+            terms.append("(%s == 0 and 0 or %d)" % (key.luaValueName,
+                                                   1<<index))
+        lines.append("local index = " + " + ".join(terms))
+
+        hasDefault = False
+        for state in self._states:
+            if state.isDefault:
+                hasDefault = True
+
+        if hasDefault:
+            lines.append("%s = %s[index]" % (valueVariableName, tableName))
+        else:
+            lines.append("local value = %s[index]" % (tableName,))
+            lines.append("if value then")
+            lines.append("  %s = value" % (valueVariableName,))
+            lines.append("end")
+
+        return lines
+
     def getDifferenceFrom(self, other):
         """Get the difference from the given other virtual control
 
@@ -324,6 +435,7 @@ class VirtualControl(VirtualControlBase):
         self._name = name
         self._code = code
         self._owner = owner
+        self._control = None
 
     @property
     def name(self):
@@ -332,8 +444,13 @@ class VirtualControl(VirtualControlBase):
 
     @name.setter
     def name(self, name):
-        """Set the name of the control."""
+        """Set the name of the control.
+
+        The owner is notified about the change."""
         self._name = name
+        if self._control is not None:
+            self._control.nameChanged()
+        self._owner.virtualControlRenamed(self)
 
     @property
     def code(self):
@@ -348,23 +465,39 @@ class VirtualControl(VirtualControlBase):
     @property
     def control(self):
         """Get the control representing this virtual control."""
-        return Control(Control.TYPE_VIRTUAL, self._code)
+        control = self._control
+        if control is None:
+            control = self._control = Control.forVirtualControl(self)
+        return control
 
     @property
     def stateLuaVariableName(self):
         """Get the name of the variable containing the state of this
         control."""
-        return "_jsprog_virtual_%s_state" % (self._name,)
+        return self.control.luaValueName
 
     @property
     def stateLuaFunctionName(self):
         """Get the name of the function updating the state of this control."""
-        return "_jsprog_virtual_%s_updateState" % (self._name,)
+        return self.control.luaSymbols.get("updateState")
+
+    @property
+    def stateLuaTableName(self):
+        """Get the name of the table the state of this control can be looked
+        up in."""
+        return self.control.luaSymbols.get("states")
+
+    def getStateLuaTableCode(self, profile):
+        """Get the code of the table the state of this virtual control can be
+        looked up in, if possible."""
+        return super(VirtualControl, self).getValueLuaTableCode(profile,
+                                                                self.stateLuaTableName)
 
     def getStateLuaCode(self, profile):
         """Get the code computing the state of this virtual control."""
         stateName = self.stateLuaVariableName
-        return super(VirtualControl, self).getValueLuaCode(profile, stateName)
+        return super(VirtualControl, self).getValueLuaCode(profile, stateName,
+                                                           self.stateLuaTableName)
 
     def _createXMLElement(self, document):
         """Create the XML element corresponding to this virtual control."""
@@ -536,9 +669,88 @@ class VirtualState(object):
 #------------------------------------------------------------------------------
 #------------------------------------------------------------------------------
 
+class LuaSymbols(object):
+    """The identifiers of the Lua variables and functions generated for a
+    certain object, such as a control or a shift level.
+
+    An identifier is made of a prefix specific to the object and the kind of
+    the variable or function, optionally followed by an index. Each identifier
+    is computed only once for each form.
+
+    Normally short, mangled identifiers are generated, which consist of a
+    short prefix and a one-letter form of the kind. If debugging is enabled,
+    the readable identifiers are used, which contain the name of the object
+    and the kind in full."""
+    ## Indicate if the readable identifiers should be generated. The
+    ## identifiers and the Lua code generated from them are cached separately
+    ## for both forms, so it can be changed any time.
+    debug = False
+
+    # The one-letter forms of the kinds of the identifiers. As they are not
+    # digits, the mangled identifiers cannot clash even if the prefixes end
+    # in a number and an index is appended.
+    _mangledKinds = {
+        "value": "v",
+        "state": "v",
+        "update": "u",
+        "updateState": "U",
+        "states": "T",
+        "updaters": "w",
+        "enter": "e",
+        "enterFunctions": "E",
+        "leave": "l",
+        "leaveFunctions": "L",
+        "cycle": "c",
+        "cycleFunctions": "C",
+        "getShiftedState": "g",
+        "shiftedState": "s",
+        "shiftedStates": "S",
+        "lastTime": "t",
+        "repeat": "r",
+        "thread": "h",
+        "cycles": "y",
+        }
+
+    def __init__(self, readablePrefix, mangledPrefix):
+        """Construct the symbol table for the given prefixes.
+
+        The readable identifiers consist of the readable prefix, an
+        underscore and the kind, the mangled ones of the mangled prefix and
+        the one-letter kind."""
+        self._readablePrefix = readablePrefix + "_"
+        self._mangledPrefix = mangledPrefix
+        self._symbols = {}
+
+    def get(self, kind, index = None):
+        """Get the identifier of the given kind and index in the form
+        selected by LuaSymbols.debug."""
+        debug = LuaSymbols.debug
+        key = (debug, kind, index)
+        symbol = self._symbols.get(key)
+        if symbol is None:
+            if debug:
+                symbol = self._readablePrefix + kind
+            else:
+                symbol = self._mangledPrefix + LuaSymbols._mangledKinds[kind]
+            if index is not None:
+                symbol += str(index)
+            self._symbols[key] = symbol
+        return symbol
+
+#------------------------------------------------------------------------------
+#------------------------------------------------------------------------------
+
 @total_ordering
 class Control(object):
-    """A representation of a control, i.e. a key (button) or an axis."""
+    """A representation of a control, i.e. a key (button) or an axis.
+
+    The instances are flyweights. Keys and axes are interned: there is only
+    one instance for each type and code, and it is returned by the
+    constructor. A virtual control belongs to its owner (a joystick type or a
+    profile), so its instance is created by the VirtualControl object, which
+    it refers to for its name. An instance created by the constructor for a
+    virtual control is an unnamed one, which can be used for comparisons and
+    lookups, since controls are compared by their type and code."""
     ## Control type: a key
     TYPE_KEY = 1
 
@@ -548,8 +760,11 @@ class Control(object):
     ## Control type: a virtual control
     TYPE_VIRTUAL = 3
 
-    # The current joystick profile to resolve the names of virtual controls
-    _currentProfile = None
+    __slots__ = ["_type", "_code", "_hash", "_virtualControl",
+                 "_name", "_luaSymbols"]
+
+    # The interned instances indexed by their types and codes
+    _instances = {}
 
     @staticmethod
     def fromJoystickControl(jscontrol):
@@ -558,17 +773,44 @@ class Control(object):
         elif isinstance(jscontrol, Axis):
             return Control(Control.TYPE_AXIS, jscontrol.code)
         elif isinstance(jscontrol, VirtualControlBase):
-            return Control(Control.TYPE_VIRTUAL, jscontrol.code)
+            return jscontrol.control
 
     @staticmethod
-    def setProfile(profile):
-        """Set the current profile to resolve virtual controls."""
-        Control._currentProfile = profile
-
-    def __init__(self, type, code):
-        """Construct the control of the given type and code."""
+    def forVirtualControl(virtualControl):
+        """Create the control for the given virtual control.
+
+        It should be called only by the virtual control."""
+        control = object.__new__(Control)
+        control._init(Control.TYPE_VIRTUAL, virtualControl.code,
+                      virtualControl)
+        return control
+
+    def __new__(clazz, type, code):
+        """Get the instance for the control of the given type and code.
+
+        The instances are registered with setdefault(), so that the same
+        instance is returned even if several threads create it at the same
+        time."""
+        instances = Control._instances.get(type)
+        if instances is None:
+            instances = Control._instances.setdefault(type, {})
+
+        control = instances.get(code)
+        if control is None:
+            control = object.__new__(clazz)
+            control._init(type, code, None)
+            control = instances.setdefault(code, control)
+
+        return control
+
+    def _init(self, type, code, virtualControl):
+        """Initialize the control of the given type and code."""
         self._type = type
         self._code = code
+        self._hash = hash(type) ^ hash(code)
+        self._virtualControl = virtualControl
+        self._name = None
+        self._luaSymbols = None
 
     @property
     def type(self):
@@ -605,34 +847,24 @@ class Control(object):
 
     @property
     def name(self):
-        """Get the name of this control based on the code and the type."""
-        if self.isKey:
-            return Key.getNameFor(self._code)
-        elif self.isAxis:
-            return Axis.getNameFor(self._code)
-        elif self.isVirtual:
-            if Control._currentProfile is not None:
-                virtualControl = \
-                  Control._currentProfile.findVirtualControlByCode(self._code)
-                if virtualControl is not None:
-                    return "virtual_%s" % (virtualControl.name,)
-            return "virtual_%s%d" % ("" if self._code>=0 else "m",
-                                     abs(self._code),)
-        else:
-            return "unknown_%d_%s%d" % (self._type,
-                                        "" if self._code>=0 else "m",
-                                        abs(self._code))
+        """Get the name of this control based on the code and the type.
+
+        The name of a virtual control is not cached, since the virtual control
+        may be renamed."""
+        name = self._name
+        if name is None:
+            if self._virtualControl is not None:
+                return "virtual_%s" % (self._virtualControl.name,)
+            name = self._name = self._getName()
+        return name
 
     @property
     def xmlName(self):
         """Get the name of this control based on the code and the type for XML
         documents."""
         if self.isVirtual:
-            if Control._currentProfile is not None:
-                virtualControl = \
-                  Control._currentProfile.findVirtualControlByCode(self._code)
-                if virtualControl is not None:
-                    return virtualControl.name
+            if self._virtualControl is not None:
+                return self._virtualControl.name
         else:
             return self.name
 
@@ -641,14 +873,44 @@ class Control(object):
         """Get the name of the variable containing the ID of the control."""
         return "jsprog_%s" % (control.name,)
 
+    @property
+    def luaSymbols(self):
+        """Get the table of the identifiers of the Lua variables and functions
+        generated for the control."""
+        luaSymbols = self._luaSymbols
+        if luaSymbols is None:
+            code = self._code
+            if self._type==Control.TYPE_KEY:
+                mangledPrefix = "_jk%d" % (code,)
+            elif self._type==Control.TYPE_AXIS:
+                mangledPrefix = "_ja%d" % (code,)
+            elif self._type==Control.TYPE_VIRTUAL:
+                mangledPrefix = "_jv%s%d" % ("" if code>=0 else "m",
+                                             abs(code))
+            else:
+                mangledPrefix = "_ju%d_%s%d" % (self._type,
+                                                "" if code>=0 else "m",
+                                                abs(code))
+            luaSymbols = self._luaSymbols = \
+                LuaSymbols("_jsprog_" + self.name, mangledPrefix)
+        return luaSymbols
+
     @property
     def luaValueName(control):
         """Get the name of the Lua variable containing the current value of the
         control."""
         # FIXME: perhaps call the value of a virtual control also 'value'
         # instead of 'state'
-        return "_jsprog_%s_%s" % (control.name,
-                                  "state" if control.isVirtual else "value")
+        return control.luaSymbols.get("state" if control.isVirtual
+                                      else "value")
+
+    def nameChanged(self):
+        """Called when the name of the virtual control of this control has
+        changed.
+
+        The identifiers of the Lua variables and functions are recomputed when
+        next needed."""
+        self._luaSymbols = None
 
     def getConstraintXML(self, document):
         """Get the XML element for a constraint involving this control."""
@@ -659,9 +921,23 @@ class Control(object):
         element.setAttribute("name", self.xmlName)
         return element
 
+    def _getName(self):
+        """Compute the name of the control from its type and code."""
+        if self.isKey:
+            return Key.getNameFor(self._code)
+        elif self.isAxis:
+            return Axis.getNameFor(self._code)
+        elif self.isVirtual:
+            return "virtual_%s%d" % ("" if self._code>=0 else "m",
+                                     abs(self._code),)
+        else:
+            return "unknown_%d_%s%d" % (self._type,
+                                        "" if self._code>=0 else "m",
+                                        abs(self._code))
+
     def __hash__(self):
-        """Compute a hash value for the control."""
-        return hash(self._type) ^ hash(self._code)
+        """Get the hash value for the control."""
+        return self._hash
 
     def __cmp__(self, other):
         """Compare the control with the given other one."""
@@ -671,13 +947,44 @@ class Control(object):
         return x
 
     def __eq__(self, other):
-        """Equality comparison."""
-        return self.__cmp__(other)==0
+        """Equality comparison.
+
+        Interned controls are equal only to themselves, but a virtual control
+        is equal to its unnamed instance."""
+        return self is other or \
+            (self._type==Control.TYPE_VIRTUAL and
+             isinstance(other, Control) and
+             self._type==other._type and self._code==other._code)
 
     def __lt__(self, other):
         """Less-than comparison."""
         return self.__cmp__(other)<0
 
+    def __copy__(self):
+        """Copy the control, which returns the control itself."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Make a deep copy of the control.
+
+        Interned controls are not copied. The control of a virtual control is
+        copied along with the virtual control."""
+        if self._virtualControl is None:
+            return self
+
+        control = object.__new__(Control)
+        memo[id(self)] = control
+        control._init(self._type, self._code,
+                      copy.deepcopy(self._virtualControl, memo))
+        return control
+
+    def __reduce__(self):
+        """Get the data to pickle the control."""
+        if self._virtualControl is None:
+            return (Control, (self._type, self._code))
+        else:
+            return (Control.forVirtualControl, (self._virtualControl,))
+
     def __repr__(self):
         return "Control<%d, %d>" % (self.type, self.code)
 
@@ -886,10 +1193,82 @@ class ValueRangeConstraint(ControlConstraint):
 #------------------------------------------------------------------------------
 
 class BaseHandler(ContentHandler):
-    """Base XML content handler with some utility functions."""
+    """Base XML content handler with some utility functions.
+
+    The elements are dispatched via a table mapping the element names to
+    the tuple of the allowed parent elements (or None for the top-level
+    element), the start and the end handler functions (either can be None).
+    The table is built once for each child class from the method names
+    returned by _getElementHandlers()."""
+
+    ## The name of the top-level element. To be set by the child classes.
+    _topLevelElement = None
+
+    ## The extra parents (besides 'virtualControls') a virtualControl element
+    ## may have.
+    _virtualControlParents = ()
+
+    ## The extra parents (besides 'virtualControl') a virtualState element may
+    ## have.
+    _virtualStateParents = ()
+
+    @classmethod
+    def _getElementHandlers(clazz):
+        """Get the element handlers of the class.
+
+        It returns a dictionary mapping the element names to a tuple of:
+        - the tuple of the names of the allowed parent elements, or None for
+        the top-level element,
+        - the name of the start handler method, or None,
+        - the name of the end handler method, or None.
+
+        Child classes should extend the dictionary returned by this
+        implementation."""
+        topLevelElement = clazz._topLevelElement
+        return {
+            topLevelElement: (None,
+                              "_startTopLevelElement", "_endTopLevelElement"),
+            "identity": ((topLevelElement,), "_startIdentity", "_endIdentity"),
+            "inputID": (("identity",), "_startInputID", None),
+            "name": (("identity",), "_startName", "_endName"),
+            "phys": (("identity",), "_startPhys", "_endPhys"),
+            "uniq": (("identity",), "_startUniq", "_endUniq"),
+            "virtualControls": ((topLevelElement,),
+                                "_startVirtualControls", None),
+            "virtualControl": (("virtualControls",) +
+                               tuple(clazz._virtualControlParents),
+                               "_startVirtualControl", "_endVirtualControl"),
+            "virtualState": (("virtualControl",) +
+                             tuple(clazz._virtualStateParents),
+                             "_startVirtualState", "_endVirtualState"),
+            "controls": ((topLevelElement,), "_startControls", None),
+            "key": (("virtualState", "controls"), "_startKey", "_endKey"),
+            "axis": (("virtualState", "controls"), "_startAxis", "_endAxis")
+        }
+
+    @classmethod
+    def _getElementTable(clazz):
+        """Get the element dispatch table of the class.
+
+        It is built from the result of _getElementHandlers() when first
+        needed, with the method names resolved to the functions of the
+        class."""
+        table = clazz.__dict__.get("_elementTable")
+        if table is None:
+            table = {}
+            for (name, (parents, startName, endName)) in \
+                clazz._getElementHandlers().items():
+                table[name] = \
+                    (parents,
+                     None if startName is None else getattr(clazz, startName),
+                     None if endName is None else getattr(clazz, endName))
+            clazz._elementTable = table
+        return table
+
     def __init__(self, deviceVersionNeeded = True):
         """Construct the parser."""
         self._deviceVersionNeeded = deviceVersionNeeded
+        self._elementTable = self._getElementTable()
 
         self._locator = None
 
@@ -916,6 +1295,19 @@ class BaseHandler(ContentHandler):
         """Get the parent context."""
         return self._context[-1]
 
+    def parseData(self, data, systemId = None):
+        """Parse the given XML data with this handler using an xml.sax
+        parser.
+
+        systemId is the identifier of the document (e.g. the path of the
+        file containing the data) to be reported in the parse errors."""
+        source = InputSource(systemId)
+        source.setByteStream(io.BytesIO(data))
+
+        parser = make_parser()
+        parser.setContentHandler(self)
+        parser.parse(source)
+
     def setDocumentLocator(self, locator):
         """Called to set the locator."""
         self._locator = locator
@@ -931,92 +1323,45 @@ class BaseHandler(ContentHandler):
 
     def startElement(self, name, attrs):
         """Called for each start tag."""
-        self.doStartElement(name, attrs)
+        handler = self._elementTable.get(name)
+        if handler is None:
+            self._fatal("unhandled tag")
 
-        self._context.append(name)
-        if len(self._characterContext)<len(self._context):
+        (parents, start, _end) = handler
+        context = self._context
+        if parents is None:
+            if context:
+                self._fatal("'%s' should be the top-level element" % (name,))
+        elif not context or context[-1] not in parents:
+            self._fatal("tag '%s' should appear within any of %s" %
+                        (name, ",".join(parents)))
+
+        if start is not None:
+            start(self, attrs)
+
+        context.append(name)
+        if len(self._characterContext)<len(context):
             self._characterContext.append(None)
             self._keepContentsFormatting.append(None)
 
-    def doStartElement(self, name, attrs, topLevelElement,
-                       virtualControlParents = [], virtualStateParents = []):
-        """Called for each start tag."""
-        if name==topLevelElement:
-            if self._context:
-                self._fatal("'%s' should be the top-level element" % (topLevelElement,))
-            self._startTopLevelElement(attrs)
-        elif name=="identity":
-            self._checkParent(name, topLevelElement)
-            self._startIdentity(attrs)
-        elif name=="inputID":
-            self._checkParent(name, "identity")
-            self._startInputID(attrs)
-        elif name=="name":
-            self._checkParent(name, "identity")
-            self._startName(attrs)
-        elif name=="phys":
-            self._checkParent(name, "identity")
-            self._startPhys(attrs)
-        elif name=="uniq":
-            self._checkParent(name, "identity")
-            self._startUniq(attrs)
-        elif name=="virtualControls":
-            self._checkParent(name, topLevelElement)
-            self._startVirtualControls(attrs)
-        elif name=="virtualControl":
-            self._checkParent(name, "virtualControls", *virtualControlParents)
-            self._startVirtualControl(attrs)
-        elif name=="virtualState":
-            self._checkParent(name, "virtualControl", *virtualStateParents)
-            self._startVirtualState(attrs)
-        elif name=="controls":
-            self._checkParent(name, topLevelElement)
-            self._startControls(attrs)
-        elif name=="key":
-            self._checkParent(name, "virtualState", "controls")
-            self._startKey(attrs)
-        elif name=="axis":
-            self._checkParent(name, "virtualState", "controls")
-            self._startAxis(attrs)
-        else:
-            self._fatal("unhandled tag")
-
     def endElement(self, name):
         """Called for each end tag."""
         del self._context[-1]
 
-        self.doEndElement(name)
+        end = self._elementTable[name][2]
+        if end is not None:
+            end(self)
 
         del self._characterContext[-1]
         del self._keepContentsFormatting[-1]
 
-    def doEndElement(self, name, topLevelElement):
-        if name==topLevelElement:
-            self._endTopLevelElement(topLevelElement)
-        elif name=="identity":
-            self._endIdentity()
-        elif name=="name":
-            self._endName()
-        elif name=="phys":
-            self._endPhys()
-        elif name=="uniq":
-            self._endUniq()
-        elif name=="virtualControl":
-            self._endVirtualControl()
-        elif name=="virtualState":
-            self._endVirtualState()
-        elif name=="key":
-            self._endKey()
-        elif name=="axis":
-            self._endAxis()
-
     def characters(self, content):
         """Called for character content."""
         if content.strip():
             self._appendCharacters(content)
 
     def _startTopLevelElement(self, attrs):
-        """Handle the joystickProfile start tag."""
+        """Handle the top-level element start tag."""
         raise NotImplementedError()
 
     def _startIdentity(self, attrs):
@@ -1163,10 +1508,10 @@ class BaseHandler(ContentHandler):
         """Handle the axis end tag."""
         raise NotImplementedError()
 
-    def _endTopLevelElement(self, topLevelElement):
+    def _endTopLevelElement(self):
         """Handle the top-level element end tag."""
         if self._identity is None:
-            self._fatal("empty '%s' element" % (topLevelElement,))
+            self._fatal("empty '%s' element" % (self._topLevelElement,))
 
     def _startCollectingCharacters(self, keepFormatting = False):
         """Indicate that we can collect characters with the current
@@ -1191,16 +1536,6 @@ class BaseHandler(ContentHandler):
             self._fatal("characters are not allowed here")
         self._characterContext[-1] += chars
 
-    def _checkParent(self, element, *args):
-        """Check if the last element of the context is the given
-        one."""
-        for parent in args:
-            if self._context[-1]==parent:
-                return
-
-        self._fatal("tag '%s' should appear within any of %s" %
-                    (element, ",".join(args)))
-
     def _findAttribute(self, attrs, name, default = None):
         """Find the attribute with the given name.
 
@@ -3,19 +3,21 @@ from .joystick import InputID, JoystickIdentity, Key, Axis
 from .action import Action, SimpleAction, RepeatableAction, MouseMoveCommand, MouseMove
 from .action import AdvancedAction, KeyPressCommand, KeyReleaseCommand, DelayCommand
 from .action import ScriptAction, ValueRangeAction, NOPAction
-from .util import appendLinesIndented, linesToText
+from .util import appendLinesIndented, linesToText, getContentHash
 from .parser import SingleValueConstraint, ValueRangeConstraint
 from .parser import BaseHandler, checkVirtualControlName, Control
-from .parser import VirtualControlBase, VirtualState
+from .parser import VirtualControlBase, VirtualState, LuaSymbols
 from .device import DisplayVirtualControl, DisplayVirtualState
 from .common import _
 
 from xml.sax import make_parser
+from xml.sax.saxutils import escape
 from xml.dom.minidom import getDOMImplementation
 
 import os
 import sys
 import copy
+import struct
 
 from functools import total_ordering
 
@@ -27,10 +29,48 @@ from functools import total_ordering
 
 #------------------------------------------------------------------------------
 
+## The entities to replace when writing XML data in addition to the ones
+## always replaced by escape(). This is in line with how minidom writes its
+## text and attribute nodes.
+_xmlEntities = { "\"" : "&quot;" }
+
+#------------------------------------------------------------------------------
+
+## The tables of the Lua identifiers of the shift levels indexed by the
+## indexes of the levels.
+_shiftLevelLuaSymbols = {}
+
+#------------------------------------------------------------------------------
+
+def getShiftLevelLuaSymbols(index):
+    """Get the table of the Lua identifiers of a certain shift level."""
+    luaSymbols = _shiftLevelLuaSymbols.get(index)
+    if luaSymbols is None:
+        luaSymbols = _shiftLevelLuaSymbols.setdefault(
+            index,
+            LuaSymbols("_jsprog_shiftLevel_%d" % (index,), "_jl%d" % (index,)))
+    return luaSymbols
+
+#------------------------------------------------------------------------------
+
 def getShiftLevelStateName(index):
     """Get the name of the variable containing the state of a certain shift
     level."""
-    return "_jsprog_shiftLevel_%d_state" % (index,)
+    return getShiftLevelLuaSymbols(index).get("state")
+
+#------------------------------------------------------------------------------
+
+def getShiftLevelStatesTableName(index):
+    """Get the name of the table the state of a certain shift level can be
+    looked up in."""
+    return getShiftLevelLuaSymbols(index).get("states")
+
+#------------------------------------------------------------------------------
+
+def getShiftLevelUpdatersName(index):
+    """Get the name of the variable containing the set of the update functions
+    of the active controls depending on a certain shift level."""
+    return getShiftLevelLuaSymbols(index).get("updaters")
 
 #------------------------------------------------------------------------------
 
@@ -45,14 +85,70 @@ class ProfileHandler(BaseHandler):
     # Line target: epilogue
     LINE_TARGET_EPILOGUE = 2
 
-    def __init__(self, joystickType):
-        """Construct the parser."""
+    class HeaderParsed(Exception):
+        """The exception raised by a header-only handler to stop the parsing
+        when the header of the profile has been processed."""
+        pass
+
+    _topLevelElement = "joystickProfile"
+
+    _virtualControlParents = ("virtualState", "controls")
+
+    _virtualStateParents = ("shiftLevel",)
+
+    @classmethod
+    def _getElementHandlers(clazz):
+        """Get the element handlers of the class."""
+        handlers = super(ProfileHandler, clazz)._getElementHandlers()
+        handlers.update({
+            "shiftLevels": (("joystickProfile",), "_startShiftLevels", None),
+            "shiftLevel": (("shiftLevels",),
+                           "_startShiftLevel", "_endShiftLevel"),
+            "shift": (("key", "axis", "shift", "virtualState"),
+                      "_startShift", "_endShift"),
+            "valueRange": (("axis", "shift"),
+                           "_startValueRange", "_endValueRange"),
+            "action": (("key", "axis", "shift", "virtualState", "valueRange"),
+                       "_startAction", "_endAction"),
+            "keyCombination": (("action",),
+                               "_startKeyCombination", "_endKeyCombination"),
+            "enter": (("action",), "_startEnter", "_endEnter"),
+            "repeat": (("action",), "_startRepeat", "_endRepeat"),
+            "leave": (("action",), "_startLeave", "_endLeave"),
+            "keyPress": (("enter", "repeat", "leave"),
+                         "_startKeyPress", "_endKeyPress"),
+            "keyRelease": (("enter", "repeat", "leave"),
+                           "_startKeyRelease", "_endKeyRelease"),
+            "delay": (("enter", "repeat", "leave"),
+                      "_startDelay", "_endDelay"),
+            "mouseMove": (("enter", "repeat", "leave"),
+                          "_startMouseMove", None),
+            "line": (("enter", "leave", "prologue", "epilogue"),
+                     "_startLine", "_endLine"),
+            "prologue": (("joystickProfile",), None, None),
+            "epilogue": (("joystickProfile",), None, None)
+        })
+        return handlers
+
+    def __init__(self, joystickType, headerOnly = False, profile = None):
+        """Construct the parser.
+
+        If headerOnly is True, the parsing is stopped by raising a
+        HeaderParsed exception after the identity of the profile has been
+        processed.
+
+        If profile is given, the rest of the file after the identity is
+        loaded into it instead of a new profile."""
         super(ProfileHandler, self).__init__(deviceVersionNeeded = False)
 
         self._joystickType = joystickType
+        self._headerOnly = headerOnly
+        self._targetProfile = profile
 
         self._profileName = None
         self._autoLoad = False
+        self._shiftStateTables = False
+        self._persistentThreads = False
 
         self._profile = None
 
@@ -87,91 +183,6 @@ class ProfileHandler(BaseHandler):
         self._shiftLevel = None
         self._profile = None
 
-    def doStartElement(self, name, attrs):
-        """Called for each start tag."""
-        if name=="shiftLevels":
-            self._checkParent(name, "joystickProfile")
-            self._startShiftLevels(attrs)
-        elif name=="shiftLevel":
-            self._checkParent(name, "shiftLevels")
-            self._startShiftLevel(attrs)
-        elif name=="shift":
-            self._checkParent(name, "key", "axis", "shift", "virtualState")
-            self._startShift(attrs)
-        elif name=="valueRange":
-            self._checkParent(name, "axis", "shift")
-            self._startValueRange(attrs)
-        elif name=="action":
-            self._checkParent(name, "key", "axis", "shift", "virtualState",
-                              "valueRange")
-            self._startAction(attrs)
-        elif name=="keyCombination":
-            self._checkParent(name, "action")
-            self._startKeyCombination(attrs)
-        elif name=="enter":
-            self._checkParent(name, "action")
-            self._startEnter(attrs)
-        elif name=="repeat":
-            self._checkParent(name, "action")
-            self._startRepeat(attrs)
-        elif name=="leave":
-            self._checkParent(name, "action")
-            self._startLeave(attrs)
-        elif name=="keyPress":
-            self._checkParent(name, "enter", "repeat", "leave")
-            self._startKeyPress(attrs)
-        elif name=="keyRelease":
-            self._checkParent(name, "enter", "repeat", "leave")
-            self._startKeyRelease(attrs)
-        elif name=="delay":
-            self._checkParent(name, "enter", "repeat", "leave")
-            self._startDelay(attrs)
-        elif name=="mouseMove":
-            self._checkParent(name, "enter", "repeat", "leave")
-            self._startMouseMove(attrs)
-        elif name=="line":
-            self._checkParent(name, "enter", "leave", "prologue", "epilogue")
-            self._startLine(attrs)
-        elif name=="prologue":
-            self._checkParent(name, "joystickProfile")
-        elif name=="epilogue":
-            self._checkParent(name, "joystickProfile")
-        else:
-            super(ProfileHandler, self).\
-                doStartElement(name, attrs, "joystickProfile",
-                               virtualControlParents = ["virtualState", "controls"],
-                               virtualStateParents = ["shiftLevel"])
-
-    def doEndElement(self, name):
-        """Called for each end tag."""
-        if name=="shiftLevel":
-            self._endShiftLevel()
-        elif name=="shift":
-            self._endShift()
-        elif name=="valueRange":
-            self._endValueRange()
-        elif name=="action":
-            self._endAction()
-        elif name=="keyCombination":
-            self._endKeyCombination()
-        elif name=="enter":
-            self._endEnter()
-        elif name=="repeat":
-            self._endRepeat()
-        elif name=="leave":
-            self._endLeave()
-        elif name=="keyPress":
-            self._endKeyPress()
-        elif name=="keyRelease":
-            self._endKeyRelease()
-        elif name=="delay":
-            self._endDelay()
-        elif name=="line":
-            self._endLine()
-        else:
-            super(ProfileHandler, self).\
-                doEndElement(name, "joystickProfile")
-
     def endDocument(self):
         """Called at the end of the document."""
 
@@ -208,13 +219,25 @@ class ProfileHandler(BaseHandler):
             self._fatal("the profile's name should not be empty")
 
         self._autoLoad = self._findBoolAttribute(attrs, "autoLoad")
+        self._shiftStateTables = self._findBoolAttribute(attrs,
+                                                         "shiftStateTables")
+        self._persistentThreads = self._findBoolAttribute(attrs,
+                                                          "persistentThreads")
 
     def _endIdentity(self):
         """Handle the identity end tag."""
         super(ProfileHandler, self)._endIdentity()
-        self._profile = Profile(self._joystickType,
-                                self._profileName, self._identity,
-                                autoLoad = self._autoLoad)
+        if self._targetProfile is None:
+            self._profile = Profile(self._joystickType,
+                                    self._profileName, self._identity,
+                                    autoLoad = self._autoLoad,
+                                    shiftStateTables = self._shiftStateTables,
+                                    persistentThreads = self._persistentThreads)
+        else:
+            self._profile = self._targetProfile
+
+        if self._headerOnly:
+            raise ProfileHandler.HeaderParsed()
 
     def _startVirtualControls(self, attrs):
         """Handle the virtualControls start tag."""
@@ -231,7 +254,7 @@ class ProfileHandler(BaseHandler):
             super(ProfileHandler, self)._startVirtualControl(attrs)
         elif self._parent=="virtualState":
             virtualControl = self._getVirtualControl(attrs)
-            control = Control(Control.TYPE_VIRTUAL, virtualControl.code)
+            control = virtualControl.control
             constraint = self._getFromToValueConstraint(attrs, control,
                                                         minValue = 0,
                                                         maxValue =
@@ -246,7 +269,7 @@ class ProfileHandler(BaseHandler):
             shiftActive = "shiftActive" in attrs and \
                 attrs["shiftActive"] in ["yes", "true"]
 
-            self._controlProfile = VirtualControlProfile(virtualControl.code,
+            self._controlProfile = VirtualControlProfile(virtualControl.control,
                                                          shiftActive = shiftActive)
             self._controlHandlerTree = None
 
@@ -335,7 +358,17 @@ class ProfileHandler(BaseHandler):
         shiftActive = "shiftActive" in attrs and \
             attrs["shiftActive"] in ["yes", "true"]
 
-        self._controlProfile = AxisProfile(code, shiftActive = shiftActive)
+        deadband = self._findIntAttribute(attrs, "deadband", 0)
+        if deadband<0:
+            self._fatal("the deadband should not be negative")
+
+        minInterval = self._findIntAttribute(attrs, "minInterval", 0)
+        if minInterval<0:
+            self._fatal("the minimal interval should not be negative")
+
+        self._controlProfile = AxisProfile(code, shiftActive = shiftActive,
+                                           deadband = deadband,
+                                           minInterval = minInterval)
         self._controlHandlerTree = self._controlProfile.handlerTree
 
     def _startShift(self, attrs):
@@ -676,12 +709,22 @@ class ShiftLevel(VirtualControlBase):
         sl._states = [s.clone() for s in self._states]
         return sl
 
+    def getStateLuaTableCode(self, profile, levelIndex):
+        """Get the Lua code of the table the state of this shift level can be
+        looked up in, if possible.
+
+        Returns an array of lines."""
+        tableName = getShiftLevelStatesTableName(levelIndex)
+        return super(ShiftLevel, self).getValueLuaTableCode(profile, tableName)
+
     def getStateLuaCode(self, profile, levelIndex):
         """Get the Lua code to compute the state of this shift level.
 
         Returns an array of lines."""
         stateName = getShiftLevelStateName(levelIndex)
-        return super(ShiftLevel, self).getValueLuaCode(profile, stateName)
+        tableName = getShiftLevelStatesTableName(levelIndex)
+        return super(ShiftLevel, self).getValueLuaCode(profile, stateName,
+                                                       tableName)
 
     def _createXMLElement(self, document):
         """Get an XML element describing this shift level."""
@@ -1311,7 +1354,7 @@ class ControlProfile(object):
     def getUpdateLuaFunctionName(control):
         """Get the name of the function to update the shifted state of the
         given control."""
-        return "_jsprog_%s_update" % (control.name,)
+        return control.luaSymbols.get("update")
 
     @staticmethod
     def _getEnterLuaFunctionName(control, stateIndex):
@@ -1321,8 +1364,9 @@ class ControlProfile(object):
         It returns a tuple of:
         - the name of the function,
         - the name of the array containing the function objects."""
-        return ("_jsprog_%s_enter%d" % (control.name, stateIndex),
-                "_jsprog_%s_enterFunctions" % (control.name,))
+        luaSymbols = control.luaSymbols
+        return (luaSymbols.get("enter", stateIndex),
+                luaSymbols.get("enterFunctions"))
 
     @staticmethod
     def _getLeaveLuaFunctionName(control, stateIndex):
@@ -1332,8 +1376,22 @@ class ControlProfile(object):
         It returns a tuple of:
         - the name of the function,
         - the name of the array containing the function objects."""
-        return ("_jsprog_%s_leave%d" % (control.name, stateIndex),
-                "_jsprog_%s_leaveFunctions" % (control.name,))
+        luaSymbols = control.luaSymbols
+        return (luaSymbols.get("leave", stateIndex),
+                luaSymbols.get("leaveFunctions"))
+
+    @staticmethod
+    def _getCycleLuaFunctionName(control, stateIndex):
+        """Get the name of the function executing a cycle of the action of the
+        state with the given index in the persistent thread of the given
+        control.
+
+        It returns a tuple of:
+        - the name of the function,
+        - the name of the array containing the function objects."""
+        luaSymbols = control.luaSymbols
+        return (luaSymbols.get("cycle", stateIndex),
+                luaSymbols.get("cycleFunctions"))
 
     @staticmethod
     def _generateActionLuaFunction(control, stateIndex, action, context):
@@ -1349,7 +1407,8 @@ class ControlProfile(object):
         codeFun is the function to call to get the code. It has the following
         arguments:
         - the action,
-        - the control.
+        - the control,
+        - the state index.
         It returns the list of Lua code lines making up the function. If an
         empty list is returned, no function is generated.
 
@@ -1373,24 +1432,57 @@ class ControlProfile(object):
         - the extended list of booleans indicating the presence of a function
         for the corresponding state."""
         (codeFun, nameFun, lines, hasCode) = context
-        functionLines = codeFun(action, control)
+        functionLines = codeFun(action, control, stateIndex)
 
         if functionLines:
             if lines: lines.append("")
 
             (functionName, _) = nameFun(control, stateIndex)
-            lines.append("function %s()" % (functionName,))
+            if nameFun is ControlProfile._getCycleLuaFunctionName:
+                lines.append("function %s(cycles, cycle)" % (functionName,))
+            else:
+                lines.append("function %s()" % (functionName,))
             appendLinesIndented(lines, functionLines, "  ")
             lines.append("end")
 
         hasCode.append(not not functionLines)
         return (codeFun, nameFun, lines, hasCode)
 
+    @staticmethod
+    def _getCycleLuaCode(action, control, stateIndex):
+        """Get the Lua code of the function executing a cycle of the given
+        action in the persistent thread of the control."""
+        if isinstance(action, RepeatableAction):
+            return action.getCycleLuaCode(control)
+        else:
+            return []
+
+    @staticmethod
+    def _getPersistentEnterLuaCode(action, control, stateIndex):
+        """Get the Lua code for entering the state with the given index if the
+        control has a persistent thread."""
+        if isinstance(action, RepeatableAction):
+            (cycleFunctionName, _) = \
+                ControlProfile._getCycleLuaFunctionName(control, stateIndex)
+            return action.getEnterLuaCode(control,
+                                          cycleFunctionName = cycleFunctionName)
+        else:
+            return action.getEnterLuaCode(control)
+
+    @staticmethod
+    def _getPersistentLeaveLuaCode(action, control, stateIndex):
+        """Get the Lua code for leaving the state with the given index if the
+        control has a persistent thread."""
+        if isinstance(action, RepeatableAction):
+            return action.getLeaveLuaCode(control, persistentThread = True)
+        else:
+            return action.getLeaveLuaCode(control)
+
     @staticmethod
     def _getShiftedStateLuaFunctionName(control):
         """Get the name of the function to calculate the shifted state of the
         given control."""
-        return "_jsprog_%s_getShiftedState" % (control.name,)
+        return control.luaSymbols.get("getShiftedState")
 
     @staticmethod
     def _appendStateReturnLuaCode(control, stateIndex, action, acc):
@@ -1402,13 +1494,84 @@ class ControlProfile(object):
     @staticmethod
     def _getLuaShiftedStateName(control):
         """Get the name of the shifted state of the control in the Lua code."""
-        return "_jsprog_%s_shiftedState" % (control.name,)
+        return control.luaSymbols.get("shiftedState")
+
+    @staticmethod
+    def _getShiftedStatesLuaTableName(control):
+        """Get the name of the Lua table containing the shifted states of the
+        control indexed by the combined shift state."""
+        return control.luaSymbols.get("shiftedStates")
+
+    @staticmethod
+    def _maintainShiftedStatesStack(control, handler, before, stack):
+        """Maintain the stack of handlers leading to the current state while
+        folding over the states to compute the shifted states table."""
+        if before:
+            stack.append(handler)
+        else:
+            stack.pop()
+        return stack
+
+    @staticmethod
+    def _addShiftedStates(control, stateIndex, action, acc):
+        """Add the given state to the shifted states table for each combined
+        shift state covered by the handlers on the stack.
+
+        An entry of the table is a list of tuples of:
+        - the starting value of the value range the state belongs to, or None,
+          if the state does not depend on the value,
+        - the ending value of the value range, or None,
+        - the index of the state."""
+        (profile, stack, shiftedStates) = acc
+
+        indexes = [0]
+        fromValue = toValue = None
+        level = 0
+        for handler in stack:
+            if isinstance(handler, ValueRangeHandler):
+                fromValue = handler.fromValue
+                toValue = handler.toValue
+            else:
+                numStates = profile.getShiftLevel(level).numStates
+                indexes = [index * numStates + state
+                           for index in indexes
+                           for state in range(handler.fromState,
+                                              handler.toState + 1)]
+                level += 1
+
+        for index in indexes:
+            shiftedStates[index].append((fromValue, toValue, stateIndex))
+
+        return acc
+
+    @staticmethod
+    def _addShiftLevelDependency(control, handler, before, acc):
+        """Add the index of the shift level of the given handler to the set of
+        dependencies, if the handler does not cover all states of the level,
+        i.e. the shifted state depends on the level."""
+        (profile, level, levels) = acc
+        if not isinstance(handler, ShiftHandler):
+            return acc
+        elif before:
+            numStates = profile.getShiftLevel(level).numStates
+            if handler.fromState>0 or handler.toState<(numStates-1):
+                levels.add(level)
+            return (profile, level + 1, levels)
+        else:
+            return (profile, level - 1, levels)
+
+    @staticmethod
+    def _getShiftedStatesLuaValue(entries):
+        """Get the Lua representation of the given entry of a shifted states
+        table, which does not depend on the value of the control."""
+        return str(entries[0][2]) if entries else "0"
 
     def __init__(self, control, shiftActive = False):
         """Construct the profile for the given control."""
         self._control = control
         self._profile = None
         self._shiftActive = shiftActive
+        self._prologueLuaCodes = {}
 
     @property
     def control(self):
@@ -1440,7 +1603,27 @@ class ControlProfile(object):
         return self._shiftActive
 
     def getPrologueLuaCode(self, profile):
-        """Get the Lua code to put into the prologue for the control."""
+        """Get the Lua code to put into the prologue for the control.
+
+        The code is generated only if it is not cached yet, so
+        invalidateLuaCode() should be called whenever anything the code
+        depends on changes. The code is cached separately for the readable
+        and the mangled identifiers (see LuaSymbols). The returned list should
+        not be modified."""
+        debug = LuaSymbols.debug
+        prologueLuaCode = self._prologueLuaCodes.get(debug)
+        if prologueLuaCode is None:
+            prologueLuaCode = self._prologueLuaCodes[debug] = \
+                self._generatePrologueLuaCode(profile)
+        return prologueLuaCode
+
+    def invalidateLuaCode(self):
+        """Invalidate the cached Lua code of the control, so that it will be
+        generated again when it is needed next time."""
+        self._prologueLuaCodes = {}
+
+    def _generatePrologueLuaCode(self, profile):
+        """Generate the Lua code to put into the prologue for the control."""
         lines = self._getEnterLuaFunctions(profile)
         leaveLines = self._getLeaveLuaFunctions(profile)
         if leaveLines:
@@ -1490,15 +1673,31 @@ class ControlProfile(object):
 
         Returns a list of Lua code lines."""
         lines = []
-        lines.append("%s = nil" %
-                     (RepeatableAction.getRepeatFlagLuaName(self._control),))
-        lines.append("%s = { nil }" %
-                     (RepeatableAction.getThreadLuaName(self._control),))
-        lines.append("")
+        if profile.persistentThreads:
+            lines.append("%s = { presses = 0, releases = 0, cycle = 0 }" %
+                         (RepeatableAction.getCyclesLuaName(self._control),))
+            lines.append("")
+
+            (cycleLines, _) = \
+                self._getActionLuaFunctionCode(profile,
+                                               ControlProfile._getCycleLuaCode,
+                                               ControlProfile._getCycleLuaFunctionName)
+            if cycleLines:
+                lines += cycleLines
+                lines.append("")
 
-        lines += self._getActionLuaFunctions(profile,
-                                             lambda action, control:
-                                             action.getEnterLuaCode(control),
+            codeFun = ControlProfile._getPersistentEnterLuaCode
+        else:
+            lines.append("%s = nil" %
+                         (RepeatableAction.getRepeatFlagLuaName(self._control),))
+            lines.append("%s = { nil }" %
+                         (RepeatableAction.getThreadLuaName(self._control),))
+            lines.append("")
+
+            codeFun = lambda action, control, stateIndex: \
+                action.getEnterLuaCode(control)
+
+        lines += self._getActionLuaFunctions(profile, codeFun,
                                              ControlProfile._getEnterLuaFunctionName)
 
         return lines
@@ -1510,9 +1709,13 @@ class ControlProfile(object):
         profile is the joystick profile.
 
         Returns a list of Lua code lines."""
-        return self._getActionLuaFunctions(profile,
-                                           lambda action, control:
-                                           action.getLeaveLuaCode(control),
+        if profile.persistentThreads:
+            codeFun = ControlProfile._getPersistentLeaveLuaCode
+        else:
+            codeFun = lambda action, control, stateIndex: \
+                action.getLeaveLuaCode(control)
+
+        return self._getActionLuaFunctions(profile, codeFun,
                                            ControlProfile._getLeaveLuaFunctionName)
 
     def _getActionLuaFunctions(self, profile, codeFun, nameFun):
@@ -1593,16 +1796,60 @@ class ControlProfile(object):
             lines.append("%s = 0" % (self._control.luaValueName,))
             lines.append("")
 
+        usesTable = self._usesShiftedStatesTable(profile)
+        if usesTable:
+            lines += self._getShiftedStatesLuaTable(profile)
+            lines.append("")
+
         lines.append("function %s()" %
                      (ControlProfile._getShiftedStateLuaFunctionName(self._control)))
 
         appendLinesIndented(lines,
+                            self._getShiftedStateTableLuaFunctionBody(profile)
+                            if usesTable else
                             self._getShiftedStateLuaFunctionBody(profile))
 
         lines.append("end")
 
         return lines
 
+    def _usesShiftedStatesTable(self, profile):
+        """Determine if the shifted state of the control should be computed
+        using a shifted states table in the given profile."""
+        return profile.shiftStateTables
+
+    def _getShiftedStatesFor(self, handlerTree, profile, numStates):
+        """Get the table of the shifted states according to the given handler
+        tree.
+
+        profile is the joystick profile to use.
+
+        numStates is the number of states processed so far.
+
+        Returns a tuple of:
+        - the number of states processed including the previously processed
+          ones,
+        - the list of the entries (see _addShiftedStates()) for each
+          combined shift state."""
+        shiftedStates = [[] for i in range(0, profile.numShiftStates)]
+        stack = []
+        (numStates, _, _) = \
+            handlerTree.foldStates(self._control, numStates,
+                                   profile.numShiftLevels,
+                                   ControlProfile._addShiftedStates,
+                                   acc = (profile, stack, shiftedStates),
+                                   branchFun = ControlProfile._maintainShiftedStatesStack,
+                                   branchAcc = stack)
+        return (numStates, shiftedStates)
+
+    def _addShiftLevelDependenciesFor(self, handlerTree, profile, levels):
+        """Add the indexes of the shift levels the given handler tree depends
+        on to the given set."""
+        handlerTree.foldStates(self._control, 0, profile.numShiftLevels,
+                               lambda control, stateIndex, action, acc: acc,
+                               branchFun = ControlProfile._addShiftLevelDependency,
+                               branchAcc = (profile, 0, levels))
+
     def _getUpdateLuaFunction(self, profile):
         """Get the code of the Lua function to update the state of the control
         and call the functions doing it."""
@@ -1627,11 +1874,17 @@ class ControlProfile(object):
         lines.append("  if newState ~= oldState then")
         lines.append("    %s = newState" % (stateName,))
         lines.append("")
-        if self.shiftActive:
+        levels = sorted(self._getShiftLevelDependencies(profile)) \
+            if self.shiftActive else []
+        if levels:
             lines.append("    if newState == 0 then")
-            lines.append("      _jsprog_updaters_remove(%s)" % (functionName))
+            for level in levels:
+                lines.append("      _jsprog_updaters_remove(%s, %s)" %
+                             (getShiftLevelUpdatersName(level), functionName))
             lines.append("    elseif oldState == 0 then")
-            lines.append("      _jsprog_updaters_add(%s)" % (functionName))
+            for level in levels:
+                lines.append("      _jsprog_updaters_add(%s, %s)" %
+                             (getShiftLevelUpdatersName(level), functionName))
             lines.append("    end")
             lines.append("")
         lines.append("    if oldState > 0 then")
@@ -1684,16 +1937,24 @@ class KeyProfile(ControlProfile):
     def getDaemonXML(self, document, profile):
         """Get the XML element for the XML document to be sent to the
         daemon."""
-        element = document.createElement("key")
+        (tagName, name, luaText) = self.getDaemonXMLData(profile)
+
+        element = document.createElement(tagName)
+        element.setAttribute("name", name)
+        element.appendChild(document.createTextNode(luaText))
+
+        return element
 
-        element.setAttribute("name", Key.getNameFor(self.code))
+    def getDaemonXMLData(self, profile):
+        """Get the data of the element for the XML document to be sent to the
+        daemon.
 
+        It returns a tuple of the tag name, the name of the control and the
+        text of the element."""
         luaCode = self.getLuaCode(profile)
         luaText = "\n" + linesToText(luaCode, indentation = "    ")
 
-        element.appendChild(document.createTextNode(luaText))
-
-        return element
+        return ("key", Key.getNameFor(self.code), luaText)
 
     def getLuaCode(self, profile):
         """Get the Lua code for the key."""
@@ -1740,6 +2001,13 @@ class KeyProfile(ControlProfile):
         """Simplify the handler tree of the control profile."""
         return self._handlerTree.simplify()
 
+    def _getShiftLevelDependencies(self, profile):
+        """Get the set of the indexes of the shift levels the shifted state of
+        the control depends on."""
+        levels = set()
+        self._addShiftLevelDependenciesFor(self._handlerTree, profile, levels)
+        return levels
+
     def _getActionLuaFunctionCode(self, profile, codeFun, nameFun):
         """Get the code for the Lua functions of entering or leaving the
         various states of the virtual control.
@@ -1775,6 +2043,33 @@ class KeyProfile(ControlProfile):
 
         return lines
 
+    def _getShiftedStatesLuaTable(self, profile):
+        """Get the code of the Lua table containing the shifted state of the
+        key for each combined shift state."""
+        (numStates, shiftedStates) = \
+            self._getShiftedStatesFor(self._handlerTree, profile, 0)
+
+        values = [ControlProfile._getShiftedStatesLuaValue(entries)
+                  for entries in shiftedStates]
+
+        return ["%s = { %s }" %
+                (ControlProfile._getShiftedStatesLuaTableName(self._control),
+                 ", ".join(values))]
+
+    def _getShiftedStateTableLuaFunctionBody(self, profile):
+        """Get the code of the Lua function to compute the shifted state of the
+        key using the shifted states table."""
+        lines = []
+
+        lines.append("if %s==0 then" % (self._control.luaValueName,))
+        lines.append("  return 0")
+        lines.append("else")
+        lines.append("  return %s[_jsprog_shiftState]" %
+                     (ControlProfile._getShiftedStatesLuaTableName(self._control),))
+        lines.append("end")
+
+        return lines
+
 #------------------------------------------------------------------------------
 #------------------------------------------------------------------------------
 
@@ -1784,9 +2079,9 @@ class VirtualControlProfile(ControlProfile):
     It maintains a tree of handlers the leaves of which are actions,
     and the other nodes (if any) are shift handlers each level of them
     corresponding to a shift level."""
-    def __init__(self, code, shiftActive = False):
-        """Construct the virtual control profile for the given code."""
-        control = Control(Control.TYPE_VIRTUAL, code)
+    def __init__(self, control, shiftActive = False):
+        """Construct the virtual control profile for the given control of a
+        virtual control."""
         super(VirtualControlProfile, self).__init__(control,
                                                     shiftActive = shiftActive)
 
@@ -1833,6 +2128,13 @@ class VirtualControlProfile(ControlProfile):
         daemon."""
         return None
 
+    def getDaemonXMLData(self, profile):
+        """Get the data of the element for the XML document to be sent to the
+        daemon.
+
+        Virtual controls have no such element, so None is returned."""
+        return None
+
     def insertShiftLevel(self, beforeIndex, fromState, toState):
         """Insert a new shift level before the given index spanning the given
         states."""
@@ -1958,6 +2260,14 @@ class VirtualControlProfile(ControlProfile):
 
         return len(self._handlerTrees)>0
 
+    def _getShiftLevelDependencies(self, profile):
+        """Get the set of the indexes of the shift levels the shifted state of
+        the control depends on in any of the states of the virtual control."""
+        levels = set()
+        for handlerTree in self._handlerTrees.values():
+            self._addShiftLevelDependenciesFor(handlerTree, profile, levels)
+        return levels
+
     def _getActionLuaFunctionCode(self, profile, codeFun, nameFun):
         """Get the code for the Lua functions of entering or leaving the
         various states of the virtual control.
@@ -2014,29 +2324,223 @@ class VirtualControlProfile(ControlProfile):
 
         return lines
 
+    def _getShiftedStatesLuaTable(self, profile):
+        """Get the code of the Lua table containing the tables of the shifted
+        states for each state of the virtual control that has a handler
+        tree."""
+        lines = []
+
+        virtualControl = profile.findVirtualControlByCode(self.code)
+
+        lines.append("%s = {" %
+                     (ControlProfile._getShiftedStatesLuaTableName(self._control),))
+
+        numStates = 0
+        for controlState in range(0, virtualControl.numStates):
+            if controlState in self._handlerTrees:
+                handlerTree = self._handlerTrees[controlState]
+                (numStates, shiftedStates) = \
+                    self._getShiftedStatesFor(handlerTree, profile, numStates)
+                values = [ControlProfile._getShiftedStatesLuaValue(entries)
+                          for entries in shiftedStates]
+                lines.append("  [%d] = { %s }," %
+                             (controlState, ", ".join(values)))
+
+        lines.append("}")
+
+        return lines
+
+    def _getShiftedStateTableLuaFunctionBody(self, profile):
+        """Get the code of the Lua function to compute the shifted state of the
+        virtual control using the shifted states table."""
+        lines = []
+
+        virtualControl = profile.findVirtualControlByCode(self.code)
+
+        lines.append("local shiftedStates = %s[%s]" %
+                     (ControlProfile._getShiftedStatesLuaTableName(self._control),
+                      virtualControl.stateLuaVariableName))
+        lines.append("if shiftedStates then")
+        lines.append("  return shiftedStates[_jsprog_shiftState]")
+        lines.append("end")
+        lines.append("return 0")
+
+        return lines
+
 #------------------------------------------------------------------------------
 #------------------------------------------------------------------------------
 
 class AxisProfile(ControlProfile):
     """Control profile for an axis."""
-    def __init__(self, code, shiftActive = False):
+    ## The minimal number of value ranges, for which the state is searched
+    ## for using a binary search instead of checking the ranges one by one.
+    MIN_NUM_BINARY_SEARCH_RANGES = 4
+
+    @staticmethod
+    def _getSortedValueRanges(ranges):
+        """Get the given list of value ranges sorted by their starting values,
+        if they are suitable for a binary search.
+
+        ranges is a list of tuples, the first two elements of which are the
+        starting and ending values of the range.
+
+        If some of the ranges overlap, None is returned, since then the ranges
+        should be checked in their original order."""
+        sortedRanges = sorted(ranges, key = lambda r: r[0])
+        for (r1, r2) in zip(sortedRanges, sortedRanges[1:]):
+            if r2[0]<=r1[1]:
+                return None
+
+        return sortedRanges
+
+    @staticmethod
+    def _getBinarySearchRanges(valueRangeHandler):
+        """Get the sorted list of value ranges of the given value range
+        handler's siblings (including itself), if the state should be
+        searched for using a binary search.
+
+        Each element of the list is a tuple of the starting value, the ending
+        value and the index of the range among the siblings."""
+        parent = valueRangeHandler.parent
+        if parent.numChildren<AxisProfile.MIN_NUM_BINARY_SEARCH_RANGES:
+            return None
+
+        return AxisProfile._getSortedValueRanges(
+            [(handler.fromValue, handler.toValue, index)
+             for (index, handler) in enumerate(parent.children)])
+
+    @staticmethod
+    def _appendBinarySearchLuaCode(control, ranges, lines, indentation):
+        """Append the Lua code of a balanced comparison tree to return the
+        state belonging to the range the value of the given control is in.
+
+        ranges is the sorted list of tuples of the starting and ending values
+        and the index of the state corresponding to the range."""
+        valueName = control.luaValueName
+        if len(ranges)==1:
+            (fromValue, toValue, stateIndex) = ranges[0]
+            lines.append(indentation + "if %s then" %
+                         (ValueRangeConstraint(control, fromValue,
+                                               toValue).getLuaExpression(None),))
+            lines.append(indentation + "  return %d" % (stateIndex,))
+            lines.append(indentation + "end")
+        else:
+            middle = len(ranges) // 2
+            lines.append(indentation + "if %s < %d then" %
+                         (valueName, ranges[middle][0]))
+            AxisProfile._appendBinarySearchLuaCode(control, ranges[:middle],
+                                                   lines, indentation + "  ")
+            lines.append(indentation + "else")
+            AxisProfile._appendBinarySearchLuaCode(control, ranges[middle:],
+                                                   lines, indentation + "  ")
+            lines.append(indentation + "end")
+
+    @staticmethod
+    def _addBinarySearchIfStatementFor(control, handler, before, context):
+        """Get the if statement for the given shift or value range handler.
+
+        If the value range handler belongs to a group of value ranges to be
+        searched for using a binary search, no if statement is generated, but
+        the handler is recorded in the context, so that the comparison tree
+        can be generated when the state of the last value range is
+        reached."""
+        (ifContext, currentHandler) = context
+        if isinstance(handler, ValueRangeHandler) and \
+           AxisProfile._getBinarySearchRanges(handler) is not None:
+            (profile, lines, level, indentation) = ifContext
+            currentHandler[0] = handler if before else None
+            return ((profile, lines, level + (1 if before else -1),
+                     indentation), currentHandler)
+        else:
+            ifContext = ShiftHandler._addIfStatementFor(control, handler,
+                                                        before, ifContext)
+            return (ifContext, currentHandler)
+
+    @staticmethod
+    def _appendBinarySearchStateReturnLuaCode(control, stateIndex, action, acc):
+        """Append the Lua code for returning the state index.
+
+        If the state belongs to a value range searched for using a binary
+        search, nothing is appended except for the last value range, where
+        the comparison tree for all the ranges is generated."""
+        (lines, indentation, currentHandler) = acc
+        handler = currentHandler[0]
+        if handler is None:
+            ControlProfile._appendStateReturnLuaCode(control, stateIndex,
+                                                     action,
+                                                     (lines, indentation))
+        elif handler.isLastChild:
+            ranges = AxisProfile._getBinarySearchRanges(handler)
+            firstStateIndex = stateIndex - len(ranges) + 1
+            ranges = [(fromValue, toValue, firstStateIndex + index)
+                      for (fromValue, toValue, index) in ranges]
+            AxisProfile._appendBinarySearchLuaCode(control, ranges, lines,
+                                                   indentation[0])
+            lines.append(indentation[0] + "return 0")
+
+        return acc
+
+    @staticmethod
+    def _getLastTimeLuaName(control):
+        """Get the name of the Lua variable containing the time of the last
+        event of the given axis that was not ignored."""
+        return control.luaSymbols.get("lastTime")
+
+    def __init__(self, code, shiftActive = False,
+                 deadband = 0, minInterval = 0):
         """Construct the profile for the given axis control."""
         super(AxisProfile, self).__init__(Control(Control.TYPE_AXIS, code),
                                           shiftActive = shiftActive)
 
         self._handlerTree = HandlerTree()
+        self._deadband = deadband
+        self._minInterval = minInterval
 
     @property
     def handlerTree(self):
         """Get the handler tree for the key's pressed value."""
         return self._handlerTree
 
+    @property
+    def deadband(self):
+        """Get the deadband of the axis.
+
+        If the value of the axis changes by no more than this amount compared
+        to the last value processed, the change is ignored. If 0, no change is
+        ignored."""
+        return self._deadband
+
+    @deadband.setter
+    def deadband(self, deadband):
+        """Set the deadband of the axis."""
+        self._deadband = deadband
+
+    @property
+    def minInterval(self):
+        """Get the minimal interval between two events of the axis being
+        processed in milliseconds.
+
+        The events arriving sooner than this after the last processed one are
+        ignored. If 0, no event is ignored."""
+        return self._minInterval
+
+    @minInterval.setter
+    def minInterval(self, minInterval):
+        """Set the minimal interval between two events of the axis being
+        processed in milliseconds."""
+        self._minInterval = minInterval
+        self.invalidateLuaCode()
+
     def getXML(self, document):
         """Get the XML element describing the key profile."""
         element = document.createElement("axis")
         element.setAttribute("name", self._control.name)
         if self.shiftActive:
             element.setAttribute("shiftActive", "yes")
+        if self._deadband>0:
+            element.setAttribute("deadband", str(self._deadband))
+        if self._minInterval>0:
+            element.setAttribute("minInterval", str(self._minInterval))
 
         for child in self._handlerTree.children:
             element.appendChild(child.getXML(document))
@@ -2046,20 +2550,44 @@ class AxisProfile(ControlProfile):
     def getDaemonXML(self, document, profile):
         """Get the XML element for the XML document to be sent to the
         daemon."""
-        element = document.createElement("axis")
+        (tagName, name, luaText) = self.getDaemonXMLData(profile)
+
+        element = document.createElement(tagName)
+        element.setAttribute("name", name)
+        element.appendChild(document.createTextNode(luaText))
+
+        return element
 
-        element.setAttribute("name", Axis.getNameFor(self.code))
+    def getDaemonXMLData(self, profile):
+        """Get the data of the element for the XML document to be sent to the
+        daemon.
 
+        It returns a tuple of the tag name, the name of the control and the
+        text of the element."""
         luaCode = self.getLuaCode(profile)
         luaText = "\n" + linesToText(luaCode, indentation = "    ")
 
-        element.appendChild(document.createTextNode(luaText))
-
-        return element
+        return ("axis", Axis.getNameFor(self.code), luaText)
 
     def getLuaCode(self, profile):
-        """Get the Lua code for the key."""
+        """Get the Lua code for the axis.
+
+        If a deadband or a minimal interval is set, the code starts with
+        returning early for the events to be ignored."""
         lines = []
+        if self._deadband>0:
+            lines.append("if math.abs(value - %s) <= %d then" %
+                         (self._control.luaValueName, self._deadband))
+            lines.append("  return")
+            lines.append("end")
+        if self._minInterval>0:
+            lastTimeName = AxisProfile._getLastTimeLuaName(self._control)
+            lines.append("local now = jsprog_gettime()")
+            lines.append("if now - %s < %d then" %
+                         (lastTimeName, self._minInterval))
+            lines.append("  return")
+            lines.append("end")
+            lines.append("%s = now" % (lastTimeName,))
         lines.append("%s = value" % (self._control.luaValueName,))
         lines.append("%s()" %
                      (ControlProfile.getUpdateLuaFunctionName(self._control),))
@@ -2100,8 +2628,31 @@ class AxisProfile(ControlProfile):
         return self._handlerTree.setAction(shiftStateSequence, action)
 
     def simplify(self):
-        """Simplify the handler tree of the control profile."""
-        return self._handlerTree.simplify()
+        """Simplify the handler tree of the control profile.
+
+        The profile is kept even if there are no actions in it, as long as a
+        deadband or a minimal interval is set."""
+        hasActions = self._handlerTree.simplify()
+        return hasActions or self._deadband>0 or self._minInterval>0
+
+    def _generatePrologueLuaCode(self, profile):
+        """Generate the Lua code to put into the prologue for the axis.
+
+        If a minimal interval is set, the variable containing the time of the
+        last processed event is also defined."""
+        lines = super(AxisProfile, self)._generatePrologueLuaCode(profile)
+        if self._minInterval>0:
+            lines = ["%s = 0" %
+                     (AxisProfile._getLastTimeLuaName(self._control),), ""] + \
+                     lines
+        return lines
+
+    def _getShiftLevelDependencies(self, profile):
+        """Get the set of the indexes of the shift levels the shifted state of
+        the control depends on."""
+        levels = set()
+        self._addShiftLevelDependenciesFor(self._handlerTree, profile, levels)
+        return levels
 
     def _getActionLuaFunctionCode(self, profile, codeFun, nameFun):
         """Get the code for the Lua functions of entering or leaving the
@@ -2122,15 +2673,109 @@ class AxisProfile(ControlProfile):
 
     def _getShiftedStateLuaFunctionBody(self, profile):
         """Get the code of the Lua function to compute the shifted state of the
-        key."""
+        axis.
+
+        If there are enough non-overlapping value ranges for a certain shift
+        state, a balanced comparison tree is generated for them instead of
+        checking the ranges one by one."""
         lines = []
+        indentation = [""]
+        currentHandler = [None]
 
-        (numStates, lines) = \
-            self._getShiftedStateLuaCodeFor(self._handlerTree, profile,
-                                            0, lines, [""])
+        self._handlerTree.foldStates(self._control, 0, profile.numShiftLevels,
+                                     AxisProfile._appendBinarySearchStateReturnLuaCode,
+                                     acc = (lines, indentation, currentHandler),
+                                     branchFun = AxisProfile._addBinarySearchIfStatementFor,
+                                     branchAcc = ((profile, lines, 0,
+                                                   indentation),
+                                                  currentHandler))
+
+        return lines
+
+    def _getShiftedStatesLuaTable(self, profile):
+        """Get the code of the Lua table containing the value ranges and the
+        corresponding shifted states of the axis for each combined shift
+        state.
+
+        States not depending on the value of the axis are represented by an
+        unlimited value range."""
+        lines = []
+
+        lines.append("%s = {" %
+                     (ControlProfile._getShiftedStatesLuaTableName(self._control),))
+
+        (numStates, shiftedStates) = \
+            self._getShiftedStatesFor(self._handlerTree, profile, 0)
+        for entries in shiftedStates:
+            ranges = []
+            for (fromValue, toValue, stateIndex) in entries:
+                if fromValue is None:
+                    ranges.append("{ -math.huge, math.huge, %d }" %
+                                  (stateIndex,))
+                else:
+                    ranges.append("{ %d, %d, %d }" %
+                                  (fromValue, toValue, stateIndex))
+            lines.append("  { %s }," % (", ".join(ranges),))
+
+        lines.append("}")
+
+        return lines
+
+    def _getShiftedStateTableLuaFunctionBody(self, profile):
+        """Get the code of the Lua function to compute the shifted state of the
+        axis using the shifted states table."""
+        lines = []
+
+        tableName = ControlProfile._getShiftedStatesLuaTableName(self._control)
+        lines.append("local value = %s" % (self._control.luaValueName,))
+        lines.append("for _, range in ipairs(%s[_jsprog_shiftState]) do" %
+                     (tableName,))
+        lines.append("  if value >= range[1] and value <= range[2] then")
+        lines.append("    return range[3]")
+        lines.append("  end")
+        lines.append("end")
+        lines.append("return 0")
 
         return lines
 
+    def _usesShiftedStatesTable(self, profile):
+        """Determine if the shifted state of the axis should be computed using
+        a shifted states table in the given profile.
+
+        If the value ranges are suitable for the comparison tree, it is used
+        even if shifted states tables are requested, since it is faster than
+        scanning the table."""
+        return profile.shiftStateTables and \
+            not self._getSortedShiftedStates(profile)[1]
+
+    def _getSortedShiftedStates(self, profile):
+        """Get the shifted states table of the axis for the combined shift
+        states with the value ranges sorted, if possible.
+
+        Returns a tuple of:
+        - the list of the entries of the table,
+        - a boolean indicating if the value ranges are sorted, so that they
+          can be searched for using the comparison tree. This is the case if
+          none of the lists of the value ranges contain overlapping ranges and
+          at least one of them is long enough."""
+        (numStates, shiftedStates) = \
+            self._getShiftedStatesFor(self._handlerTree, profile, 0)
+
+        sortedShiftedStates = []
+        binarySearch = False
+        for entries in shiftedStates:
+            if len(entries)>1:
+                if None in [fromValue for (fromValue, _, _) in entries]:
+                    return (shiftedStates, False)
+                entries = AxisProfile._getSortedValueRanges(entries)
+                if entries is None:
+                    return (shiftedStates, False)
+                if len(entries)>=AxisProfile.MIN_NUM_BINARY_SEARCH_RANGES:
+                    binarySearch = True
+            sortedShiftedStates.append(entries)
+
+        return (sortedShiftedStates, binarySearch)
+
 #------------------------------------------------------------------------------
 #------------------------------------------------------------------------------
 
@@ -2144,27 +2789,92 @@ class Profile(object):
     joystick type have negative integers as codes, while those of a profile
     have positive integers. Since codes are used only internally, a new code is
     generated for a virtual control whenever one is created. """
+    ## The attributes making up the body of the profile, i.e. the contents
+    ## following the identity, which are loaded only when first accessed if
+    ## the profile is loaded lazily.
+    _bodyAttributes = frozenset(["_virtualControls", "_nextVirtualControlCode",
+                                 "_virtualControlsByName",
+                                 "_virtualControlsByDisplayName",
+                                 "_virtualControlsByCode",
+                                 "_shiftLevels",
+                                 "_controlProfiles", "_controlProfileMap",
+                                 "_prologue", "_epilogue",
+                                 "_virtualControlLuaCodes",
+                                 "_shiftLevelLuaCodes"])
+
     @staticmethod
-    def loadFrom(joystickType, directory):
+    def loadFrom(joystickType, directory, lazy = False, indexPath = None):
         """Load the profiles in the given directory for the given joystick type.
 
+        If lazy is True, only the header of the profiles, i.e. the top-level
+        attributes and the identity, is parsed. The rest is loaded when it is
+        first needed. In this case, if indexPath is given, it is the path of
+        a ProfileIndex the headers of the unchanged files are taken from, and
+        which is updated after all profiles have been loaded.
+
         Returns an iterator over the loaded profiles."""
-        parser = make_parser()
+        handler = ProfileHandler(joystickType, headerOnly = lazy)
+        index = ProfileIndex(indexPath) \
+            if lazy and indexPath is not None else None
+
+        with os.scandir(directory) as entries:
+            profileEntries = [entry for entry in entries
+                              if entry.name.endswith(".profile") and
+                              entry.is_file()]
+
+        for entry in profileEntries:
+            path = entry.path
+            fileName = entry.name[:-8]
+            try:
+                if index is not None:
+                    stat = entry.stat()
+                    profile = index.findProfile(joystickType, fileName, stat)
+                    if profile is not None:
+                        profile._setBodyPath(path)
+                        yield profile
+                        continue
+
+                profile = Profile.loadFile(joystickType, path, lazy = lazy,
+                                           handler = handler)
+                if index is not None:
+                    index.addProfile(profile, stat)
+
+                yield profile
+            except Exception as e:
+                print(e, file=sys.stderr)
+
+        if index is not None:
+            index.save([entry.name[:-8] for entry in profileEntries])
+
+    @staticmethod
+    def loadFile(joystickType, path, lazy = False, handler = None):
+        """Load the profile from the file with the given path for the given
+        joystick type.
+
+        If lazy is True, only the header of the profile is parsed, the rest
+        is loaded when it is first needed. If handler is given, it should be
+        a ProfileHandler created with the same joystick type and laziness to
+        be used for parsing.
 
-        handler = ProfileHandler(joystickType)
-        parser.setContentHandler(handler)
+        Returns the profile. If the file cannot be read or parsed, an
+        exception is raised."""
+        if handler is None:
+            handler = ProfileHandler(joystickType, headerOnly = lazy)
 
-        for entry in os.listdir(directory):
-            path = os.path.join(directory, entry)
-            if entry.endswith(".profile") and os.path.isfile(path):
-                try:
-                    parser.parse(path)
-                    profile = handler.profile
-                    profile.fileName = entry[:-8]
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            handler.parseData(data, systemId = path)
+        except ProfileHandler.HeaderParsed:
+            pass
 
-                    yield profile
-                except Exception as e:
-                    print(e, file=sys.stderr)
+        profile = handler.profile
+        profile.fileName = os.path.basename(path)[:-8]
+        profile.contentHash = getContentHash(data)
+        if lazy:
+            profile._setBodyPath(path)
+
+        return profile
 
     @staticmethod
     def getTextXML(document, name, text):
@@ -2215,27 +2925,49 @@ class Profile(object):
     def getShiftLevelStateLuaFunctionName(levelIndex):
         """Get the name of the function to update the state of the shift level
         with the given index."""
-        return "_jsprog_shiftLevel%d_update" % (levelIndex,)
+        if LuaSymbols.debug:
+            return "_jsprog_shiftLevel%d_update" % (levelIndex,)
+        else:
+            return getShiftLevelLuaSymbols(levelIndex).get("update")
 
-    def __init__(self, joystickType, name, identity, autoLoad = False):
+    def __init__(self, joystickType, name, identity, autoLoad = False,
+                 shiftStateTables = False, persistentThreads = False):
         """Construct an empty profile for the joystick with the given
         identity."""
         self.joystickType = joystickType
         self.name = name
         self.identity = identity
         self.autoLoad = autoLoad
+        self._shiftStateTables = shiftStateTables
+        self._persistentThreads = persistentThreads
         self.directoryType = None
         self.fileName = None
+        self.contentHash = None
+
+        self._bodyPath = None
+        self._bodyError = None
+        self._initBody()
+
+    def __getattr__(self, name):
+        """Called when an attribute is not found.
+
+        If it is an attribute of the body of a lazily loaded profile, the body
+        is loaded and the attribute is returned. If the body could not be
+        loaded, the exception of the loading is raised."""
+        if name in Profile._bodyAttributes:
+            if self.__dict__.get("_bodyPath") is not None:
+                self._loadBody()
+                return getattr(self, name)
+            bodyError = self.__dict__.get("_bodyError")
+            if bodyError is not None:
+                raise bodyError
+        raise AttributeError(name)
 
-        self._virtualControls = []
-        self._nextVirtualControlCode = 1
-
-        self._shiftLevels = []
-
-        self._controlProfiles = []
-        self._controlProfileMap = {}
-        self._prologue = []
-        self._epilogue = []
+    @property
+    def bodyError(self):
+        """Get the exception that occurred when the body of the profile was
+        loaded, or None if it has not failed (yet)."""
+        return self._bodyError
 
     @property
     def userDefined(self):
@@ -2257,6 +2989,45 @@ class Profile(object):
         """Determine the number of shift levels."""
         return len(self._shiftLevels)
 
+    @property
+    def numShiftStates(self):
+        """Determine the number of the combined states of all shift levels."""
+        numShiftStates = 1
+        for shiftLevel in self._shiftLevels:
+            numShiftStates *= shiftLevel.numStates
+        return numShiftStates
+
+    @property
+    def shiftStateTables(self):
+        """Determine if the shifted states of the controls are computed by
+        looking up tables indexed by the combined shift state instead of
+        evaluating chains of if statements."""
+        return self._shiftStateTables
+
+    @shiftStateTables.setter
+    def shiftStateTables(self, shiftStateTables):
+        """Set whether the shifted states of the controls are computed by
+        looking up tables."""
+        if shiftStateTables!=self._shiftStateTables:
+            self._shiftStateTables = shiftStateTables
+            self._invalidateShiftLevelLuaCode()
+
+    @property
+    def persistentThreads(self):
+        """Determine if the actions requiring a thread are executed by a
+        single, persistent thread of each control, which is parked between
+        the actuations of the control, instead of starting a new thread each
+        time the control is actuated."""
+        return self._persistentThreads
+
+    @persistentThreads.setter
+    def persistentThreads(self, persistentThreads):
+        """Set whether the actions are executed by persistent threads."""
+        if persistentThreads!=self._persistentThreads:
+            self._persistentThreads = persistentThreads
+            for controlProfile in self._controlProfiles:
+                controlProfile.invalidateLuaCode()
+
     @property
     def virtualControls(self):
         """Get an iterator over the virtual controls."""
@@ -2296,8 +3067,19 @@ class Profile(object):
         """Set the epilogue code lines."""
         self._epilogue = codeLines
 
+    def loadBody(self):
+        """Load the body of the profile, if it is loaded lazily and has not
+        been loaded yet.
+
+        If the body cannot be loaded, an exception is raised."""
+        if self._bodyPath is not None:
+            self._loadBody()
+        elif self._bodyError is not None:
+            raise self._bodyError
+
     def clone(self):
         """Clone this profile by making a deep copy of itself."""
+        self.loadBody()
         return copy.deepcopy(self)
 
     def match(self, identity):
@@ -2334,22 +3116,19 @@ class Profile(object):
                                                displayName = displayName)
         self._nextVirtualControlCode += 1
         self._virtualControls.append(virtualControl)
+        self._indexVirtualControl(virtualControl)
 
         return virtualControl
 
     def findVirtualControl(self, name):
         """Find the virtual control of this profile, that has the given
         name."""
-        for virtualControl in self._virtualControls:
-            if virtualControl.name==name:
-                return virtualControl
+        return self._virtualControlsByName.get(name)
 
     def findVirtualControlByDisplayName(self, name):
         """Find the virtual control of this profile, that has the given
         display name."""
-        for virtualControl in self._virtualControls:
-            if virtualControl.displayName==name:
-                return virtualControl
+        return self._virtualControlsByDisplayName.get(name)
 
     def findVirtualControlByName(self, name):
         """Find the virtual control with the given name.
@@ -2358,9 +3137,7 @@ class Profile(object):
         vc = self.findVirtualControl(name)
         if vc is not None:
             return vc
-        for virtualControl in self.joystickType.virtualControls:
-            if virtualControl.name==name:
-                return virtualControl
+        return self.joystickType.findVirtualControl(name)
 
     def findVirtualControlByCode(self, code):
         """Find the virtual control with the given code."""
@@ -2368,9 +3145,7 @@ class Profile(object):
         if vc is not None:
             return vc
 
-        for vc in self._virtualControls:
-            if vc.code==code:
-                return vc
+        return self._virtualControlsByCode.get(code)
 
     def findVirtualControlCodeByName(self, name):
         """Find the code of the virtual control with the given name."""
@@ -2384,14 +3159,36 @@ class Profile(object):
         profile, in which case that control profile is removed."""
         changed = self._removeReferencesTo(virtualControl.control)
         self._virtualControls.remove(virtualControl)
+        self._reindexVirtualControls()
+        self.virtualControlChanged(virtualControl)
         return changed
 
+    def virtualControlRenamed(self, virtualControl):
+        """Called when the name or the display name of the given virtual
+        control of the profile has changed.
+
+        All cached Lua code is invalidated, since the identifiers of the
+        virtual control may be referenced by the code of any control."""
+        self._reindexVirtualControls()
+        self._invalidateLuaCode()
+
+    def joystickVirtualControlRenamed(self, virtualControl):
+        """Called when the name or the display name of the given virtual
+        control of the joystick type has changed.
+
+        All cached Lua code is invalidated, if the body of the profile is
+        loaded, since the identifiers of the virtual control may be
+        referenced by the code of any control."""
+        if "_controlProfiles" in self.__dict__:
+            self._invalidateLuaCode()
+
     def joystickVirtualControlRemoved(self, virtualControl):
         """Called when a virtual control has been added to the joystick
         type.
 
         Returns True if the virtual control removed has a valid control
         profile, in which case that control profile is removed."""
+        self.virtualControlChanged(virtualControl)
         return self._removeReferencesTo(virtualControl.control)
 
     def virtualStateAdded(self, virtualControl, virtualState):
@@ -2399,7 +3196,7 @@ class Profile(object):
 
         Returns True if there was a control profile for the given control and
         thus the state numbers had to be updated."""
-        controlProfile = self._controlProfileMap.get(virtualControl.control)
+        controlProfile = self.virtualControlChanged(virtualControl)
         return False if controlProfile is None \
             else controlProfile.virtualStateAdded(virtualState)
 
@@ -2408,7 +3205,7 @@ class Profile(object):
 
         Returns True if there was a control profile for the given control and
         thus the state numbers had to be updated."""
-        controlProfile = self._controlProfileMap.get(virtualControl.control)
+        controlProfile = self.virtualControlChanged(virtualControl)
         return False if controlProfile is None \
             else controlProfile.virtualStateMovedForward(virtualState)
 
@@ -2417,7 +3214,7 @@ class Profile(object):
 
         Returns True if there was a control profile for the given control and
         thus the state numbers had to be updated."""
-        controlProfile = self._controlProfileMap.get(virtualControl.control)
+        controlProfile = self.virtualControlChanged(virtualControl)
         return False if controlProfile is None \
             else controlProfile.virtualStateMovedBackward(virtualState)
 
@@ -2428,13 +3225,30 @@ class Profile(object):
         Returns True if the virtual state removed has a valid control
         profile, in which case that state from the control profile is
         removed."""
-        controlProfile = self._controlProfileMap.get(virtualControl.control)
+        controlProfile = self.virtualControlChanged(virtualControl)
         return False if controlProfile is None \
             else controlProfile.removeVirtualStateHandler(virtualState)
 
+    def virtualControlChanged(self, virtualControl):
+        """Called when the given virtual control or any of its states has
+        changed.
+
+        The cached Lua code depending on the virtual control is invalidated,
+        and the control profile of the virtual control is returned, if
+        any."""
+        self._virtualControlLuaCodes = {}
+        self._shiftLevelLuaCodes = {}
+
+        controlProfile = self._controlProfileMap.get(virtualControl.control)
+        if controlProfile is not None:
+            controlProfile.invalidateLuaCode()
+
+        return controlProfile
+
     def addShiftLevel(self, shiftLevel):
         """Add the given shift level to the profile."""
         self._shiftLevels.append(shiftLevel)
+        self._invalidateShiftLevelLuaCode()
 
     def insertShiftLevel(self, beforeIndex, shiftLevel):
         """Insert a shift level before the given index.
@@ -2444,6 +3258,7 @@ class Profile(object):
         for controlProfile in self._controlProfiles:
             controlProfile.insertShiftLevel(beforeIndex, 0,
                                             shiftLevel.numStates - 1)
+        self._invalidateShiftLevelLuaCode()
         return True
 
     def modifyShiftLevel(self, index, modifiedShiftLevel,
@@ -2516,6 +3331,7 @@ class Profile(object):
         for controlProfile in self._controlProfiles:
             controlProfile.modifyShiftLevel(index, stateMap)
         self._shiftLevels[index] = modifiedShiftLevel
+        self._invalidateShiftLevelLuaCode()
 
         return True
 
@@ -2526,6 +3342,7 @@ class Profile(object):
         for controlProfile in self._controlProfiles:
             controlProfile.removeShiftLevel(index, keepStateIndex)
         del self._shiftLevels[index]
+        self._invalidateShiftLevelLuaCode()
 
         return True
 
@@ -2586,7 +3403,7 @@ class Profile(object):
                 controlProfile = KeyProfile(control.code)
                 controlProfile.completeHandlerTree(numStatesSequence)
             elif control.type==Control.TYPE_VIRTUAL:
-                controlProfile = VirtualControlProfile(control.code)
+                controlProfile = VirtualControlProfile(control)
             elif control.type==Control.TYPE_AXIS:
                 controlProfile = AxisProfile(control.code)
                 controlProfile.completeHandlerTree(numStatesSequence)
@@ -2600,16 +3417,45 @@ class Profile(object):
             result = controlProfile.setAction(shiftStateSequence, action)
 
         if result:
+            controlProfile.invalidateLuaCode()
             if not controlProfile.simplify():
                 self._controlProfiles.remove(controlProfile)
                 del self._controlProfileMap[control]
 
         return result
 
+    def setAxisFilter(self, control, deadband, minInterval):
+        """Set the deadband and the minimal interval of the events of the given
+        axis.
+
+        Returns whether anything has changed. If the axis has no profile, one
+        is created for the filter. If the filter is cleared and the axis
+        has no actions, its profile is removed."""
+        control = Control.fromJoystickControl(control)
+        axisProfile = self.findControlProfile(control)
+        if axisProfile is None:
+            if deadband==0 and minInterval==0:
+                return False
+
+            axisProfile = AxisProfile(control.code)
+            axisProfile.completeHandlerTree([shiftLevel.numStates
+                                             for shiftLevel in self._shiftLevels])
+            self.addControlProfile(axisProfile)
+        elif axisProfile.deadband==deadband and \
+             axisProfile.minInterval==minInterval:
+            return False
+
+        axisProfile.deadband = deadband
+        axisProfile.minInterval = minInterval
+
+        if not axisProfile.simplify():
+            self._controlProfiles.remove(axisProfile)
+            del self._controlProfileMap[control]
+
+        return True
+
     def getXMLDocument(self):
         """Get the XML document describing the profile."""
-        Control.setProfile(self)
-
         document = getDOMImplementation().createDocument(None,
                                                          "joystickProfile",
                                                          None)
@@ -2617,6 +3463,10 @@ class Profile(object):
         topElement.setAttribute("name", self.name)
         topElement.setAttribute("autoLoad",
                                 "yes" if self.autoLoad else "no")
+        if self._shiftStateTables:
+            topElement.setAttribute("shiftStateTables", "yes")
+        if self._persistentThreads:
+            topElement.setAttribute("persistentThreads", "yes")
 
         identityElement = Profile.getIdentityXML(document, self.identity)
         topElement.appendChild(identityElement)
@@ -2662,68 +3512,46 @@ class Profile(object):
 
     def getDaemonXMLDocument(self):
         """Get the XML document to be downloaded to the daemon."""
-        Control.setProfile(self)
-
         document = getDOMImplementation().createDocument(None,
                                                          "jsprogProfile",
                                                          None)
         topElement = document.documentElement
 
-        (prologueElement,
-         virtualControlControls, virtualControls,
-         shiftLevelControls, shiftControls) = self._getPrologueXML(document)
-        topElement.appendChild(prologueElement)
-
-        for control in (shiftControls | virtualControls):
-            if control.isVirtual:
-                continue
-
-            element = document.createElement("key" if control.isKey else "axis")
-            element.setAttribute("name", control.name)
-
-            lines = []
-            lines.append("%s = value" % (control.luaValueName,))
-            isShiftControl = False
-            if control in virtualControlControls:
-                for virtualControl in virtualControlControls[control]:
-                    lines.append("%s()" % (virtualControl.stateLuaFunctionName,))
-
-            for (controls, levelIndex) in zip(shiftLevelControls,
-                                              list(range(0, len(shiftLevelControls)))):
-                if self._isControlIncludedIn(control, controls):
-                    lines.append("%s()" %
-                                 (Profile.getShiftLevelStateLuaFunctionName(levelIndex),))
-                    isShiftControl = True
-
-            if not isShiftControl and control in virtualControlControls:
-                for virtualControl in virtualControlControls[control]:
-                    if virtualControl.control in self._controlProfileMap:
-                        updateName = \
-                          ControlProfile.getUpdateLuaFunctionName(virtualControl.control)
-                        if not isShiftControl:
-                            lines.append("%s()" % (updateName,))
-
-            if isShiftControl:
-                lines.append("_jsprog_updaters_call()")
-
-            luaText = "\n" + linesToText(lines, indentation = "    ")
-
-            element.appendChild(document.createTextNode(luaText))
+        for (tagName, name, text) in self._getDaemonXMLElements():
+            element = document.createElement(tagName)
+            if name is not None:
+                element.setAttribute("name", name)
+            if text:
+                element.appendChild(document.createTextNode(text))
             topElement.appendChild(element)
 
-        for controlProfile in self._controlProfiles:
-            daemonXML = controlProfile.getDaemonXML(document, self)
-            if daemonXML is not None:
-                topElement.appendChild(daemonXML)
+        return document
 
-        epilogueElement = document.createElement("epilogue")
-        if self._epilogue:
-            text = "\n" + linesToText(self._epilogue, indentation = "    ")
-            epilogue = document.createTextNode(text)
-            epilogueElement.appendChild(epilogue)
-        topElement.appendChild(epilogueElement)
+    def getDaemonXMLChunks(self):
+        """Get an iterator over the chunks of the XML text to be downloaded to
+        the daemon.
+
+        The text is the same as the one produced by writing the document
+        returned by getDaemonXMLDocument() with its writexml() function
+        without any indentation, but no DOM tree is built."""
+        yield "<?xml version=\"1.0\" ?><jsprogProfile>"
+
+        for (tagName, name, text) in self._getDaemonXMLElements():
+            yield "<" + tagName
+            if name is not None:
+                yield " name=\"" + escape(name, _xmlEntities) + "\""
+            if text:
+                yield ">"
+                yield escape(text, _xmlEntities)
+                yield "</" + tagName + ">"
+            else:
+                yield "/>"
 
-        return document
+        yield "</jsprogProfile>"
+
+    def getDaemonXML(self):
+        """Get the XML text to be downloaded to the daemon."""
+        return "".join(self.getDaemonXMLChunks())
 
     def hasHardVirtualControlReference(self, control):
         """Determine if this profile has a hard reference to a certain
@@ -2791,34 +3619,146 @@ class Profile(object):
             if vc.name==name:
                 return vc
 
-    def _getPrologueXML(self, document):
-        """Get the XML code for the prologue."""
+    def _getDaemonXMLElements(self):
+        """Get an iterator over the elements of the XML document to be
+        downloaded to the daemon.
+
+        Each element is described by a tuple of:
+        - the tag name,
+        - the value of the name attribute or None, if there is no such
+          attribute,
+        - the text of the element, which may be empty."""
+        (prologueText,
+         virtualControlControls, virtualControls,
+         shiftLevelControls, shiftControls) = self._getPrologueText()
+        yield ("prologue", None, prologueText)
+
+        for control in (shiftControls | virtualControls):
+            if control.isVirtual:
+                continue
+
+            lines = []
+            lines.append("%s = value" % (control.luaValueName,))
+            updatersNames = []
+            if control in virtualControlControls:
+                for virtualControl in virtualControlControls[control]:
+                    lines.append("%s()" % (virtualControl.stateLuaFunctionName,))
+
+            for (controls, levelIndex) in zip(shiftLevelControls,
+                                              list(range(0, len(shiftLevelControls)))):
+                if self._isControlIncludedIn(control, controls):
+                    lines.append("%s()" %
+                                 (Profile.getShiftLevelStateLuaFunctionName(levelIndex),))
+                    updatersNames.append(getShiftLevelUpdatersName(levelIndex))
+            isShiftControl = bool(updatersNames)
+
+            if not isShiftControl and control in virtualControlControls:
+                for virtualControl in virtualControlControls[control]:
+                    if virtualControl.control in self._controlProfileMap:
+                        updateName = \
+                          ControlProfile.getUpdateLuaFunctionName(virtualControl.control)
+                        if not isShiftControl:
+                            lines.append("%s()" % (updateName,))
+
+            if isShiftControl:
+                if self._shiftStateTables:
+                    lines.append("_jsprog_shiftState_update()")
+                if len(updatersNames)==1:
+                    lines.append("_jsprog_updaters_call(%s)" %
+                                 (updatersNames[0],))
+                else:
+                    lines.append("_jsprog_updaters_callAll(%s)" %
+                                 (", ".join(updatersNames),))
+
+            luaText = "\n" + linesToText(lines, indentation = "    ")
+
+            yield ("key" if control.isKey else "axis", control.name, luaText)
+
+        for controlProfile in self._controlProfiles:
+            daemonXMLData = controlProfile.getDaemonXMLData(self)
+            if daemonXMLData is not None:
+                yield daemonXMLData
+
+        text = ""
+        if self._epilogue:
+            text = "\n" + linesToText(self._epilogue, indentation = "    ")
+        yield ("epilogue", None, text)
+
+    def _getPrologueText(self):
+        """Get the text of the prologue."""
 
         lines = []
         lines.append("require(\"table\")")
         lines.append("")
-        lines.append("_jsprog_updaters = {}")
+        # The updater sets are arrays of the functions, with each function
+        # mapped to its index, so that they are called in a deterministic
+        # order. An updater may remove itself while being called.
+        lines.append("function _jsprog_updaters_add(updaters, fn)")
+        lines.append("  if not updaters[fn] then")
+        lines.append("    local n = #updaters + 1")
+        lines.append("    updaters[n] = fn")
+        lines.append("    updaters[fn] = n")
+        lines.append("  end")
+        lines.append("end")
         lines.append("")
-        lines.append("function _jsprog_updaters_add(fn)")
-        lines.append("  table.insert(_jsprog_updaters, fn)")
+        lines.append("function _jsprog_updaters_remove(updaters, fn)")
+        lines.append("  local i = updaters[fn]")
+        lines.append("  if i then")
+        lines.append("    local n = #updaters")
+        lines.append("    local last = updaters[n]")
+        lines.append("    updaters[i] = last")
+        lines.append("    updaters[last] = i")
+        lines.append("    updaters[n] = nil")
+        lines.append("    updaters[fn] = nil")
+        lines.append("  end")
         lines.append("end")
         lines.append("")
-        lines.append("function _jsprog_updaters_remove(fn)")
-        lines.append("  for i, updater in ipairs(_jsprog_updaters) do")
-        lines.append("    if fn == updater then")
-        lines.append("      table.remove(_jsprog_updaters, i)")
-        lines.append("      break")
+        lines.append("function _jsprog_updaters_call(updaters)")
+        lines.append("  local i = 1")
+        lines.append("  local updater = updaters[1]")
+        lines.append("  while updater do")
+        lines.append("    updater()")
+        lines.append("    if updaters[i] == updater then")
+        lines.append("      i = i + 1")
         lines.append("    end")
+        lines.append("    updater = updaters[i]")
         lines.append("  end")
         lines.append("end")
         lines.append("")
-        lines.append("function _jsprog_updaters_call()")
-        lines.append("  for i, updater in ipairs(_jsprog_updaters) do")
-        lines.append("    updater()")
+        lines.append("function _jsprog_updaters_callAll(...)")
+        lines.append("  local called = {}")
+        lines.append("  for _, updaters in ipairs({...}) do")
+        lines.append("    local i = 1")
+        lines.append("    local updater = updaters[1]")
+        lines.append("    while updater do")
+        lines.append("      if not called[updater] then")
+        lines.append("        called[updater] = true")
+        lines.append("        updater()")
+        lines.append("      end")
+        lines.append("      if updaters[i] == updater then")
+        lines.append("        i = i + 1")
+        lines.append("      end")
+        lines.append("      updater = updaters[i]")
+        lines.append("    end")
         lines.append("  end")
         lines.append("end")
         lines.append("")
 
+        if self._persistentThreads:
+            lines.append("function _jsprog_cycles_run(cycles)")
+            lines.append("  while true do")
+            lines.append("    local cycle = cycles.cycle + 1")
+            lines.append("    cycles.cycle = cycle")
+            lines.append("    local cycleFunction = cycles[cycle]")
+            lines.append("    cycles[cycle] = nil")
+            lines.append("    cycleFunction(cycles, cycle)")
+            lines.append("    while cycles.presses<=cycle do")
+            lines.append("      jsprog_parkthread()")
+            lines.append("    end")
+            lines.append("  end")
+            lines.append("end")
+            lines.append("")
+
         virtualControlControls = {}
         virtualControls = set()
 
@@ -2847,48 +3787,207 @@ class Profile(object):
         lines.append("")
 
         for virtualControl in self.allVirtualControls:
-            stateVariableName = virtualControl.stateLuaVariableName
+            lines += self._getVirtualControlLuaCode(virtualControl)
+
+        for index in range(0, len(self._shiftLevels)):
+            lines += self._getShiftLevelLuaCode(index)
+
+        if self._shiftStateTables:
+            lines += self._getShiftStateLuaCode()
+
+        for controlProfile in self._controlProfiles:
+            controlLines = controlProfile.getPrologueLuaCode(self)
+            if controlLines:
+                lines += controlLines
+                lines.append("")
+
+        lines += self._prologue
+
+        if not lines[-1]: lines = lines[:-1]
+
+        text = "\n" + linesToText(lines, indentation = "    ")
+
+        return (text,
+                virtualControlControls, virtualControls,
+                shiftLevelControls, shiftControls)
 
-            lines.append("%s = 0" % (stateVariableName,))
+    def _getVirtualControlLuaCode(self, virtualControl):
+        """Get the Lua code of the variable and the function maintaining the
+        state of the given virtual control.
+
+        The code is cached until the virtual control changes, separately
+        for the readable and the mangled identifiers."""
+        key = (LuaSymbols.debug, virtualControl.code)
+        lines = self._virtualControlLuaCodes.get(key)
+        if lines is None:
+            lines = []
+            lines.append("%s = 0" % (virtualControl.stateLuaVariableName,))
             lines.append("")
+            tableLines = virtualControl.getStateLuaTableCode(self)
+            if tableLines:
+                lines += tableLines
+                lines.append("")
             lines.append("function %s()" %
                          (virtualControl.stateLuaFunctionName,))
             appendLinesIndented(lines, virtualControl.getStateLuaCode(self),
                                 "  ")
             lines.append("end")
             lines.append("")
+            self._virtualControlLuaCodes[key] = lines
+
+        return lines
 
-        for (shiftLevel, index) in zip(self._shiftLevels,
-                                       list(range(0, len(self._shiftLevels)))):
+    def _getShiftLevelLuaCode(self, index):
+        """Get the Lua code of the variable and the function maintaining the
+        state of the shift level with the given index.
+
+        The code is cached until the shift levels or any virtual control
+        change, separately for the readable and the mangled identifiers."""
+        key = (LuaSymbols.debug, index)
+        lines = self._shiftLevelLuaCodes.get(key)
+        if lines is None:
+            shiftLevel = self._shiftLevels[index]
+            lines = []
             lines.append("%s = 0" % (getShiftLevelStateName(index),))
+            lines.append("%s = {}" % (getShiftLevelUpdatersName(index),))
             lines.append("")
+            tableLines = shiftLevel.getStateLuaTableCode(self, index)
+            if tableLines:
+                lines += tableLines
+                lines.append("")
             lines.append("function %s()" %
                          (Profile.getShiftLevelStateLuaFunctionName(index),))
             appendLinesIndented(lines, shiftLevel.getStateLuaCode(self, index),
                                 "  ")
             lines.append("end")
             lines.append("")
+            self._shiftLevelLuaCodes[key] = lines
 
-        for controlProfile in self._controlProfiles:
-            controlLines = controlProfile.getPrologueLuaCode(self)
-            if controlLines:
-                lines += controlLines
-                lines.append("")
+        return lines
 
-        lines += self._prologue
+    def _getShiftStateLuaCode(self):
+        """Get the Lua code of the variable and the function maintaining the
+        combined state of the shift levels.
 
-        if not lines[-1]: lines = lines[:-1]
+        The combined state is the 1-based index into the shifted states tables
+        of the controls."""
+        terms = []
+        multiplier = 1
+        for index in range(len(self._shiftLevels) - 1, -1, -1):
+            stateName = getShiftLevelStateName(index)
+            terms.insert(0, stateName if multiplier==1 else
+                         ("%s*%d" % (stateName, multiplier)))
+            multiplier *= self._shiftLevels[index].numStates
 
-        text = "\n" + linesToText(lines, indentation = "    ")
+        lines = []
+        lines.append("_jsprog_shiftState = 1")
+        lines.append("")
+        lines.append("function _jsprog_shiftState_update()")
+        lines.append("  _jsprog_shiftState = %s" % (" + ".join(["1"] + terms),))
+        lines.append("end")
+        lines.append("")
 
-        prologue = document.createTextNode(text)
+        return lines
 
-        element = document.createElement("prologue")
-        element.appendChild(prologue)
+    def reloadFrom(self, profile):
+        """Take over the header and the body of the given profile, which has
+        been loaded lazily from the file of this profile after it had
+        changed.
 
-        return (element,
-                virtualControlControls, virtualControls,
-                shiftLevelControls, shiftControls)
+        The body is not loaded, it will be loaded from the file when first
+        needed."""
+        assert profile._bodyPath is not None
+
+        self.name = profile.name
+        self.identity = profile.identity
+        self.autoLoad = profile.autoLoad
+        self._shiftStateTables = profile._shiftStateTables
+        self._persistentThreads = profile._persistentThreads
+        self.contentHash = profile.contentHash
+
+        self._setBodyPath(profile._bodyPath)
+
+    def _initBody(self):
+        """Initialize the body of the profile to be empty."""
+        self._virtualControls = []
+        self._virtualControlsByName = {}
+        self._virtualControlsByDisplayName = {}
+        self._virtualControlsByCode = {}
+        self._nextVirtualControlCode = 1
+
+        self._shiftLevels = []
+
+        self._controlProfiles = []
+        self._controlProfileMap = {}
+        self._prologue = []
+        self._epilogue = []
+
+        self._virtualControlLuaCodes = {}
+        self._shiftLevelLuaCodes = {}
+
+    def _indexVirtualControl(self, virtualControl):
+        """Add the given virtual control to the indexes.
+
+        If another virtual control has the same name, display name or code, the
+        earlier one is kept in the corresponding index."""
+        self._virtualControlsByName.setdefault(virtualControl.name,
+                                               virtualControl)
+        self._virtualControlsByDisplayName.setdefault(virtualControl.displayName,
+                                                      virtualControl)
+        self._virtualControlsByCode.setdefault(virtualControl.code,
+                                               virtualControl)
+
+    def _reindexVirtualControls(self):
+        """Rebuild the indexes of the virtual controls."""
+        self._virtualControlsByName = {}
+        self._virtualControlsByDisplayName = {}
+        self._virtualControlsByCode = {}
+        for virtualControl in self._virtualControls:
+            self._indexVirtualControl(virtualControl)
+
+    def _setBodyPath(self, path):
+        """Set the path of the file the body of the profile should be loaded
+        from when it is first accessed, and remove the current body."""
+        for name in Profile._bodyAttributes:
+            self.__dict__.pop(name, None)
+        self._bodyPath = path
+        self._bodyError = None
+
+    def _loadBody(self):
+        """Load the body of a lazily loaded profile from its file.
+
+        If the body cannot be loaded, the partially loaded body is removed,
+        and the exception is stored and raised. It will be raised again
+        whenever an attribute of the body is accessed."""
+        path = self._bodyPath
+        self._bodyPath = None
+        self._initBody()
+
+        handler = ProfileHandler(self.joystickType, profile = self)
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            handler.parseData(data, systemId = path)
+            self.contentHash = getContentHash(data)
+        except Exception as e:
+            for name in Profile._bodyAttributes:
+                self.__dict__.pop(name, None)
+            self._bodyError = e
+            raise
+
+    def _invalidateLuaCode(self):
+        """Invalidate all cached Lua code of the profile."""
+        self._virtualControlLuaCodes = {}
+        self._invalidateShiftLevelLuaCode()
+
+    def _invalidateShiftLevelLuaCode(self):
+        """Invalidate the cached Lua code of the shift levels and of the
+        control profiles, since the latter depend on the number and the states
+        of the shift levels."""
+        self._shiftLevelLuaCodes = {}
+        for controlProfile in self._controlProfiles:
+            controlProfile.invalidateLuaCode()
 
     def _isControlIncludedIn(self, control, controls):
         """Determine if the given control is included in the given other set of
@@ -2917,6 +4016,269 @@ class Profile(object):
 
 #------------------------------------------------------------------------------
 
+class ProfileMatchIndex(object):
+    """An index of profiles to find the one best matching a joystick
+    identity without computing the match score of each profile.
+
+    The profiles are grouped by the bus type, the vendor and product IDs and
+    the name of their identity, i.e. the attributes that must be equal for a
+    match at all. Within a group they are indexed by the unique ID, the
+    version and the physical location, which determine the score as
+    computed by JoystickIdentity.match(). If several profiles have the same
+    best score, the one coming first in the list the index was built from
+    is returned, like when scanning the list."""
+    def __init__(self, profiles):
+        """Construct the index for the given profiles."""
+        self._groups = {}
+
+        for (order, profile) in enumerate(profiles):
+            identity = profile.identity
+            inputID = identity.inputID
+            key = (inputID.busType, inputID.vendor, inputID.product,
+                   identity.name)
+            group = self._groups.get(key)
+            if group is None:
+                group = self._groups[key] = ({}, {}, {}, {}, [])
+            (byUniq, byVersionPhys, byVersion, byPhys, allProfiles) = group
+
+            item = (order, profile)
+            if identity.uniq is not None:
+                byUniq.setdefault(identity.uniq, item)
+            if inputID.version is not None:
+                byVersionPhys.setdefault((inputID.version, identity.phys),
+                                         item)
+                byVersion.setdefault(inputID.version, item)
+            byPhys.setdefault(identity.phys, item)
+            if not allProfiles:
+                allProfiles.append(item)
+
+    def findBestMatch(self, identity):
+        """Find the profile best matching the given identity.
+
+        Returns the profile or None, if no profile matches."""
+        inputID = identity.inputID
+        group = self._groups.get((inputID.busType, inputID.vendor,
+                                  inputID.product, identity.name))
+        if group is None:
+            return None
+
+        (byUniq, byVersionPhys, byVersion, byPhys, allProfiles) = group
+
+        item = None if identity.uniq is None else byUniq.get(identity.uniq)
+        if item is None and inputID.version is not None:
+            item = byVersionPhys.get((inputID.version, identity.phys))
+        if item is None:
+            versionItem = None if inputID.version is None \
+                else byVersion.get(inputID.version)
+            physItem = byPhys.get(identity.phys)
+            if versionItem is None:
+                item = physItem
+            elif physItem is None or versionItem[0]<physItem[0]:
+                item = versionItem
+            else:
+                item = physItem
+        if item is None:
+            item = allProfiles[0]
+
+        return item[1]
+
+#------------------------------------------------------------------------------
+
+class ProfileIndex(object):
+    """A binary index of the headers of the profiles in a directory.
+
+    It records the modification time, the size and the hash of each profile
+    file along with the contents of its header, i.e. the top-level attributes
+    and the identity. When the profiles are loaded lazily, the header of a
+    profile whose file has the same modification time and size as recorded
+    is taken from the index instead of being parsed. The profile files remain
+    the source of truth, the index is updated whenever it is found outdated.
+
+    The file starts with a magic string, the version of the format and the
+    number of the entries. Each entry consists of a fixed-size part followed
+    by the file name, the profile name and the name, the physical location
+    and the unique ID of the device, each prefixed by its length in bytes. A
+    length of 0xffff denotes a missing (None) string."""
+    ## The magic string at the beginning of the file
+    _magic = b"JSPI"
+
+    ## The version of the format
+    _version = 1
+
+    ## The header of the file: the magic string, the version and the number
+    ## of the entries.
+    _header = struct.Struct("<4sHI")
+
+    ## The fixed-size part of an entry: the modification time in nanoseconds,
+    ## the size, the hash of the contents, the flags, the bus type, the vendor
+    ## and the product IDs and the version (-1 if None) of the device.
+    _entry = struct.Struct("<qq32sBHHHi")
+
+    ## The length of a string
+    _length = struct.Struct("<H")
+
+    ## The length denoting a missing string
+    _noString = 0xffff
+
+    ## Flag: the profile is to be loaded automatically
+    FLAG_AUTO_LOAD = 0x01
+
+    ## Flag: the profile uses shift state tables
+    FLAG_SHIFT_STATE_TABLES = 0x02
+
+    ## Flag: the profile uses persistent threads
+    FLAG_PERSISTENT_THREADS = 0x04
+
+    def __init__(self, path):
+        """Construct the index stored in the file with the given path.
+
+        The file is read, if it exists. If it cannot be read or it is of a
+        different version, the index will be empty."""
+        self._path = path
+        self._entries = {}
+        self._modified = False
+
+        try:
+            with open(path, "rb") as f:
+                self._entries = self._decode(f.read())
+        except FileNotFoundError:
+            self._modified = True
+        except Exception as e:
+            print("Failed to read the profile index from %s: %s" % (path, e),
+                  file=sys.stderr)
+            self._modified = True
+
+    def findProfile(self, joystickType, fileName, stat):
+        """Find the profile in the file with the given name for the given
+        joystick type.
+
+        stat is the result of stat() for the file. If the file's modification
+        time or size differ from those recorded, None is returned. Otherwise
+        a new profile is created from the header in the index. Its body is
+        not loaded."""
+        entry = self._entries.get(fileName)
+        if entry is None or entry[0]!=stat.st_mtime_ns or \
+           entry[1]!=stat.st_size:
+            return None
+
+        (_mtime, _size, contentHash, name, flags, identity) = entry
+        profile = Profile(joystickType, name, identity,
+                          autoLoad = (flags&ProfileIndex.FLAG_AUTO_LOAD)!=0,
+                          shiftStateTables =
+                          (flags&ProfileIndex.FLAG_SHIFT_STATE_TABLES)!=0,
+                          persistentThreads =
+                          (flags&ProfileIndex.FLAG_PERSISTENT_THREADS)!=0)
+        profile.fileName = fileName
+        profile.contentHash = contentHash
+
+        return profile
+
+    def addProfile(self, profile, stat):
+        """Record the header of the given profile loaded from a file with the
+        given result of stat()."""
+        flags = 0
+        if profile.autoLoad:
+            flags |= ProfileIndex.FLAG_AUTO_LOAD
+        if profile.shiftStateTables:
+            flags |= ProfileIndex.FLAG_SHIFT_STATE_TABLES
+        if profile.persistentThreads:
+            flags |= ProfileIndex.FLAG_PERSISTENT_THREADS
+
+        self._entries[profile.fileName] = (stat.st_mtime_ns, stat.st_size,
+                                           profile.contentHash, profile.name,
+                                           flags, profile.identity)
+        self._modified = True
+
+    def save(self, fileNames):
+        """Save the index, if it has been modified.
+
+        Only the entries of the files with the given names are kept."""
+        fileNames = set(fileNames)
+        for fileName in list(self._entries.keys()):
+            if fileName not in fileNames:
+                del self._entries[fileName]
+                self._modified = True
+
+        if not self._modified:
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok = True)
+            newPath = self._path + ".new"
+            with open(newPath, "wb") as f:
+                f.write(self._encode(self._entries))
+            os.rename(newPath, self._path)
+            self._modified = False
+        except Exception as e:
+            print("Failed to write the profile index to %s: %s" %
+                  (self._path, e), file=sys.stderr)
+
+    @staticmethod
+    def _encode(entries):
+        """Encode the given entries into the binary format."""
+        data = [ProfileIndex._header.pack(ProfileIndex._magic,
+                                          ProfileIndex._version,
+                                          len(entries))]
+        for (fileName, entry) in entries.items():
+            (mtime, size, contentHash, name, flags, identity) = entry
+            inputID = identity.inputID
+            data.append(ProfileIndex._entry.pack(
+                mtime, size, bytes.fromhex(contentHash), flags,
+                inputID.busType, inputID.vendor, inputID.product,
+                -1 if inputID.version is None else inputID.version))
+            for string in [fileName, name, identity.name, identity.phys,
+                           identity.uniq]:
+                if string is None:
+                    data.append(ProfileIndex._length.pack(ProfileIndex._noString))
+                else:
+                    string = string.encode("utf-8")
+                    data.append(ProfileIndex._length.pack(len(string)))
+                    data.append(string)
+        return b"".join(data)
+
+    @staticmethod
+    def _decode(data):
+        """Decode the entries from the given binary data.
+
+        If the data is of a different version, an empty dictionary is
+        returned. If the data is malformed, an exception is raised."""
+        (magic, version, numEntries) = ProfileIndex._header.unpack_from(data)
+        if magic!=ProfileIndex._magic:
+            raise ValueError("invalid magic string")
+        if version!=ProfileIndex._version:
+            return {}
+
+        offset = ProfileIndex._header.size
+        entries = {}
+        for i in range(0, numEntries):
+            (mtime, size, contentHash, flags,
+             busType, vendor, product, deviceVersion) = \
+                ProfileIndex._entry.unpack_from(data, offset)
+            offset += ProfileIndex._entry.size
+
+            strings = []
+            for j in range(0, 5):
+                (length,) = ProfileIndex._length.unpack_from(data, offset)
+                offset += ProfileIndex._length.size
+                if length==ProfileIndex._noString:
+                    strings.append(None)
+                else:
+                    if offset+length>len(data):
+                        raise ValueError("truncated data")
+                    strings.append(data[offset:offset+length].decode("utf-8"))
+                    offset += length
+
+            (fileName, name, deviceName, phys, uniq) = strings
+            inputID = InputID(busType, vendor, product,
+                              None if deviceVersion<0 else deviceVersion)
+            identity = JoystickIdentity(inputID, deviceName, phys, uniq)
+            entries[fileName] = (mtime, size, contentHash.hex(), name, flags,
+                                 identity)
+
+        return entries
+
+#------------------------------------------------------------------------------
+
 if __name__ == "__main__":
     parser = make_parser()
 
@@ -1,8 +1,12 @@
 
 from .const import dbusInterfaceName, dbusInterfacePath
+from .const import dbusMonitorInterfaceName, dbusMonitorPathPrefix
+from .joystick import JoystickStateBuffer
 
 from dbus import Interface
 
+import hashlib
+
 #-------------------------------------------------------------------------------
 
 ## @package jsprog.util
@@ -18,6 +22,25 @@ def getJSProg(connection):
 
 #------------------------------------------------------------------------------
 
+def getJoystickStateBuffer(jsprog, joystickID):
+    """Get the buffer containing the state of the joystick with the given ID
+    via the given JSProg object.
+
+    A D-Bus exception is raised if the daemon does not support it or the
+    joystick is not known, and ValueError if the buffer is invalid."""
+    fd = jsprog.getStateBuffer(joystickID)
+    return JoystickStateBuffer(fd.take())
+
+#------------------------------------------------------------------------------
+
+def getMonitorMatchString(joystickID):
+    """Get the match rule for the signals about the control events of the
+    joystick with the given ID."""
+    return "type='signal',interface='%s',member='controlEvents',path='%s/%d'" % \
+        (dbusMonitorInterfaceName, dbusMonitorPathPrefix, joystickID)
+
+#------------------------------------------------------------------------------
+
 def appendLinesIndented(dest, lines, indentation = "  "):
     """Append the given lines with the given indentation to dest."""
     dest += [(indentation + l) if l.strip() else "" for l in lines]
@@ -28,9 +51,21 @@ def appendLinesIndented(dest, lines, indentation = "  "):
 def linesToText(lines, indentation = ""):
     """Convert the given array of lines into a text where lines are separated
     by newlines and potentially indented."""
-    text = ""
-    for line in lines:
-        text += ((indentation + line) if line.strip() else "") + "\n"
-    return text
+    return "".join([((indentation + line) if line.strip() else "") + "\n"
+                    for line in lines])
+
+#-------------------------------------------------------------------------------
+
+def getContentHash(data):
+    """Get the hash of the given contents (bytes) of a file as a string of
+    hexadecimal digits."""
+    return hashlib.sha256(data).hexdigest()
+
+#-------------------------------------------------------------------------------
+
+def getFileHash(path):
+    """Get the hash of the contents of the file with the given path."""
+    with open(path, "rb") as f:
+        return getContentHash(f.read())
 
 #-------------------------------------------------------------------------------
@@ -24,6 +24,7 @@
 #include "jsproglistener-dbus.h"
 
 #include "Joystick.h"
+#include "StateBuffer.h"
 #include "InputDeviceListener.h"
 #include "LuaRunner.h"
 #include "UInput.h"
@@ -33,8 +34,13 @@
 
 #include <lwt/IOServer.h>
 
+#include <gio/gunixfdlist.h>
+
 #include <memory>
 #include <tuple>
+#include <map>
+
+#include <cstdio>
 
 //------------------------------------------------------------------------------
 
@@ -53,7 +59,152 @@ using std::make_tuple;
 
 //------------------------------------------------------------------------------
 
-class DBusAdaptor::JSProgListener
+/**
+ * Base class for the objects sending the control events of a joystick
+ * in batches.
+ *
+ * The events are collected and sent after a short interval, or when
+ * the batch becomes full.
+ */
+class DBusAdaptor::EventBatch
+{
+private:
+    /**
+     * Called when the pending events should be sent.
+     */
+    static gboolean flushTimeout(gpointer userData);
+
+    /**
+     * The maximal number of events in a batch. If so many events are
+     * pending, they are sent immediately.
+     */
+    static const size_t MAX_BATCH_SIZE = 64;
+
+    /**
+     * The interval in milliseconds after which the pending events are
+     * sent.
+     */
+    static const guint BATCH_INTERVAL = 5;
+
+    /**
+     * The ID of the joystick the pending events belong to.
+     */
+    unsigned joystickID = 0;
+
+    /**
+     * The builder of the array of the pending events, if there are any.
+     */
+    GVariantBuilder* pendingEvents = nullptr;
+
+    /**
+     * The number of the pending events.
+     */
+    size_t numPendingEvents = 0;
+
+    /**
+     * The ID of the timeout source to send the pending events, or 0 if
+     * there is no such source.
+     */
+    guint flushSourceID = 0;
+
+public:
+    /**
+     * Destroy the batch. The pending events are dropped.
+     */
+    virtual ~EventBatch();
+
+    /**
+     * Add an event to the pending ones. If the batch is full, it is sent,
+     * otherwise a timeout is started to send it, if not started yet.
+     */
+    void addEvent(unsigned joystickID, uint16_t type, unsigned code,
+                  int value);
+
+    /**
+     * Send the pending events, if any.
+     */
+    void flush();
+
+protected:
+    /**
+     * Send the given array of events of the joystick with the given ID.
+     */
+    virtual void sendEvents(unsigned joystickID, GVariant* events) = 0;
+};
+
+//------------------------------------------------------------------------------
+
+gboolean DBusAdaptor::EventBatch::flushTimeout(gpointer userData)
+{
+    auto eventBatch = reinterpret_cast<EventBatch*>(userData);
+
+    eventBatch->flushSourceID = 0;
+    eventBatch->flush();
+
+    return G_SOURCE_REMOVE;
+}
+
+//------------------------------------------------------------------------------
+
+DBusAdaptor::EventBatch::~EventBatch()
+{
+    if (flushSourceID!=0) {
+        g_source_remove(flushSourceID);
+    }
+    if (pendingEvents!=nullptr) {
+        g_variant_builder_unref(pendingEvents);
+    }
+}
+
+//------------------------------------------------------------------------------
+
+void DBusAdaptor::EventBatch::addEvent(unsigned joystickID, uint16_t type,
+                                       unsigned code, int value)
+{
+    if (pendingEvents==nullptr) {
+        pendingEvents = g_variant_builder_new(G_VARIANT_TYPE("a(qqix)"));
+        this->joystickID = joystickID;
+    }
+
+    g_variant_builder_add(pendingEvents, "(qqix)",
+                          static_cast<guint16>(type),
+                          static_cast<guint16>(code),
+                          static_cast<gint32>(value),
+                          g_get_monotonic_time());
+
+    if (++numPendingEvents>=MAX_BATCH_SIZE) {
+        flush();
+    } else if (flushSourceID==0) {
+        flushSourceID = g_timeout_add(BATCH_INTERVAL, &flushTimeout, this);
+    }
+}
+
+//------------------------------------------------------------------------------
+
+void DBusAdaptor::EventBatch::flush()
+{
+    if (flushSourceID!=0) {
+        g_source_remove(flushSourceID);
+        flushSourceID = 0;
+    }
+
+    if (pendingEvents!=nullptr) {
+        GVariant* events =
+            g_variant_ref_sink(g_variant_builder_end(pendingEvents));
+        g_variant_builder_unref(pendingEvents);
+        pendingEvents = nullptr;
+        numPendingEvents = 0;
+
+        sendEvents(joystickID, events);
+
+        g_variant_unref(events);
+    }
+}
+
+//------------------------------------------------------------------------------
+//------------------------------------------------------------------------------
+
+class DBusAdaptor::JSProgListener : public DBusAdaptor::EventBatch
 {
 private:
     /**
@@ -80,6 +231,12 @@ private:
     static void axisChangedReady(GObject* sourceObject,
                                  GAsyncResult* res, gpointer userData);
 
+    /**
+     * Called when a controlEvents call has been processed.
+     */
+    static void controlEventsReady(GObject* sourceObject,
+                                   GAsyncResult* res, gpointer userData);
+
     /**
      * The listener instance.
      */
@@ -90,17 +247,26 @@ private:
      */
     std::string path;
 
+    /**
+     * Indicate if the events should be sent in batches.
+     */
+    bool batched;
+
 public:
     /**
      * Construct the listener proxy.
+     *
+     * @param batched indicate if the events should be sent in batches
+     * via controlEvents() instead of calling the listener for each
+     * event.
      */
     JSProgListener(GDBusConnection* connection, const std::string& path,
-                   const std::string& destination);
+                   const std::string& destination, bool batched);
 
     /**
      * Destroy the proxy.
      */
-    ~JSProgListener();
+    virtual ~JSProgListener();
 
     /**
      * Get the path of the listener.
@@ -121,6 +287,12 @@ public:
      * Called when the value of an axis has changed.
      */
     void axisChanged(unsigned joystickID, unsigned code, int value);
+
+protected:
+    /**
+     * Send the given events to the listener via controlEvents().
+     */
+    virtual void sendEvents(unsigned joystickID, GVariant* events);
 };
 
 //------------------------------------------------------------------------------
@@ -190,11 +362,29 @@ void DBusAdaptor::JSProgListener::axisChangedReady(GObject* sourceObject,
 
 //------------------------------------------------------------------------------
 
+void DBusAdaptor::JSProgListener::controlEventsReady(GObject* sourceObject,
+                                                     GAsyncResult* res,
+                                                     gpointer userData)
+{
+    auto listener = reinterpret_cast<JSProgListener*>(userData);
+
+    GError* error = nullptr;
+    if (!jsproglistener_hu_varadiistvan_jsprog_listener_call_control_events_finish(
+            listener->listener, res, &error))
+    {
+        Log::error("JSProgListener::controlEventsReady: failed\n");
+    }
+}
+
+//------------------------------------------------------------------------------
+
 inline
 DBusAdaptor::JSProgListener::JSProgListener(GDBusConnection* connection,
                                             const std::string& path,
-                                            const std::string& destination) :
-    path(path)
+                                            const std::string& destination,
+                                            bool batched) :
+    path(path),
+    batched(batched)
 {
     Log::debug("JSProgListener: path='%s', destination='%s'\n",
                path.c_str(), destination.c_str());
@@ -208,7 +398,7 @@ DBusAdaptor::JSProgListener::JSProgListener(GDBusConnection* connection,
 
 //------------------------------------------------------------------------------
 
-inline DBusAdaptor::JSProgListener::~JSProgListener()
+DBusAdaptor::JSProgListener::~JSProgListener()
 {
     if (listener!=nullptr) {
         g_object_unref(listener);
@@ -227,7 +417,9 @@ inline const std::string& DBusAdaptor::JSProgListener::getPath() const
 void DBusAdaptor::JSProgListener::
 keyPressed(unsigned joystickID, unsigned code)
 {
-    if (listener!=nullptr) {
+    if (batched) {
+        addEvent(joystickID, EV_KEY, code, 1);
+    } else if (listener!=nullptr) {
         jsproglistener_hu_varadiistvan_jsprog_listener_call_key_pressed(
             listener, joystickID, code, nullptr,
             &keyPressedReady, this);
@@ -239,7 +431,9 @@ keyPressed(unsigned joystickID, unsigned code)
 void DBusAdaptor::JSProgListener::
 keyReleased(unsigned joystickID, unsigned code)
 {
-    if (listener!=nullptr) {
+    if (batched) {
+        addEvent(joystickID, EV_KEY, code, 0);
+    } else if (listener!=nullptr) {
         jsproglistener_hu_varadiistvan_jsprog_listener_call_key_released(
             listener, joystickID, code, nullptr,
             &keyReleasedReady, this);
@@ -251,13 +445,204 @@ keyReleased(unsigned joystickID, unsigned code)
 void DBusAdaptor::JSProgListener::
 axisChanged(unsigned joystickID, unsigned code, int value)
 {
-    if (listener!=nullptr) {
+    if (batched) {
+        addEvent(joystickID, EV_ABS, code, value);
+    } else if (listener!=nullptr) {
         jsproglistener_hu_varadiistvan_jsprog_listener_call_axis_changed(
             listener, joystickID, code, value, nullptr,
             &axisChangedReady, this);
     }
 }
 
+//------------------------------------------------------------------------------
+
+void DBusAdaptor::JSProgListener::sendEvents(unsigned joystickID,
+                                             GVariant* events)
+{
+    if (listener!=nullptr) {
+        jsproglistener_hu_varadiistvan_jsprog_listener_call_control_events(
+            listener, joystickID, events, nullptr,
+            &controlEventsReady, this);
+    }
+}
+
+//------------------------------------------------------------------------------
+//------------------------------------------------------------------------------
+
+/**
+ * The object emitting the controlEvents signals of a joystick for the
+ * clients monitoring it via signals.
+ *
+ * The signals are emitted on the joystick's own object path, so that
+ * the clients can subscribe to the events of a certain joystick only.
+ */
+class DBusAdaptor::SignalEmitter : public DBusAdaptor::EventBatch
+{
+private:
+    /**
+     * Type for the information about a client: the number of times it
+     * has started monitoring and the ID of the watcher of its bus name.
+     */
+    typedef std::pair<unsigned, guint> senderInfo_t;
+
+    /**
+     * Type for a mapping of the unique bus names of the clients to
+     * their information.
+     */
+    typedef std::map<std::string, senderInfo_t> senders_t;
+
+    /**
+     * Called when the bus name of a client has vanished.
+     */
+    static void nameVanished(GDBusConnection* connection, const gchar* name,
+                             gpointer userData);
+
+    /**
+     * The connection to emit the signals on.
+     */
+    GDBusConnection* connection;
+
+    /**
+     * The ID of the joystick.
+     */
+    unsigned joystickID;
+
+    /**
+     * The object path of the signals.
+     */
+    std::string path;
+
+    /**
+     * The clients monitoring the joystick. A client may start
+     * monitoring several times. The bus names of the clients are
+     * watched, so that the clients exiting without stopping the
+     * monitoring are removed.
+     */
+    senders_t senders;
+
+public:
+    /**
+     * Construct the emitter for the joystick with the given ID.
+     */
+    SignalEmitter(GDBusConnection* connection, unsigned joystickID);
+
+    /**
+     * Destroy the emitter by stopping the watching of the bus names of
+     * the clients.
+     */
+    virtual ~SignalEmitter();
+
+    /**
+     * Add a client.
+     */
+    void addSender(const std::string& sender);
+
+    /**
+     * Remove a client.
+     *
+     * @param all if true, the client is removed regardless of how
+     * many times it has started monitoring.
+     *
+     * @return whether there are no more clients.
+     */
+    bool removeSender(const std::string& sender, bool all = false);
+
+protected:
+    /**
+     * Emit the controlEvents signal with the given events.
+     */
+    virtual void sendEvents(unsigned joystickID, GVariant* events);
+};
+
+//------------------------------------------------------------------------------
+
+void DBusAdaptor::SignalEmitter::nameVanished(GDBusConnection* /*connection*/,
+                                              const gchar* name,
+                                              gpointer userData)
+{
+    auto signalEmitter = reinterpret_cast<SignalEmitter*>(userData);
+
+    Log::debug("SignalEmitter::nameVanished: joystick %u, %s\n",
+               signalEmitter->joystickID, name);
+
+    DBusAdaptor::get().removeSignalMonitorSender(signalEmitter->joystickID,
+                                                 name, true);
+}
+
+//------------------------------------------------------------------------------
+
+DBusAdaptor::SignalEmitter::SignalEmitter(GDBusConnection* connection,
+                                          unsigned joystickID) :
+    connection(connection),
+    joystickID(joystickID)
+{
+    char buf[64];
+    snprintf(buf, sizeof(buf), "%s/%u", MONITOR_PATH_PREFIX, joystickID);
+    path = buf;
+}
+
+//------------------------------------------------------------------------------
+
+DBusAdaptor::SignalEmitter::~SignalEmitter()
+{
+    for(auto& sender: senders) {
+        g_bus_unwatch_name(sender.second.second);
+    }
+}
+
+//------------------------------------------------------------------------------
+
+inline void DBusAdaptor::SignalEmitter::addSender(const std::string& sender)
+{
+    auto i = senders.find(sender);
+    if (i==senders.end()) {
+        guint watcherID =
+            g_bus_watch_name_on_connection(connection, sender.c_str(),
+                                           G_BUS_NAME_WATCHER_FLAGS_NONE,
+                                           nullptr, &nameVanished,
+                                           this, nullptr);
+        senders.insert(make_pair(sender, senderInfo_t(1, watcherID)));
+    } else {
+        ++i->second.first;
+    }
+}
+
+//------------------------------------------------------------------------------
+
+inline bool DBusAdaptor::SignalEmitter::removeSender(const std::string& sender,
+                                                     bool all)
+{
+    auto i = senders.find(sender);
+    if (i!=senders.end()) {
+        if (all || --i->second.first==0) {
+            g_bus_unwatch_name(i->second.second);
+            senders.erase(i);
+        }
+    }
+    return senders.empty();
+}
+
+//------------------------------------------------------------------------------
+
+void DBusAdaptor::SignalEmitter::sendEvents(unsigned joystickID,
+                                            GVariant* events)
+{
+    if (connection==nullptr) return;
+
+    GError* error = nullptr;
+    if (!g_dbus_connection_emit_signal(connection, nullptr, path.c_str(),
+                                       MONITOR_INTERFACE_NAME,
+                                       "controlEvents",
+                                       g_variant_new("(u@a(qqix))",
+                                                     joystickID, events),
+                                       &error))
+    {
+        Log::error("SignalEmitter::sendEvents: failed to emit the signal: %s\n",
+                   error->message);
+        g_error_free(error);
+    }
+}
+
 //------------------------------------------------------------------------------
 //------------------------------------------------------------------------------
 
@@ -265,6 +650,16 @@ DBusAdaptor* DBusAdaptor::instance = nullptr;
 
 //------------------------------------------------------------------------------
 
+const char* const DBusAdaptor::MONITOR_INTERFACE_NAME =
+    "hu.varadiistvan.JSProgMonitor";
+
+//------------------------------------------------------------------------------
+
+const char* const DBusAdaptor::MONITOR_PATH_PREFIX =
+    "/hu/varadiistvan/JSProg/joysticks";
+
+//------------------------------------------------------------------------------
+
 gboolean DBusAdaptor::handleGetJoysticks(jsprogHuVaradiistvanJSProg* object,
                                          GDBusMethodInvocation* invocation,
                                          gpointer userData)
@@ -294,6 +689,21 @@ gboolean DBusAdaptor::handleGetJoystickState(jsprogHuVaradiistvanJSProg* object,
 
 //------------------------------------------------------------------------------
 
+gboolean DBusAdaptor::handleGetStateBuffer(jsprogHuVaradiistvanJSProg* object,
+                                           GDBusMethodInvocation* invocation,
+                                           GUnixFDList* /*fdList*/,
+                                           guint arg_id,
+                                           gpointer userData)
+{
+    auto adaptor = reinterpret_cast<DBusAdaptor*>(userData);
+
+    adaptor->getStateBuffer(object, invocation, arg_id);
+
+    return true;
+}
+
+//------------------------------------------------------------------------------
+
 gboolean DBusAdaptor::handleLoadProfile(jsprogHuVaradiistvanJSProg* object,
                                         GDBusMethodInvocation* invocation,
                                         guint arg_id,
@@ -310,6 +720,22 @@ gboolean DBusAdaptor::handleLoadProfile(jsprogHuVaradiistvanJSProg* object,
 
 //------------------------------------------------------------------------------
 
+gboolean DBusAdaptor::handleIsProfileLoaded(jsprogHuVaradiistvanJSProg* object,
+                                            GDBusMethodInvocation* invocation,
+                                            guint arg_id,
+                                            const gchar* arg_hash,
+                                            gpointer userData)
+{
+    auto adaptor = reinterpret_cast<DBusAdaptor*>(userData);
+
+    jsprog_hu_varadiistvan_jsprog_complete_is_profile_loaded(
+        object, invocation, adaptor->isProfileLoaded(arg_id, arg_hash));
+
+    return true;
+}
+
+//------------------------------------------------------------------------------
+
 gboolean DBusAdaptor::
 handleStartMonitor(jsprogHuVaradiistvanJSProg* object,
                    GDBusMethodInvocation* invocation,
@@ -329,6 +755,62 @@ handleStartMonitor(jsprogHuVaradiistvanJSProg* object,
 
 //------------------------------------------------------------------------------
 
+gboolean DBusAdaptor::
+handleStartBatchedMonitor(jsprogHuVaradiistvanJSProg* object,
+                          GDBusMethodInvocation* invocation,
+                          guint arg_id,
+                          const gchar* arg_sender,
+                          const gchar* arg_listener,
+                          gpointer userData)
+{
+    auto adaptor = reinterpret_cast<DBusAdaptor*>(userData);
+
+    jsprog_hu_varadiistvan_jsprog_complete_start_batched_monitor(
+        object, invocation, adaptor->startMonitor(arg_id, arg_sender,
+                                                  arg_listener, true));
+
+    return true;
+}
+
+//------------------------------------------------------------------------------
+
+gboolean DBusAdaptor::
+handleStartSignalMonitor(jsprogHuVaradiistvanJSProg* object,
+                         GDBusMethodInvocation* invocation,
+                         guint arg_id,
+                         gpointer userData)
+{
+    auto adaptor = reinterpret_cast<DBusAdaptor*>(userData);
+
+    jsprog_hu_varadiistvan_jsprog_complete_start_signal_monitor(
+        object, invocation,
+        adaptor->startSignalMonitor(
+            arg_id, g_dbus_method_invocation_get_sender(invocation)));
+
+    return true;
+}
+
+//------------------------------------------------------------------------------
+
+gboolean DBusAdaptor::
+handleStopSignalMonitor(jsprogHuVaradiistvanJSProg* object,
+                        GDBusMethodInvocation* invocation,
+                        guint arg_id,
+                        gpointer userData)
+{
+    auto adaptor = reinterpret_cast<DBusAdaptor*>(userData);
+
+    adaptor->stopSignalMonitor(arg_id,
+                               g_dbus_method_invocation_get_sender(invocation));
+
+    jsprog_hu_varadiistvan_jsprog_complete_stop_signal_monitor(
+        object, invocation);
+
+    return true;
+}
+
+//------------------------------------------------------------------------------
+
 gboolean DBusAdaptor::
 handleStopMonitor(jsprogHuVaradiistvanJSProg* object,
                   GDBusMethodInvocation* invocation,
@@ -487,12 +969,22 @@ DBusAdaptor::DBusAdaptor(DBusHandler& dbusHandler) :
                      G_CALLBACK(&handleGetJoysticks), this);
     g_signal_connect(interfaceSkeleton, "handle-get-joystick-state",
                      G_CALLBACK(&handleGetJoystickState), this);
+    g_signal_connect(interfaceSkeleton, "handle-get-state-buffer",
+                     G_CALLBACK(&handleGetStateBuffer), this);
     g_signal_connect(interfaceSkeleton, "handle-load-profile",
                      G_CALLBACK(&handleLoadProfile), this);
+    g_signal_connect(interfaceSkeleton, "handle-is-profile-loaded",
+                     G_CALLBACK(&handleIsProfileLoaded), this);
     g_signal_connect(interfaceSkeleton, "handle-start-monitor",
                      G_CALLBACK(&handleStartMonitor), this);
+    g_signal_connect(interfaceSkeleton, "handle-start-batched-monitor",
+                     G_CALLBACK(&handleStartBatchedMonitor), this);
     g_signal_connect(interfaceSkeleton, "handle-stop-monitor",
                      G_CALLBACK(&handleStopMonitor), this);
+    g_signal_connect(interfaceSkeleton, "handle-start-signal-monitor",
+                     G_CALLBACK(&handleStartSignalMonitor), this);
+    g_signal_connect(interfaceSkeleton, "handle-stop-signal-monitor",
+                     G_CALLBACK(&handleStopSignalMonitor), this);
     g_signal_connect(interfaceSkeleton, "handle-exit",
                      G_CALLBACK(&handleExit), this);
     instance = this;
@@ -592,6 +1084,38 @@ GVariant* DBusAdaptor::getJoystickState(uint32_t id)
 
 //------------------------------------------------------------------------------
 
+void DBusAdaptor::getStateBuffer(jsprogHuVaradiistvanJSProg* object,
+                                 GDBusMethodInvocation* invocation,
+                                 uint32_t id)
+{
+    Log::debug("DBusAdaptor::getStateBuffer: id=%u\n", id);
+
+    Joystick* joystick = Joystick::find(id);
+    StateBuffer* stateBuffer =
+        (joystick==0) ? 0 : joystick->getStateBuffer();
+    if (stateBuffer==0) {
+        g_dbus_method_invocation_return_error(
+            invocation, G_DBUS_ERROR, G_DBUS_ERROR_INVALID_ARGS,
+            "No state buffer is available for joystick %u", id);
+        return;
+    }
+
+    GError* error = 0;
+    GUnixFDList* fdList = g_unix_fd_list_new();
+    gint index = g_unix_fd_list_append(fdList, stateBuffer->getFD(), &error);
+    if (index<0) {
+        Log::warning("DBusAdaptor::getStateBuffer: failed to add the file descriptor: %s\n",
+                     error->message);
+        g_dbus_method_invocation_take_error(invocation, error);
+    } else {
+        jsprog_hu_varadiistvan_jsprog_complete_get_state_buffer(
+            object, invocation, fdList, g_variant_new_handle(index));
+    }
+    g_object_unref(fdList);
+}
+
+//------------------------------------------------------------------------------
+
 bool DBusAdaptor::loadProfile(uint32_t id, const string& profileXML)
 {
     Joystick* joystick = Joystick::find(id);
@@ -600,21 +1124,47 @@ bool DBusAdaptor::loadProfile(uint32_t id, const string& profileXML)
     Profile profile(profileXML.c_str(), false);
     if (!profile) return false;
 
-    return joystick->setProfile(profile);
+    joystick->setProfileHash(string());
+    if (!joystick->setProfile(profile)) return false;
+
+    gchar* hash = g_compute_checksum_for_string(G_CHECKSUM_SHA256,
+                                                profileXML.c_str(),
+                                                profileXML.size());
+    joystick->setProfileHash(hash);
+    g_free(hash);
+
+    return true;
+}
+
+//------------------------------------------------------------------------------
+
+bool DBusAdaptor::isProfileLoaded(uint32_t id, const string& hash)
+{
+    Joystick* joystick = Joystick::find(id);
+    if (joystick==0) return false;
+
+    const string& profileHash = joystick->getProfileHash();
+    bool loaded = !profileHash.empty() && profileHash==hash;
+
+    Log::debug("DBusAdaptor::isProfileLoaded: id=%u, hash=%s: %s\n",
+               id, hash.c_str(), loaded ? "yes" : "no");
+
+    return loaded;
 }
 
 //------------------------------------------------------------------------------
 
 bool DBusAdaptor::startMonitor(const uint32_t id, const string& sender,
-                               const string& listener)
+                               const string& listener, bool batched)
 {
     if (Joystick::find(id)==0) return false;
 
-    Log::debug("DBusAdaptor::startMonitor: joystick %u to %s\n",
-               id, listener.c_str());
+    Log::debug("DBusAdaptor::startMonitor: joystick %u to %s%s\n",
+               id, listener.c_str(), batched ? " (batched)" : "");
 
     listeners_t& listeners = getListeners(id);
-    listeners.push_back(new JSProgListener(connection, listener, sender));
+    listeners.push_back(new JSProgListener(connection, listener, sender,
+                                           batched));
     return true;
 }
 
@@ -637,6 +1187,45 @@ void DBusAdaptor::stopMonitor(const uint32_t id, const string& listener)
 
 //------------------------------------------------------------------------------
 
+bool DBusAdaptor::startSignalMonitor(const uint32_t id, const string& sender)
+{
+    if (Joystick::find(id)==0) return false;
+
+    Log::debug("DBusAdaptor::startSignalMonitor: joystick %u for %s\n",
+               id, sender.c_str());
+
+    SignalEmitter* signalEmitter = findSignalEmitter(id);
+    if (signalEmitter==0) {
+        signalEmitter = new SignalEmitter(connection, id);
+        joystick2SignalEmitters.insert(make_pair(id, signalEmitter));
+    }
+    signalEmitter->addSender(sender);
+
+    return true;
+}
+
+//------------------------------------------------------------------------------
+
+void DBusAdaptor::stopSignalMonitor(const uint32_t id, const string& sender)
+{
+    removeSignalMonitorSender(id, sender, false);
+}
+
+//------------------------------------------------------------------------------
+
+void DBusAdaptor::removeSignalMonitorSender(const uint32_t id,
+                                            const string& sender, bool all)
+{
+    SignalEmitter* signalEmitter = findSignalEmitter(id);
+    if (signalEmitter!=0 && signalEmitter->removeSender(sender, all)) {
+        signalEmitter->flush();
+        delete signalEmitter;
+        joystick2SignalEmitters.erase(id);
+    }
+}
+
+//------------------------------------------------------------------------------
+
 void DBusAdaptor::exit()
 {
     InputDeviceListener::get().stop();
@@ -675,6 +1264,11 @@ void DBusAdaptor::sendJoystickAdded(Joystick& joystick)
 
 void DBusAdaptor::sendKeyPressed(size_t joystickID, int code)
 {
+    SignalEmitter* signalEmitter = findSignalEmitter(joystickID);
+    if (signalEmitter!=0) {
+        signalEmitter->addEvent(joystickID, EV_KEY, code, 1);
+    }
+
     listeners_t* listeners = findListeners(joystickID);
     if (listeners!=0) {
         listeners_t::iterator i = listeners->begin();
@@ -695,6 +1289,11 @@ void DBusAdaptor::sendKeyPressed(size_t joystickID, int code)
 
 void DBusAdaptor::sendKeyReleased(size_t joystickID, int code)
 {
+    SignalEmitter* signalEmitter = findSignalEmitter(joystickID);
+    if (signalEmitter!=0) {
+        signalEmitter->addEvent(joystickID, EV_KEY, code, 0);
+    }
+
     listeners_t* listeners = findListeners(joystickID);
     if (listeners!=0) {
         listeners_t::iterator i = listeners->begin();
@@ -715,6 +1314,11 @@ void DBusAdaptor::sendKeyReleased(size_t joystickID, int code)
 
 void DBusAdaptor::sendAxisChanged(size_t joystickID, int code, int value)
 {
+    SignalEmitter* signalEmitter = findSignalEmitter(joystickID);
+    if (signalEmitter!=0) {
+        signalEmitter->addEvent(joystickID, EV_ABS, code, value);
+    }
+
     listeners_t* listeners = findListeners(joystickID);
     if (listeners!=0) {
         listeners_t::iterator i = listeners->begin();
@@ -746,6 +1350,12 @@ void DBusAdaptor::sendJoystickRemoved(Joystick& joystick)
         }
         joystick2Listeners.erase(joystickID);
     }
+    SignalEmitter* signalEmitter = findSignalEmitter(joystickID);
+    if (signalEmitter!=0) {
+        signalEmitter->flush();
+        delete signalEmitter;
+        joystick2SignalEmitters.erase(joystickID);
+    }
     if (interfaceExported) {
         jsprog_hu_varadiistvan_jsprog_emit_joystick_removed(
             interfaceSkeleton, joystick.getID());
@@ -42,11 +42,21 @@ class DBusHandler;
 class DBusAdaptor
 {
 private:
+    /**
+     * Base class for sending the control events in batches.
+     */
+    class EventBatch;
+
     /**
      * The implementation of the JSProg listener.
      */
     class JSProgListener;
 
+    /**
+     * The emitter of the signals about the control events of a joystick.
+     */
+    class SignalEmitter;
+
     /**
      * Type for a vector of listener information.
      */
@@ -57,6 +67,22 @@ private:
      */
     typedef std::map<size_t, listeners_t > joystick2Listeners_t;
 
+    /**
+     * Type for a mapping of joystick IDs to the signal emitters.
+     */
+    typedef std::map<size_t, SignalEmitter*> joystick2SignalEmitters_t;
+
+    /**
+     * The name of the interface of the signals about the control events.
+     */
+    static const char* const MONITOR_INTERFACE_NAME;
+
+    /**
+     * The prefix of the object paths of the signals about the control
+     * events. It is followed by a slash and the ID of the joystick.
+     */
+    static const char* const MONITOR_PATH_PREFIX;
+
     /**
      * The only instance of the adaptor.
      */
@@ -76,6 +102,14 @@ private:
                                            GDBusMethodInvocation* invocation,
                                            guint arg_id, gpointer userData);
 
+    /**
+     * The callback for the getStateBuffer() call.
+     */
+    static gboolean handleGetStateBuffer(jsprogHuVaradiistvanJSProg* object,
+                                         GDBusMethodInvocation* invocation,
+                                         GUnixFDList* fdList,
+                                         guint arg_id, gpointer userData);
+
     /**
      * The callback for the loadProfile() call.
      */
@@ -85,6 +119,15 @@ private:
                                       const gchar* arg_profileXML,
                                       gpointer userData);
 
+    /**
+     * The callback for the isProfileLoaded() call.
+     */
+    static gboolean handleIsProfileLoaded(jsprogHuVaradiistvanJSProg* object,
+                                          GDBusMethodInvocation* invocation,
+                                          guint arg_id,
+                                          const gchar* arg_hash,
+                                          gpointer userData);
+
     /**
      * The callback for the startMonitor() call.
      */
@@ -95,6 +138,16 @@ private:
                                        const gchar* arg_listener,
                                        gpointer userData);
 
+    /**
+     * The callback for the startBatchedMonitor() call.
+     */
+    static gboolean handleStartBatchedMonitor(jsprogHuVaradiistvanJSProg* object,
+                                              GDBusMethodInvocation* invocation,
+                                              guint arg_id,
+                                              const gchar* arg_sender,
+                                              const gchar* arg_listener,
+                                              gpointer userData);
+
     /**
      * The callback for the stopMonitor() call.
      */
@@ -104,6 +157,22 @@ private:
                                       const gchar* arg_listener,
                                       gpointer userData);
 
+    /**
+     * The callback for the startSignalMonitor() call.
+     */
+    static gboolean handleStartSignalMonitor(jsprogHuVaradiistvanJSProg* object,
+                                             GDBusMethodInvocation* invocation,
+                                             guint arg_id,
+                                             gpointer userData);
+
+    /**
+     * The callback for the stopSignalMonitor() call.
+     */
+    static gboolean handleStopSignalMonitor(jsprogHuVaradiistvanJSProg* object,
+                                            GDBusMethodInvocation* invocation,
+                                            guint arg_id,
+                                            gpointer userData);
+
     /**
      * The callback for the exit() call.
      */
@@ -159,6 +228,11 @@ private:
      */
     joystick2Listeners_t joystick2Listeners;
 
+    /**
+     * Mapping from joystick IDs to the signal emitters.
+     */
+    joystick2SignalEmitters_t joystick2SignalEmitters;
+
 public:
     /**
      * Construct the adaptor with the given connection.
@@ -191,17 +265,33 @@ public:
      */
     GVariant* getJoystickState(uint32_t id);
 
+    /**
+     * The implementation of the getStateBuffer() call. It completes
+     * the invocation with either the file descriptor of the state
+     * buffer or an error.
+     */
+    void getStateBuffer(jsprogHuVaradiistvanJSProg* object,
+                        GDBusMethodInvocation* invocation, uint32_t id);
+
     /**
      * The implementation of the loadProfile() call
      */
     bool loadProfile(uint32_t id, const std::string& profileXML);
 
+    /**
+     * The implementation of the isProfileLoaded() call
+     */
+    bool isProfileLoaded(uint32_t id, const std::string& hash);
+
     /**
      * Start monitoring the keys and axes of the joystick with the
      * given ID through the given listener.
+     *
+     * @param batched indicate if the events should be sent to the
+     * listener in batches.
      */
     bool startMonitor(const uint32_t id, const std::string& sender,
-                      const std::string& listener);
+                      const std::string& listener, bool batched = false);
 
     /**
      * Stop monitoring the keys and axes of the joystick with the
@@ -209,6 +299,21 @@ public:
      */
     void stopMonitor(const uint32_t id, const std::string& listener);
 
+    /**
+     * Start emitting signals about the events of the keys and axes of
+     * the joystick with the given ID for the client with the given
+     * unique bus name.
+     */
+    bool startSignalMonitor(const uint32_t id, const std::string& sender);
+
+    /**
+     * Stop emitting signals about the events of the keys and axes of
+     * the joystick with the given ID for the client with the given
+     * unique bus name. The signals are emitted as long as there are
+     * clients that have started monitoring the joystick.
+     */
+    void stopSignalMonitor(const uint32_t id, const std::string& sender);
+
     /**
      * Exit the program.
      */
@@ -254,12 +359,29 @@ private:
      */
     listeners_t* findListeners(size_t joystickID);
 
+    /**
+     * Find the signal emitter for the given joystick ID, if present.
+     */
+    SignalEmitter* findSignalEmitter(size_t joystickID);
+
     /**
      * Get the listeners for the given joystick ID. If the vector does
      * not exist yet, it will be created.
      */
     listeners_t& getListeners(size_t joystickID);
 
+    /**
+     * Remove the client with the given unique bus name from the ones
+     * monitoring the joystick with the given ID via signals. If there
+     * are no more clients, the signal emitter is deleted.
+     *
+     * @param all if true, the client is removed regardless of how
+     * many times it has started monitoring. This is the case if the
+     * client's bus name has vanished.
+     */
+    void removeSignalMonitorSender(const uint32_t id,
+                                   const std::string& sender, bool all);
+
     /**
      * Remove a listener denoted by the given iterator.
      *
@@ -316,9 +438,19 @@ DBusAdaptor::findListeners(size_t joystickID)
 
 //------------------------------------------------------------------------------
 
+inline DBusAdaptor::SignalEmitter*
+DBusAdaptor::findSignalEmitter(size_t joystickID)
+{
+    joystick2SignalEmitters_t::iterator i =
+        joystick2SignalEmitters.find(joystickID);
+    return (i==joystick2SignalEmitters.end()) ? 0 : i->second;
+}
+
+//------------------------------------------------------------------------------
+
 inline bool DBusAdaptor::shouldSendControlSignals(size_t joystickID)
 {
-    return findListeners(joystickID)!=0;
+    return findListeners(joystickID)!=0 || findSignalEmitter(joystickID)!=0;
 }
 
 //------------------------------------------------------------------------------
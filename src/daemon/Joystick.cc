@@ -25,6 +25,7 @@
 #include "Key.h"
 #include "Axis.h"
 #include "UInput.h"
+#include "StateBuffer.h"
 #include "Log.h"
 
 #include <lwt/Timer.h>
@@ -307,6 +308,8 @@ Joystick::Joystick(int fd, const struct input_id& inputID,
         }
     }
 
+    stateBuffer = StateBuffer::create(*this);
+
     joysticks[id] = this;
 }
 
@@ -316,6 +319,8 @@ Joystick::~Joystick()
 {
     joysticks.erase(id);
 
+    delete stateBuffer;
+
     releasePressedKeys();
 
     for(int i = 0; i<KEY_CNT; ++i) {
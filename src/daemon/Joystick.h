@@ -37,6 +37,7 @@
 //------------------------------------------------------------------------------
 
 class LuaThread;
+class StateBuffer;
 class Key;
 class Axis;
 class XMLDocument;
@@ -172,6 +173,18 @@ private:
      */
     LuaState luaState;
 
+    /**
+     * The buffer containing the state of the keys and axes for the
+     * clients. It may be 0, if it could not be created.
+     */
+    StateBuffer* stateBuffer = 0;
+
+    /**
+     * The hash of the XML of the profile loaded last, or empty if no
+     * profile has been loaded successfully.
+     */
+    std::string profileHash;
+
     /**
      * The set of the codes of the keys that are currently pressed on
      * behalf of this joystick (i.e. these are the keys of the virtual
@@ -235,6 +248,16 @@ public:
      */
     bool setProfile(const Profile& profile);
 
+    /**
+     * Get the hash of the XML of the profile loaded last.
+     */
+    const std::string& getProfileHash() const;
+
+    /**
+     * Set the hash of the XML of the profile loaded last.
+     */
+    void setProfileHash(const std::string& hash);
+
     /**
      * Get the Lua state.
      */
@@ -260,6 +283,11 @@ public:
      */
     Axis* findAxis(int code) const;
 
+    /**
+     * Get the state buffer, if any.
+     */
+    StateBuffer* getStateBuffer() const;
+
     /**
      * Find the control with the given type and code.
      */
@@ -350,6 +378,20 @@ inline const std::string& Joystick::getUniq() const
 
 //------------------------------------------------------------------------------
 
+inline const std::string& Joystick::getProfileHash() const
+{
+    return profileHash;
+}
+
+//------------------------------------------------------------------------------
+
+inline void Joystick::setProfileHash(const std::string& hash)
+{
+    profileHash = hash;
+}
+
+//------------------------------------------------------------------------------
+
 inline LuaState& Joystick::getLuaState()
 {
     return luaState;
@@ -385,6 +427,13 @@ inline Axis* Joystick::findAxis(int code) const
 
 //------------------------------------------------------------------------------
 
+inline StateBuffer* Joystick::getStateBuffer() const
+{
+    return stateBuffer;
+}
+
+//------------------------------------------------------------------------------
+
 inline Control* Joystick::findControl(Control::type_t type, int code) const
 {
     return (type==Control::KEY) ?
@@ -27,6 +27,7 @@
 #include "LuaThread.h"
 #include "LuaRunner.h"
 #include "DBusAdaptor.h"
+#include "StateBuffer.h"
 #include "Log.h"
 
 #include <lwt/EPoll.h>
@@ -46,6 +47,7 @@ void JoystickHandler::run()
 {
     LuaRunner& luaRunner = LuaRunner::get();
     LuaState& luaState = joystick->getLuaState();
+    StateBuffer* stateBuffer = joystick->getStateBuffer();
     DBusAdaptor& dbusAdaptor = DBusAdaptor::get();
 
     dbusAdaptor.sendJoystickAdded(*joystick);
@@ -65,6 +67,10 @@ void JoystickHandler::run()
                 Key* key = joystick->findKey(event->code);
                 if (key!=0) {
                     key->setPressed(event->value!=0);
+                    if (stateBuffer!=0) {
+                        stateBuffer->setKeyPressed(event->code,
+                                                   event->value!=0);
+                    }
                     control = key;
                     if (event->value==0) {
                         dbusAdaptor.sendKeyReleased(joystick->getID(),
@@ -78,6 +84,9 @@ void JoystickHandler::run()
                 Axis* axis = joystick->findAxis(event->code);
                 if (axis!=0) {
                     axis->setValue(event->value);
+                    if (stateBuffer!=0) {
+                        stateBuffer->setAxisValue(event->code, event->value);
+                    }
                     dbusAdaptor.sendAxisChanged(joystick->getID(),
                                                 event->code,
                                                 event->value);
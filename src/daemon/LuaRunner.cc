@@ -192,6 +192,21 @@ void LuaRunner::resumeJoiner(LuaThread* luaThread)
 
 //------------------------------------------------------------------------------
 
+bool LuaRunner::wakeThread(LuaThread* luaThread)
+{
+    auto numErased = runningThreads.erase(luaThread);
+
+    auto woken = luaThread->wake();
+
+    if (numErased>0) {
+        runningThreads.insert(luaThread);
+    }
+
+    return woken;
+}
+
+//------------------------------------------------------------------------------
+
 void LuaRunner::stop()
 {
     toStop = true;
@@ -165,6 +165,13 @@ public:
      */
     void resumeJoiner(LuaThread* luaThread);
 
+    /**
+     * Wake up the given thread, if it is parked.
+     *
+     * @return if the thread was parked
+     */
+    bool wakeThread(LuaThread* luaThread);
+
     /**
      * Stop the Lua runner.
      */
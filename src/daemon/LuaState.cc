@@ -28,6 +28,10 @@
 #include "Relative.h"
 #include "Log.h"
 
+#include <lwt/util.h>
+
+#include <climits>
+
 extern "C" {
 #include <lualib.h>
 #include <lauxlib.h>
@@ -46,8 +50,13 @@ namespace {
 /**
  * A function to process the argument list of functions that expect
  * only an integer identifying a control.
+ *
+ * @param maxCode the largest valid code
+ *
+ * @return the code, or -1 if it is missing or not a valid code
  */
-int handleControlFunction(lua_State* L, const char* name)
+int handleControlFunction(lua_State* L, const char* name,
+                          lua_Integer maxCode = INT_MAX)
 {
     int numArguments = lua_gettop(L);
     if (numArguments!=1) {
@@ -56,12 +65,15 @@ int handleControlFunction(lua_State* L, const char* name)
     }
 
     int isnum = 0;
-    int code = lua_tointegerx(L, 1, &isnum);
-    if (isnum) {
-        return code;
-    } else {
+    lua_Integer code = lua_tointegerx(L, 1, &isnum);
+    if (!isnum) {
         Log::warning("%s called with a non-integer argument\n", name);
         return -1;
+    } else if (code<0 || code>maxCode) {
+        Log::warning("%s called with an invalid code\n", name);
+        return -1;
+    } else {
+        return static_cast<int>(code);
     }
 }
 
@@ -99,6 +111,14 @@ const char* const LuaState::GLOBAL_CANCELDELAY = "jsprog_canceldelay";
 
 const char* const LuaState::GLOBAL_JOINTHREAD = "jsprog_jointhread";
 
+const char* const LuaState::GLOBAL_GETTIME = "jsprog_gettime";
+
+const char* const LuaState::GLOBAL_KEYCOMBO = "jsprog_keycombo";
+
+const char* const LuaState::GLOBAL_PARKTHREAD = "jsprog_parkthread";
+
+const char* const LuaState::GLOBAL_WAKETHREAD = "jsprog_wakethread";
+
 //------------------------------------------------------------------------------
 
 LuaState& LuaState::get(lua_State* L)
@@ -221,7 +241,7 @@ int LuaState::getabsmax(lua_State* L)
 
 int LuaState::presskey(lua_State* L)
 {
-    int code = handleControlFunction(L, GLOBAL_PRESSKEY);
+    int code = handleControlFunction(L, GLOBAL_PRESSKEY, KEY_MAX);
     if (code>=0) {
         UInput::get().pressKey(code);
         LuaState::get(L).joystick.keyPressed(code);
@@ -233,7 +253,7 @@ int LuaState::presskey(lua_State* L)
 
 int LuaState::releasekey(lua_State* L)
 {
-    int code = handleControlFunction(L, GLOBAL_RELEASEKEY);
+    int code = handleControlFunction(L, GLOBAL_RELEASEKEY, KEY_MAX);
     if (code>=0) {
         UInput::get().releaseKey(code);
         LuaState::get(L).joystick.keyReleased(code);
@@ -382,6 +402,123 @@ int LuaState::jointhread(lua_State* L)
 
 //------------------------------------------------------------------------------
 
+int LuaState::gettime(lua_State* L)
+{
+    int numArguments = lua_gettop(L);
+    lua_pop(L, numArguments);
+
+    lua_pushinteger(L, currentTimeMillis());
+
+    return 1;
+}
+
+//------------------------------------------------------------------------------
+
+int LuaState::keycombo(lua_State* L)
+{
+    int numArguments = lua_gettop(L);
+    if (numArguments<1) {
+        Log::warning("%s called without arguments\n", GLOBAL_KEYCOMBO);
+        return 0;
+    }
+
+    for(int i = 1; i<=numArguments; ++i) {
+        int isnum = 0;
+        lua_Integer code = lua_tointegerx(L, i, &isnum);
+        if (!isnum || code==0 || code<-KEY_MAX || code>KEY_MAX) {
+            Log::warning("%s called with an invalid argument #%d, ignoring the combination\n",
+                         GLOBAL_KEYCOMBO, i);
+            lua_pop(L, numArguments);
+            return 0;
+        }
+    }
+
+    Joystick& joystick = LuaState::get(L).joystick;
+    UInput& uinput = UInput::get();
+
+    for(int i = 1; i<=numArguments; ++i) {
+        int code = static_cast<int>(lua_tointeger(L, i));
+        if (code>0) {
+            uinput.bufferKey(code, true);
+            joystick.keyPressed(code);
+        } else {
+            uinput.bufferKey(-code, false);
+            joystick.keyReleased(-code);
+        }
+    }
+
+    lua_pop(L, numArguments);
+
+    uinput.flush();
+
+    return 0;
+}
+
+//------------------------------------------------------------------------------
+
+int LuaState::parkthread(lua_State* L)
+{
+    auto& threads = LuaState::get(L).threads;
+
+    if (threads.find(L)==threads.end()) {
+        Log::warning("%s should be called from a thread\n",
+                     GLOBAL_PARKTHREAD);
+        return luaL_error(L, "%s should be called from a thread\n",
+                          GLOBAL_PARKTHREAD);
+    }
+
+    int numArguments = lua_gettop(L);
+    if (numArguments>0) {
+        Log::warning("%s called with too many arguments (%d), ignoring them\n",
+                     GLOBAL_PARKTHREAD, numArguments);
+    }
+    lua_pop(L, numArguments);
+
+    lua_pushinteger(L, LuaThread::YIELD_PARK);
+    lua_pushinteger(L, 0);
+
+    lua_yield(L, 2);
+
+    return 0;
+}
+
+//------------------------------------------------------------------------------
+
+int LuaState::wakethread(lua_State* L)
+{
+    int numArguments = lua_gettop(L);
+    if (numArguments<1) {
+        luaL_error(L, "%s called with too few arguments (%d)\n",
+                   GLOBAL_WAKETHREAD, numArguments);
+    } else if (numArguments>1) {
+        Log::warning("%s called with too many arguments (%d), ignoring the ones after the first one\n",
+                     GLOBAL_WAKETHREAD, numArguments);
+    }
+
+    lua_State* thread = lua_tothread(L, 1);
+    if (thread==0) {
+        luaL_error(L, "%s called with not a thread argument\n",
+                   GLOBAL_WAKETHREAD);
+    }
+
+    auto& threads = LuaState::get(L).threads;
+    auto i = threads.find(thread);
+    if (i==threads.end()) {
+        Log::warning("%s called with an unknown thread. It might have exited in the meantime\n",
+                     GLOBAL_WAKETHREAD);
+
+        lua_pushboolean(L, false);
+        return 1;
+    }
+
+    bool woken = LuaRunner::get().wakeThread(i->second);
+    lua_pushboolean(L, woken);
+
+    return 1;
+}
+
+//------------------------------------------------------------------------------
+
 LuaState::LuaState(Joystick& joystick) :
     joystick(joystick),
     L(luaL_newstate())
@@ -502,6 +639,18 @@ void LuaState::initialize()
     lua_pushcfunction(L, &jointhread);
     lua_setglobal(L, GLOBAL_JOINTHREAD);
 
+    lua_pushcfunction(L, &gettime);
+    lua_setglobal(L, GLOBAL_GETTIME);
+
+    lua_pushcfunction(L, &keycombo);
+    lua_setglobal(L, GLOBAL_KEYCOMBO);
+
+    lua_pushcfunction(L, &parkthread);
+    lua_setglobal(L, GLOBAL_PARKTHREAD);
+
+    lua_pushcfunction(L, &wakethread);
+    lua_setglobal(L, GLOBAL_WAKETHREAD);
+
     lua_newtable(L);
     lua_setglobal(L, GLOBAL_THREADS);
 
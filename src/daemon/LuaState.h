@@ -117,6 +117,26 @@ private:
      */
     static const char* const GLOBAL_JOINTHREAD;
 
+    /**
+     * Global name: gettime
+     */
+    static const char* const GLOBAL_GETTIME;
+
+    /**
+     * Global name: keycombo
+     */
+    static const char* const GLOBAL_KEYCOMBO;
+
+    /**
+     * Global name: parkthread
+     */
+    static const char* const GLOBAL_PARKTHREAD;
+
+    /**
+     * Global name: wakethread
+     */
+    static const char* const GLOBAL_WAKETHREAD;
+
 public:
     /**
      * Get the LuaState object from the given state.
@@ -180,6 +200,32 @@ private:
      */
     static int jointhread(lua_State* L);
 
+    /**
+     * A function that returns the current time in milliseconds.
+     */
+    static int gettime(lua_State* L);
+
+    /**
+     * A function that sends a sequence of key press and release events
+     * with a single write followed by a synchronization. Each argument is
+     * a key code. Positive codes denote a key press, negative ones a key
+     * release. If any of the codes is not a valid key code, none of the
+     * events are sent.
+     */
+    static int keycombo(lua_State* L);
+
+    /**
+     * A function that yields the current thread until it is woken up by
+     * wakethread.
+     */
+    static int parkthread(lua_State* L);
+
+    /**
+     * A function that wakes up a thread parked by parkthread. It returns
+     * whether the thread was parked.
+     */
+    static int wakethread(lua_State* L);
+
     /**
      * The joystick that this state belongs to.
      */
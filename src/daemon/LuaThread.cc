@@ -94,9 +94,21 @@ bool LuaThread::joinDone()
 
 //------------------------------------------------------------------------------
 
+bool LuaThread::wake()
+{
+    if (yieldReason==YIELDED_PARK) {
+        timeout = currentTimeMillis();
+        return true;
+    } else {
+        return false;
+    }
+}
+
+//------------------------------------------------------------------------------
+
 bool LuaThread::resume()
 {
-    if (yieldReason==YIELDED_JOINTHREAD) {
+    if (yieldReason==YIELDED_JOINTHREAD || yieldReason==YIELDED_PARK) {
         return doResume(0);
     } else {
         lua_pushboolean(L, !cancelled);
@@ -143,6 +155,10 @@ bool LuaThread::doResume(int narg)
                 yieldReason = YIELDED_JOINTHREAD;
                 timeout = INVALID_MILLIS;
                 return true;
+            } else if (reason==YIELD_PARK) {
+                yieldReason = YIELDED_PARK;
+                timeout = INVALID_MILLIS;
+                return true;
             } else {
                 Log::warning("failed to execute thread: unknown yield reason: %d\n", reason);
                 return false;
@@ -60,7 +60,9 @@ private:
         YIELDED_CANCELLABLE_DELAY,
 
         /// Yielded due to joining a thread
-        YIELDED_JOINTHREAD
+        YIELDED_JOINTHREAD,
+        /// Yielded due to being parked until woken up
+        YIELDED_PARK
     } yieldReason_t;
 
 public:
@@ -79,6 +81,11 @@ public:
      */
     static const int YIELD_JOINTHREAD = 3;
 
+    /**
+     * Yield reason: parking until woken up by another thread
+     */
+    static const int YIELD_PARK = 4;
+
 private:
     /**
      * The control this thread belongs to.
@@ -163,6 +170,12 @@ private:
      */
     bool joinDone();
 
+    /**
+     * Wake up the thread, if it is parked. The timeout is reset and true is
+     * returned in this case.
+     */
+    bool wake();
+
     /**
      * Resume the thread.
      *
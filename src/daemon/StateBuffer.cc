@@ -0,0 +1,144 @@
+// Copyright (c) 2012 by Istvn Vradi
+
+// This file is part of JSProg, a joystick programming utility
+
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, write to the Free Software
+// Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+//------------------------------------------------------------------------------
+
+#include "StateBuffer.h"
+
+#include "Joystick.h"
+#include "Key.h"
+#include "Axis.h"
+#include "Log.h"
+
+#include <cerrno>
+#include <cstdio>
+#include <cstring>
+
+#include <sys/mman.h>
+#include <fcntl.h>
+#include <unistd.h>
+
+//------------------------------------------------------------------------------
+
+StateBuffer* StateBuffer::create(const Joystick& joystick)
+{
+    size_t numEntries = joystick.getNumKeys() + joystick.getNumAxes();
+    size_t size = sizeof(Header) + numEntries * sizeof(Entry);
+
+    char name[64];
+    snprintf(name, sizeof(name), "jsprog-state-%zu", joystick.getID());
+
+    int fd = memfd_create(name, MFD_CLOEXEC | MFD_ALLOW_SEALING);
+    if (fd<0) {
+        Log::error("StateBuffer: failed to create the memory file: errno=%d\n",
+                   errno);
+        return 0;
+    }
+
+    if (ftruncate(fd, size)<0) {
+        Log::error("StateBuffer: failed to set the size of the memory file: errno=%d\n",
+                   errno);
+        close(fd);
+        return 0;
+    }
+
+    void* memory = mmap(0, size, PROT_READ|PROT_WRITE, MAP_SHARED, fd, 0);
+    if (memory==MAP_FAILED) {
+        Log::error("StateBuffer: failed to map the memory file: errno=%d\n",
+                   errno);
+        close(fd);
+        return 0;
+    }
+
+    // The clients should not be able to change the size or the
+    // contents.
+    fcntl(fd, F_ADD_SEALS, F_SEAL_SHRINK | F_SEAL_GROW);
+#ifdef F_SEAL_FUTURE_WRITE
+    if (fcntl(fd, F_ADD_SEALS, F_SEAL_FUTURE_WRITE)<0) {
+        Log::warning("StateBuffer: failed to seal the memory file against writing: errno=%d\n",
+                     errno);
+    }
+#endif
+    fcntl(fd, F_ADD_SEALS, F_SEAL_SEAL);
+
+    StateBuffer* stateBuffer = new StateBuffer(fd, size, memory);
+
+    Header* header = stateBuffer->header;
+    Entry* entry = stateBuffer->entries;
+    int index = 0;
+
+    for(int code = 0; code<KEY_CNT; ++code) {
+        Key* key = joystick.findKey(code);
+        if (key!=0) {
+            entry->code = code;
+            entry->value = key->isPressed() ? 1 : 0;
+            stateBuffer->keyIndexes[code] = index++;
+            ++entry;
+        }
+    }
+
+    for(int code = 0; code<ABS_CNT; ++code) {
+        Axis* axis = joystick.findAxis(code);
+        if (axis!=0) {
+            entry->code = code;
+            entry->value = axis->getValue();
+            stateBuffer->axisIndexes[code] = index++;
+            ++entry;
+        }
+    }
+
+    header->numKeys = joystick.getNumKeys();
+    header->numAxes = joystick.getNumAxes();
+    header->version = VERSION;
+    __atomic_store_n(&header->magic, MAGIC, __ATOMIC_RELEASE);
+
+    return stateBuffer;
+}
+
+//------------------------------------------------------------------------------
+
+StateBuffer::StateBuffer(int fd, size_t size, void* memory) :
+    fd(fd),
+    size(size),
+    header(reinterpret_cast<Header*>(memory)),
+    entries(reinterpret_cast<Entry*>(header + 1))
+{
+    memset(memory, 0, size);
+    for(int i = 0; i<KEY_CNT; ++i) keyIndexes[i] = -1;
+    for(int i = 0; i<ABS_CNT; ++i) axisIndexes[i] = -1;
+}
+
+//------------------------------------------------------------------------------
+
+StateBuffer::~StateBuffer()
+{
+    beginUpdate();
+    header->flags |= FLAG_REMOVED;
+    endUpdate();
+
+    munmap(header, size);
+    close(fd);
+}
+
+//------------------------------------------------------------------------------
+
+// Local Variables:
+// mode: C++
+// c-basic-offset: 4
+// indent-tabs-mode: nil
+// End:
@@ -0,0 +1,272 @@
+// Copyright (c) 2012 by Istvn Vradi
+
+// This file is part of JSProg, a joystick programming utility
+
+// This program is free software; you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation; either version 2 of the License, or
+// (at your option) any later version.
+//
+// This program is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with this program; if not, write to the Free Software
+// Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+
+#ifndef JSPROG_STATEBUFFER_H
+#define JSPROG_STATEBUFFER_H
+//------------------------------------------------------------------------------
+
+#include <linux/input.h>
+
+#include <inttypes.h>
+#include <stddef.h>
+
+//------------------------------------------------------------------------------
+
+class Joystick;
+
+//------------------------------------------------------------------------------
+
+/**
+ * A shared memory buffer containing the current state of the keys and
+ * axes of a joystick.
+ *
+ * The buffer is created by memfd_create(), and its file descriptor
+ * can be passed to clients, which can map it read-only and read the
+ * state without calling the daemon. The layout of the buffer (in host
+ * byte order) is:
+ * - the header (see Header),
+ * - an Entry for each key in the order of their codes,
+ * - an Entry for each axis in the order of their codes.
+ *
+ * The set of the keys and axes does not change during the lifetime of
+ * the buffer, only the values in the entries. The updates are guarded
+ * by a sequence lock: the sequence number is odd while an update is in
+ * progress. A reader should read the sequence number, then the
+ * entries, then the sequence number again, and retry if the two
+ * numbers differ or are odd.
+ */
+class StateBuffer
+{
+public:
+    /**
+     * The magic number at the beginning of the buffer ("JSPS").
+     */
+    static const uint32_t MAGIC = 0x5350534a;
+
+    /**
+     * The version of the layout.
+     */
+    static const uint32_t VERSION = 1;
+
+    /**
+     * The flag indicating that the joystick has been removed, and thus
+     * the buffer is not updated anymore.
+     */
+    static const uint32_t FLAG_REMOVED = 0x00000001;
+
+    /**
+     * The header of the buffer.
+     */
+    struct Header
+    {
+        /**
+         * The magic number.
+         */
+        uint32_t magic;
+
+        /**
+         * The version of the layout.
+         */
+        uint32_t version;
+
+        /**
+         * The sequence number.
+         */
+        uint32_t sequence;
+
+        /**
+         * The flags.
+         */
+        uint32_t flags;
+
+        /**
+         * The number of the keys.
+         */
+        uint32_t numKeys;
+
+        /**
+         * The number of the axes.
+         */
+        uint32_t numAxes;
+    };
+
+    /**
+     * An entry for a key or an axis.
+     */
+    struct Entry
+    {
+        /**
+         * The code of the key or axis.
+         */
+        uint16_t code;
+
+        /**
+         * Reserved for future use, always 0.
+         */
+        uint16_t reserved;
+
+        /**
+         * The value: 0 or 1 for a key, the current value for an axis.
+         */
+        int32_t value;
+    };
+
+    /**
+     * Create the state buffer for the given joystick and fill it with
+     * its current state.
+     *
+     * @return the buffer, or 0 on failure.
+     */
+    static StateBuffer* create(const Joystick& joystick);
+
+private:
+    /**
+     * The file descriptor of the memory.
+     */
+    int fd;
+
+    /**
+     * The size of the memory.
+     */
+    size_t size;
+
+    /**
+     * The header in the memory.
+     */
+    Header* header;
+
+    /**
+     * The entries in the memory.
+     */
+    Entry* entries;
+
+    /**
+     * The mapping of key codes to the indexes of their entries, or -1
+     * if there is no such key.
+     */
+    int keyIndexes[KEY_CNT];
+
+    /**
+     * The mapping of axis codes to the indexes of their entries, or -1
+     * if there is no such axis.
+     */
+    int axisIndexes[ABS_CNT];
+
+    /**
+     * Construct the buffer with the given file descriptor and memory.
+     */
+    StateBuffer(int fd, size_t size, void* memory);
+
+public:
+    /**
+     * Destroy the buffer. It is marked as removed, so that clients
+     * still having it mapped know that it is not updated anymore.
+     */
+    ~StateBuffer();
+
+    /**
+     * Get the file descriptor of the buffer.
+     */
+    int getFD() const;
+
+    /**
+     * Set the state of the key with the given code.
+     */
+    void setKeyPressed(int code, bool pressed);
+
+    /**
+     * Set the value of the axis with the given code.
+     */
+    void setAxisValue(int code, int value);
+
+private:
+    /**
+     * Set the value of the entry with the given index, if valid.
+     */
+    void setValue(int index, int32_t value);
+
+    /**
+     * Begin updating the buffer.
+     */
+    void beginUpdate();
+
+    /**
+     * End updating the buffer.
+     */
+    void endUpdate();
+};
+
+//------------------------------------------------------------------------------
+// Inline definitions
+//------------------------------------------------------------------------------
+
+inline int StateBuffer::getFD() const
+{
+    return fd;
+}
+
+//------------------------------------------------------------------------------
+
+inline void StateBuffer::setKeyPressed(int code, bool pressed)
+{
+    if (code>=0 && code<KEY_CNT) setValue(keyIndexes[code], pressed ? 1 : 0);
+}
+
+//------------------------------------------------------------------------------
+
+inline void StateBuffer::setAxisValue(int code, int value)
+{
+    if (code>=0 && code<ABS_CNT) setValue(axisIndexes[code], value);
+}
+
+//------------------------------------------------------------------------------
+
+inline void StateBuffer::beginUpdate()
+{
+    uint32_t sequence = header->sequence;
+    __atomic_store_n(&header->sequence, sequence + 1, __ATOMIC_RELAXED);
+    __atomic_thread_fence(__ATOMIC_RELEASE);
+}
+
+//------------------------------------------------------------------------------
+
+inline void StateBuffer::endUpdate()
+{
+    uint32_t sequence = header->sequence;
+    __atomic_store_n(&header->sequence, sequence + 1, __ATOMIC_RELEASE);
+}
+
+//------------------------------------------------------------------------------
+
+inline void StateBuffer::setValue(int index, int32_t value)
+{
+    if (index<0) return;
+
+    beginUpdate();
+    __atomic_store_n(&entries[index].value, value, __ATOMIC_RELAXED);
+    endUpdate();
+}
+
+//------------------------------------------------------------------------------
+#endif // JSPROG_STATEBUFFER_H
+
+// Local Variables:
+// mode: C++
+// c-basic-offset: 4
+// indent-tabs-mode: nil
+// End:
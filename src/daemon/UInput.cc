@@ -155,6 +155,35 @@ void UInput::moveRelative(unsigned code, int value)
 
 //------------------------------------------------------------------------------
 
+void UInput::bufferKey(unsigned code, bool press)
+{
+    struct input_event event;
+    memset(&event, 0, sizeof(event));
+    event.type = EV_KEY;
+    event.code = code;
+    event.value = press ? 1 : 0;
+    eventBuffer.push_back(event);
+}
+
+//------------------------------------------------------------------------------
+
+void UInput::flush()
+{
+    if (eventBuffer.empty()) return;
+
+    struct input_event event;
+    memset(&event, 0, sizeof(event));
+    event.type = EV_SYN;
+    eventBuffer.push_back(event);
+
+    write(eventBuffer.data(), eventBuffer.size() * sizeof(event));
+
+    eventBuffer.clear();
+    eventsSent = false;
+}
+
+//------------------------------------------------------------------------------
+
 void UInput::synchronize()
 {
     if (eventsSent) {
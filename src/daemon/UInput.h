@@ -22,6 +22,8 @@
 
 #include <lwt/ThreadedFD.h>
 
+#include <vector>
+
 #include <linux/input.h>
 
 //------------------------------------------------------------------------------
@@ -61,6 +63,12 @@ private:
      */
     bool eventsSent;
 
+    /**
+     * The events buffered by bufferKey() to be written at once by
+     * flush().
+     */
+    std::vector<struct input_event> eventBuffer;
+
 public:
     /**
      * Construct the device.
@@ -92,6 +100,18 @@ public:
      */
     void moveRelative(unsigned code, int value);
 
+    /**
+     * Add a key press or release event for the key with the given code to
+     * the buffer. The event is sent only when flush() is called.
+     */
+    void bufferKey(unsigned code, bool press);
+
+    /**
+     * Send the buffered events followed by a synchronization event in a
+     * single write.
+     */
+    void flush();
+
     /**
      * Synchronize the events with the device.
      */